@@ -6,8 +6,10 @@ from __future__ import absolute_import, division, print_function
 __all__ = [
     'RETRO_DIR',
     'DATA_DIR',
+    'CACHE_DIR',
     'NUMBA_AVAIL',
     'FTYPE',
+    'ACCUM_FTYPE',
     'UITYPE',
     'DEBUG',
     'DFLT_NUMBA_JIT_KWARGS',
@@ -79,11 +81,25 @@ if 'RETRO_DATA_DIR' in environ:
 else:
     DATA_DIR = join(RETRO_DIR, 'data')
 
+CACHE_DIR = environ.get('RETRO_CACHE_DIR', join('~', '.cache', 'retro'))
+"""Directory for persisting data derived from Retro's data files (or otherwise
+expensive to compute) across runs; set environment variable `RETRO_CACHE_DIR`
+to override, or set it to an empty string to disable persisting"""
+
 
 # -- Datatype choices for consistency throughout code -- #
 
-FTYPE = np.float64
-"""Datatype to use for explicitly-typed floating point numbers"""
+FTYPE = np.dtype(environ.get('RETRO_FTYPE', 'float64')).type
+"""Datatype to use for explicitly-typed floating point numbers. Override by
+setting the environment variable `RETRO_FTYPE` (to "float32" or "float64")
+before importing retro; with float32, tables are stored and looked up in single
+precision, halving their memory footprint"""
+
+assert FTYPE in (np.float32, np.float64), 'RETRO_FTYPE must be float32 or float64'
+
+ACCUM_FTYPE = np.float64
+"""Datatype used for accumulating sums of (possibly single-precision) terms,
+e.g. expected photon counts and log likelihoods"""
 
 UITYPE = np.int64
 """Datatype to use for explicitly-typed unsigned integers"""
@@ -0,0 +1,570 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+
+"""
+Compiled engine for the CRS2 controlled random search minimizer, adapted to
+work with spherical coordinates (correct centroid calculation, reflection, and
+mutation on the unit sphere).
+
+Each iteration proposes several trial points at once, so the objective can be
+evaluated for all of them in a single (parallel) batch call; all bookkeeping
+in between (choosing simplices, reflecting, mutating, and replacing the worst
+points) is done in nopython mode.
+
+Live points are kept as
+
+* `cart` : shape (n_live, n_cart) array of Cartesian coordinates
+* `spher` : shape (n_live, n_spher, 3) array of unit vectors, one per
+  (azimuth, zenith) pair
+* `fx` : shape (n_live,) array of objective function values
+
+and are mapped to parameter vectors ordered as all Cartesian coordinates
+followed by (azimuth, zenith) pairs.
+
+References
+----------
+.. [1] P. Kaelo, M.M. Ali, "Some variants of the controlled random search
+   algorithm for global optimization," J. Optim. Theory Appl., 130 (2)
+   (2006), pp. 253-264.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__all__ = [
+    'CRS_STOP_FLAGS',
+    'spher_from_angles',
+    'points_to_x',
+    'crs2_reflect',
+    'crs2_mutate',
+    'crs2_accept',
+    'crs2_stop_flag',
+    'crs2_minimize',
+]
+
+__author__ = 'P. Eller, J.L. Lanfranchi'
+__license__ = '''Copyright 2018 Philipp Eller and Justin L. Lanfranchi
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.'''
+
+from collections import OrderedDict
+import math
+from os.path import abspath, dirname
+import sys
+
+import numpy as np
+
+if __name__ == '__main__' and __package__ is None:
+    RETRO_DIR = dirname(dirname(abspath(__file__)))
+    if RETRO_DIR not in sys.path:
+        sys.path.append(RETRO_DIR)
+from retro import DFLT_NUMBA_JIT_KWARGS, numba_jit
+from retro.const import TWO_PI
+
+
+CRS_STOP_FLAGS = {
+    0: 'max iterations reached',
+    1: 'stddev below threshold',
+    2: 'no improvement',
+    3: 'vertex stddev below threshold'
+}
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _normalize(vec):
+    """Scale 3-vector `vec` in place to unit length; a null vector becomes the
+    unit vector along +z"""
+    radius = math.sqrt(vec[0]**2 + vec[1]**2 + vec[2]**2)
+    if radius == 0:
+        vec[0] = 0
+        vec[1] = 0
+        vec[2] = 1
+    else:
+        vec[0] /= radius
+        vec[1] /= radius
+        vec[2] /= radius
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _reflect(old, axis, new):
+    """Reflect unit vector `old` about unit vector `axis` (i.e., rotate it by
+    180 degrees around `axis`) on the sphere, storing the result in `new`"""
+    proj = old[0]*axis[0] + old[1]*axis[1] + old[2]*axis[2]
+    for dim in range(3):
+        new[dim] = 2*proj*axis[dim] - old[dim]
+    _normalize(new)
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def spher_from_angles(az, zen, spher):
+    """Fill unit vectors from azimuth and zenith angles.
+
+    Parameters
+    ----------
+    az, zen : shape (n_points, n_spher) arrays
+    spher : shape (n_points, n_spher, 3) array
+        Filled in place
+
+    """
+    for i in range(az.shape[0]):
+        for j in range(az.shape[1]):
+            sinzen = math.sin(zen[i, j])
+            spher[i, j, 0] = sinzen * math.cos(az[i, j])
+            spher[i, j, 1] = sinzen * math.sin(az[i, j])
+            spher[i, j, 2] = math.cos(zen[i, j])
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def points_to_x(cart, spher, x):
+    """Map points onto vectors of Cartesian coordinates followed by
+    (azimuth, zenith) pairs.
+
+    Parameters
+    ----------
+    cart : shape (n_points, n_cart) array
+    spher : shape (n_points, n_spher, 3) array
+    x : shape (n_points, n_cart + 2*n_spher) array
+        Filled in place
+
+    """
+    n_cart = cart.shape[1]
+    for i in range(cart.shape[0]):
+        for k in range(n_cart):
+            x[i, k] = cart[i, k]
+        for j in range(spher.shape[1]):
+            az = math.atan2(spher[i, j, 1], spher[i, j, 0])
+            if az < 0:
+                az += TWO_PI
+            x[i, n_cart + 2*j] = az
+            x[i, n_cart + 2*j + 1] = math.acos(max(-1.0, min(1.0, spher[i, j, 2])))
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _argmin(fx):
+    idx = 0
+    for i in range(1, len(fx)):
+        if fx[i] < fx[idx]:
+            idx = i
+    return idx
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _argmax(fx):
+    idx = 0
+    for i in range(1, len(fx)):
+        if fx[i] > fx[idx]:
+            idx = i
+    return idx
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _outside_unit_interval(vals):
+    for val in vals:
+        if val < 0 or val > 1:
+            return True
+    return False
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def crs2_reflect(cart, spher, fx, rand_u, bounded, new_cart, new_spher, valid):
+    """Propose trial points by reflecting a random live point through the
+    centroid of a simplex formed by the best live point and other random live
+    points.
+
+    Parameters
+    ----------
+    cart, spher, fx : arrays
+        Live points and their function values
+    rand_u : shape (n_trials, n_dims) array of uniform random numbers in [0, 1)
+        Used to choose the simplex for each trial point
+    bounded : bool
+        Whether Cartesian coordinates must lie within [0, 1]
+    new_cart, new_spher : arrays of shape (n_trials, ...)
+        Filled with the trial points
+    valid : shape (n_trials,) bool array
+        Set to False for trial points outside bounds
+
+    """
+    n_live, n_cart = cart.shape
+    n_spher = spher.shape[1]
+    n_dims = n_cart + 2*n_spher
+    best_idx = _argmin(fx)
+
+    pool = np.empty(n_live - 1, dtype=np.int64)
+    centroid = np.empty(3)
+    for trial in range(rand_u.shape[0]):
+        # Choose `n_dims` distinct live points other than the best (the first
+        # `n_dims - 1` form the simplex with the best, the last is reflected)
+        # via a partial Fisher-Yates shuffle
+        idx = 0
+        for i in range(n_live):
+            if i != best_idx:
+                pool[idx] = i
+                idx += 1
+        for k in range(n_dims):
+            swap = k + int(rand_u[trial, k] * (n_live - 1 - k))
+            tmp = pool[k]
+            pool[k] = pool[swap]
+            pool[swap] = tmp
+        reflected_idx = pool[n_dims - 1]
+
+        for d in range(n_cart):
+            centroid_d = cart[best_idx, d]
+            for k in range(n_dims - 1):
+                centroid_d += cart[pool[k], d]
+            centroid_d /= n_dims
+            new_cart[trial, d] = 2*centroid_d - cart[reflected_idx, d]
+
+        for j in range(n_spher):
+            for dim in range(3):
+                centroid[dim] = spher[best_idx, j, dim]
+                for k in range(n_dims - 1):
+                    centroid[dim] += spher[pool[k], j, dim]
+            _normalize(centroid)
+            _reflect(spher[reflected_idx, j], centroid, new_spher[trial, j])
+
+        valid[trial] = not (bounded and _outside_unit_interval(new_cart[trial]))
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def crs2_mutate(cart, spher, fx, trial_cart, trial_spher, rand_u, bounded, new_cart,
+                new_spher, valid):
+    """Propose trial points by mutating (failed) trial points towards the
+    best live point.
+
+    Parameters
+    ----------
+    cart, spher, fx : arrays
+        Live points and their function values
+    trial_cart, trial_spher : arrays of shape (n_trials, ...)
+        Trial points to mutate
+    rand_u : shape (n_trials, n_cart + 3*n_spher) array of uniform random numbers
+        Weights of the mutation
+    bounded : bool
+        Whether Cartesian coordinates must lie within [0, 1]
+    new_cart, new_spher : arrays of shape (n_trials, ...)
+        Filled with the mutated trial points
+    valid : shape (n_trials,) bool array
+        Set to False for mutated points outside bounds
+
+    """
+    n_cart = cart.shape[1]
+    n_spher = spher.shape[1]
+    best_idx = _argmin(fx)
+
+    reflected = np.empty(3)
+    for trial in range(trial_cart.shape[0]):
+        for d in range(n_cart):
+            w = rand_u[trial, d]
+            new_cart[trial, d] = (1 + w)*cart[best_idx, d] - w*trial_cart[trial, d]
+
+        # First reflect at the best point, then take a combination of the best
+        # and the reflected point with a random weight per component
+        for j in range(n_spher):
+            _reflect(trial_spher[trial, j], spher[best_idx, j], reflected)
+            for dim in range(3):
+                w = rand_u[trial, n_cart + 3*j + dim]
+                new_spher[trial, j, dim] = (1 - w)*spher[best_idx, j, dim] + w*reflected[dim]
+            _normalize(new_spher[trial, j])
+
+        valid[trial] = not (bounded and _outside_unit_interval(new_cart[trial]))
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def crs2_accept(cart, spher, fx, trial_cart, trial_spher, trial_fx, valid, accepted):
+    """Replace the worst live point by each (valid) trial point that improves
+    on it, in order of increasing function value.
+
+    Parameters
+    ----------
+    cart, spher, fx : arrays
+        Live points and their function values; modified in place
+    trial_cart, trial_spher, trial_fx : arrays of shape (n_trials, ...)
+        Trial points and their function values (ignored where not `valid`)
+    valid : shape (n_trials,) bool array
+    accepted : shape (n_trials,) bool array
+        Set to whether each trial point replaced a live point
+
+    Returns
+    -------
+    num_accepted : int
+
+    """
+    num_accepted = 0
+    accepted[:] = False
+    for trial in np.argsort(trial_fx):
+        if not valid[trial]:
+            continue
+        worst_idx = _argmax(fx)
+        if trial_fx[trial] >= fx[worst_idx]:
+            continue
+        cart[worst_idx] = trial_cart[trial]
+        spher[worst_idx] = trial_spher[trial]
+        fx[worst_idx] = trial_fx[trial]
+        accepted[trial] = True
+        num_accepted += 1
+    return num_accepted
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _std(vals):
+    mean = 0.
+    for val in vals:
+        mean += val
+    mean /= len(vals)
+    var = 0.
+    for val in vals:
+        var += (val - mean)**2
+    return math.sqrt(var / len(vals))
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def crs2_stop_flag(
+    cart,
+    fx,
+    min_fn_std,
+    no_improvement_counter,
+    max_noimprovement,
+    vertex_std_idx,
+    vertex_std_min,
+):
+    """Check CRS2 stopping criteria.
+
+    Parameters
+    ----------
+    cart, fx : arrays
+        Live points' Cartesian coordinates and function values
+    min_fn_std : float
+    no_improvement_counter, max_noimprovement : int
+    vertex_std_idx : shape (n_vertex_dims,) int array
+        Columns of `cart` holding vertex coordinates
+    vertex_std_min : shape (n_vertex_dims,) array
+        Thresholds on the standard deviation of each of those coordinates
+
+    Returns
+    -------
+    stopping_flag : int
+        0 if no criterion is met, otherwise see `CRS_STOP_FLAGS`
+
+    """
+    if _std(fx) < min_fn_std:
+        return 1
+
+    if no_improvement_counter > max_noimprovement:
+        return 2
+
+    if len(vertex_std_idx) > 0:
+        for i in range(len(vertex_std_idx)):
+            if _std(cart[:, vertex_std_idx[i]]) >= vertex_std_min[i]:
+                return 0
+        return 3
+
+    return 0
+
+
+def crs2_minimize(
+    fun_batch,
+    cart,
+    spher,
+    fx,
+    rand,
+    max_iter,
+    max_noimprovement,
+    min_fn_std,
+    vertex_std_idx,
+    vertex_std_min,
+    bounded,
+    num_trials=1,
+    report_after=None,
+    state=None,
+    checkpoint=None,
+):
+    """Run the CRS2 minimizer starting from an evaluated population of live
+    points.
+
+    Iteration counts (`max_iter`, `max_noimprovement`, and the "iterations"
+    reported) are in units of trial points, so that for a given budget, the
+    total number of function evaluations does not depend on `num_trials`.
+
+    Parameters
+    ----------
+    fun_batch : callable
+        Called with a shape (n_points, n_dims) array of points (see
+        `points_to_x`) and returning an array of their function values
+    cart, spher, fx : arrays
+        Initial live points and their function values; modified in place to
+        hold the final live points
+    rand : numpy.random.RandomState
+    max_iter : int
+    max_noimprovement : int
+    min_fn_std : float
+    vertex_std_idx, vertex_std_min : sequences
+        See `crs2_stop_flag`
+    bounded : bool
+        Whether Cartesian coordinates must lie within [0, 1]; trial points
+        outside are discarded without evaluating them
+    num_trials : int, optional
+        Number of trial points proposed (and evaluated in a single call to
+        `fun_batch`) per iteration
+    report_after : int, optional
+        Print progress every this many trial points
+    state : mapping, optional
+        Counters of an interrupted minimization to resume, as passed to
+        `checkpoint`; `cart`, `spher`, `fx`, and the state of `rand` must then
+        be those at the time of that call
+    checkpoint : callable, optional
+        Called at the start of each iteration with an OrderedDict of the
+        minimizer's counters; together with `cart`, `spher`, `fx`, and the
+        state of `rand` at that time, these describe the minimization fully
+
+    Returns
+    -------
+    fit_meta : OrderedDict
+
+    """
+    n_cart = cart.shape[1]
+    n_spher = spher.shape[1]
+    n_dims = n_cart + 2*n_spher
+    n_live = len(fx)
+    # absolute minimum number of points necessary
+    assert n_live > n_dims + 1
+
+    vertex_std_idx = np.asarray(vertex_std_idx, dtype=np.int64)
+    vertex_std_min = np.asarray(vertex_std_min, dtype=np.float64)
+
+    trial_cart = np.empty((num_trials, n_cart))
+    trial_spher = np.empty((num_trials, n_spher, 3))
+    trial_x = np.empty((num_trials, n_dims))
+    trial_fx = np.zeros(num_trials)
+    valid = np.empty(num_trials, dtype=np.bool_)
+    accepted = np.empty(num_trials, dtype=np.bool_)
+    mut_cart = np.empty_like(trial_cart)
+    mut_spher = np.empty_like(trial_spher)
+    mut_fx = np.zeros(num_trials)
+    mut_valid = np.empty_like(valid)
+    mut_accepted = np.empty_like(accepted)
+
+    def evaluate(points_cart, points_spher, points_valid, points_fx):
+        num = len(points_valid)
+        points_to_x(points_cart, points_spher, trial_x[:num])
+        if np.any(points_valid):
+            points_fx[:num][points_valid] = fun_batch(trial_x[:num][points_valid])
+
+    best_fx = np.min(fx)
+    no_improvement_counter = -1
+
+    # optional bookkeeping
+    num_simplex_successes = 0
+    num_mutation_successes = 0
+    num_failures = 0
+    stopping_flag = 0
+
+    iter_num = 0
+    next_report = 0
+
+    if state is not None:
+        iter_num = state['iter_num']
+        next_report = state['next_report']
+        best_fx = state['best_fx']
+        no_improvement_counter = state['no_improvement_counter']
+        num_simplex_successes = state['num_simplex_successes']
+        num_mutation_successes = state['num_mutation_successes']
+        num_failures = state['num_failures']
+
+    while iter_num < max_iter:
+        if checkpoint is not None:
+            checkpoint(OrderedDict([
+                ('iter_num', iter_num),
+                ('next_report', next_report),
+                ('best_fx', best_fx),
+                ('no_improvement_counter', no_improvement_counter),
+                ('num_simplex_successes', num_simplex_successes),
+                ('num_mutation_successes', num_mutation_successes),
+                ('num_failures', num_failures),
+            ]))
+
+        if report_after and iter_num >= next_report:
+            print(
+                'simplex: %i, mutation: %i, failed: %i'
+                % (num_simplex_successes, num_mutation_successes, num_failures)
+            )
+            next_report += report_after
+
+        stopping_flag = crs2_stop_flag(
+            cart, fx, min_fn_std, no_improvement_counter, max_noimprovement,
+            vertex_std_idx, vertex_std_min,
+        )
+        if stopping_flag:
+            break
+
+        this_num_trials = min(num_trials, max_iter - iter_num)
+
+        new_best_fx = np.min(fx)
+        if new_best_fx < best_fx:
+            best_fx = new_best_fx
+            no_improvement_counter = 0
+        else:
+            no_improvement_counter += this_num_trials
+
+        # reflection
+        crs2_reflect(
+            cart, spher, fx, rand.uniform(0, 1, (this_num_trials, n_dims)), bounded,
+            trial_cart[:this_num_trials], trial_spher[:this_num_trials],
+            valid[:this_num_trials],
+        )
+        evaluate(
+            trial_cart[:this_num_trials], trial_spher[:this_num_trials],
+            valid[:this_num_trials], trial_fx,
+        )
+        num_simplex_successes += crs2_accept(
+            cart, spher, fx, trial_cart[:this_num_trials], trial_spher[:this_num_trials],
+            trial_fx[:this_num_trials], valid[:this_num_trials],
+            accepted[:this_num_trials],
+        )
+        iter_num += this_num_trials
+
+        # mutation of trial points not accepted
+        failed = np.flatnonzero(~accepted[:this_num_trials])
+        num_failed = len(failed)
+        if num_failed == 0:
+            continue
+
+        crs2_mutate(
+            cart, spher, fx, trial_cart[failed], trial_spher[failed],
+            rand.uniform(0, 1, (num_failed, n_cart + 3*n_spher)), bounded,
+            mut_cart[:num_failed], mut_spher[:num_failed], mut_valid[:num_failed],
+        )
+        evaluate(
+            mut_cart[:num_failed], mut_spher[:num_failed], mut_valid[:num_failed],
+            mut_fx,
+        )
+        num_accepted = crs2_accept(
+            cart, spher, fx, mut_cart[:num_failed], mut_spher[:num_failed],
+            mut_fx[:num_failed], mut_valid[:num_failed], mut_accepted[:num_failed],
+        )
+        num_mutation_successes += num_accepted
+
+        # if we get here no method was successful in replacing worst point
+        num_failures += num_failed - num_accepted
+
+    print(CRS_STOP_FLAGS[stopping_flag])
+
+    fit_meta = OrderedDict([
+        ('iterations', iter_num),
+        ('num_failures', num_failures),
+        ('num_mutation_successes', num_mutation_successes),
+        ('num_simplex_successes', num_simplex_successes),
+        ('stopping_flag', stopping_flag),
+        ('stopping_message', CRS_STOP_FLAGS[stopping_flag]),
+    ])
+    return fit_meta
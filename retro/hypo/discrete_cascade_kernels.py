@@ -15,6 +15,13 @@ from __future__ import absolute_import, division, print_function
 __all__ = [
     'SCALING_CASCADE_ENERGY',
     'CASCADE_KINDS',
+    'MAX_NUM_SAMPLES',
+    'get_angular_samples',
+    'LONG_QUANTILES_MAX_ENERGY',
+    'LONG_QUANTILES_NUM_PARAM_A',
+    'LONG_QUANTILES_NUM_QUANTILES',
+    'get_long_quantile_table',
+    'get_one_dim_cascade_num_samples',
     'point_cascade',
     'point_ckv_cascade',
     'aligned_point_ckv_cascade',
@@ -25,6 +32,9 @@ __all__ = [
     'scaling_one_dim_cascade',
     'one_dim_delta_cascade',
     'scaling_one_dim_delta_cascade',
+    'point_cascade_into',
+    'point_ckv_cascade_into',
+    'one_dim_cascade_into',
 ]
 
 __author__ = 'P. Eller, J.L. Lanfranchi'
@@ -47,7 +57,6 @@ from os.path import abspath, dirname
 import sys
 
 import numpy as np
-from scipy.stats import gamma, pareto
 
 if __name__ == '__main__' and __package__ is None:
     RETRO_DIR = dirname(dirname(dirname(abspath(__file__))))
@@ -60,6 +69,7 @@ from retro.const import (
 )
 from retro.retro_types import SRC_T
 from retro.utils.geom import rotate_point
+from retro.utils.misc import get_cached_arrays, hash_obj
 
 
 SCALING_CASCADE_ENERGY = 10.
@@ -96,6 +106,41 @@ def point_cascade(time, x, y, z, cascade_energy):
 
     return sources
 
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def point_cascade_into(sources, time, x, y, z, cascade_energy):
+    """Same as :func:`point_cascade` but writing sources into a caller-provided
+    buffer rather than allocating a new array.
+
+    Parameters
+    ----------
+    sources : shape (n_buffer,) array of dtype SRC_T, or SourcesSoA
+        Sources are written to the first `num_sources` elements. If the buffer
+        is too small, nothing is written.
+
+    time, x, y, z, cascade_energy
+
+    Returns
+    -------
+    num_sources : int
+        Number of sources for the hypothesis; if greater than the buffer's
+        length, call again with a buffer at least this large
+
+    """
+    if cascade_energy == 0:
+        return 0
+
+    if len(sources.time) < 1:
+        return 1
+
+    sources.kind[0] = SRC_OMNI
+    sources.time[0] = time
+    sources.x[0] = x
+    sources.y[0] = y
+    sources.z[0] = z
+    sources.photons[0] = CASCADE_PHOTONS_PER_GEV * cascade_energy
+
+    return 1
+
 def point_ckv_cascade(time, x, y, z, cascade_energy, cascade_azimuth, cascade_zenith):
     """Single-point Cherenkov-emitting cascade with axis collinear with the
     track.
@@ -144,6 +189,64 @@ def point_ckv_cascade(time, x, y, z, cascade_energy, cascade_azimuth, cascade_ze
 
     return sources
 
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def point_ckv_cascade_into(
+    sources,
+    time,
+    x,
+    y,
+    z,
+    cascade_energy,
+    cascade_azimuth,
+    cascade_zenith,
+):
+    """Same as :func:`point_ckv_cascade` but writing sources into a
+    caller-provided buffer rather than allocating a new array.
+
+    Parameters
+    ----------
+    sources : shape (n_buffer,) array of dtype SRC_T, or SourcesSoA
+        Sources are written to the first `num_sources` elements. If the buffer
+        is too small, nothing is written.
+
+    time, x, y, z, cascade_energy, cascade_azimuth, cascade_zenith
+
+    Returns
+    -------
+    num_sources : int
+        Number of sources for the hypothesis; if greater than the buffer's
+        length, call again with a buffer at least this large
+
+    """
+    if cascade_energy == 0:
+        return 0
+
+    if len(sources.time) < 1:
+        return 1
+
+    opposite_zenith = PI - cascade_zenith
+    opposite_azimuth = PI + cascade_azimuth
+
+    sources.kind[0] = SRC_CKV_BETA1
+    sources.time[0] = time
+    sources.x[0] = x
+    sources.y[0] = y
+    sources.z[0] = z
+    sources.photons[0] = CASCADE_PHOTONS_PER_GEV * cascade_energy
+
+    sources.dir_costheta[0] = math.cos(opposite_zenith)
+    sources.dir_sintheta[0] = math.sin(opposite_zenith)
+
+    sources.dir_phi[0] = opposite_azimuth
+    sources.dir_cosphi[0] = math.cos(opposite_azimuth)
+    sources.dir_sinphi[0] = math.sin(opposite_azimuth)
+
+    sources.ckv_theta[0] = THETA_CKV
+    sources.ckv_costheta[0] = COS_CKV
+    sources.ckv_sintheta[0] = SIN_CKV
+
+    return 1
+
 def aligned_point_ckv_cascade(time, x, y, z, cascade_energy, track_azimuth, track_zenith):
     """Same as point_ckv_cascade, but using track directionality"""
     return point_ckv_cascade(
@@ -172,24 +275,64 @@ def scaling_aligned_point_ckv_cascade(time, x, y, z, track_azimuth, track_zenith
 # TODO: use quasi-random (low discrepancy) numbers instead of pseudo-random
 #       (e.g., Sobol sequence)
 
-# Create angular zenith distribution
-
 MAX_NUM_SAMPLES = int(1e5)
 
-# Parameterizations from arXiv:1210.5140v2
-ZEN_DIST = pareto(b=1.91833423, loc=-22.82924369, scale=22.82924369)
-RANDOM_STATE = np.random.RandomState(0)
-ZEN_SAMPLES = np.deg2rad(
-    np.clip(
-        ZEN_DIST.rvs(size=MAX_NUM_SAMPLES, random_state=RANDOM_STATE),
-        a_min=0,
-        a_max=180,
+# Parameterization of angular zenith distribution from arXiv:1210.5140v2
+ZEN_PARETO_B = 1.91833423
+ZEN_PARETO_LOC = -22.82924369
+ZEN_PARETO_SCALE = 22.82924369
+
+_ANGULAR_SAMPLES = []
+"""Holds the angular samples once they have been loaded or generated"""
+
+
+def get_angular_samples():
+    """Get the (fixed) samples of the emitters' angular distribution used by
+    :func:`one_dim_cascade`, generating them (or loading them from the cache
+    directory; see `retro.CACHE_DIR`) the first time this is called.
+
+    Returns
+    -------
+    zen_samples, azi_samples : shape (MAX_NUM_SAMPLES,) arrays
+        Zenith and azimuth angles in radians, relative to the cascade axis
+
+    """
+    if _ANGULAR_SAMPLES:
+        return _ANGULAR_SAMPLES[0]
+
+    def build():
+        """Draw the samples"""
+        from scipy.stats import pareto
+
+        # Create angular zenith distribution
+        zen_dist = pareto(b=ZEN_PARETO_B, loc=ZEN_PARETO_LOC, scale=ZEN_PARETO_SCALE)
+        random_state = np.random.RandomState(0)
+        zen_samples = np.deg2rad(
+            np.clip(
+                zen_dist.rvs(size=MAX_NUM_SAMPLES, random_state=random_state),
+                a_min=0,
+                a_max=180,
+            )
+        )
+
+        # Create angular azimuth distribution
+        random_state = np.random.RandomState(2)
+        azi_samples = random_state.uniform(low=0, high=2*np.pi, size=MAX_NUM_SAMPLES)
+
+        return [('zen_samples', zen_samples), ('azi_samples', azi_samples)]
+
+    arrays = get_cached_arrays(
+        name='cascade_angular_samples',
+        key=hash_obj(
+            (MAX_NUM_SAMPLES, ZEN_PARETO_B, ZEN_PARETO_LOC, ZEN_PARETO_SCALE),
+            fmt='hex',
+        )[:8],
+        build_func=build,
     )
-)
+    samples = (arrays['zen_samples'], arrays['azi_samples'])
+    _ANGULAR_SAMPLES.append(samples)
+    return samples
 
-# Create angular azimuth distribution
-RANDOM_STATE = np.random.RandomState(2)
-AZI_SAMPLES = RANDOM_STATE.uniform(low=0, high=2*np.pi, size=MAX_NUM_SAMPLES)
 
 PARAM_ALPHA = 2.01849
 PARAM_BETA = 1.45469
@@ -200,6 +343,114 @@ RAD_LEN = 0.3975
 PARAM_B = 0.63207
 RAD_LEN_OVER_B = RAD_LEN / PARAM_B
 
+LONG_QUANTILES_MAX_ENERGY = 1e5
+"""Cascade energy (GeV) up to which the longitudinal quantile table is
+computed; above this, the profile at this energy is used"""
+
+LONG_QUANTILES_NUM_PARAM_A = 256
+"""Number of (equally-spaced) gamma-distribution shape parameters tabulated"""
+
+LONG_QUANTILES_NUM_QUANTILES = 1024
+"""Number of quantiles tabulated for each shape parameter"""
+
+_LONG_QUANTILE_TABLE = []
+"""Holds the table once it has been loaded or computed"""
+
+
+def get_long_quantile_table():
+    """Get the table of longitudinal-profile quantiles used by
+    :func:`one_dim_cascade`, computing it (or loading it from the cache
+    directory; see `retro.CACHE_DIR`) the first time this is called.
+
+    The longitudinal profile of a cascade is a gamma distribution with shape
+    parameter `param_a` (depending on cascade energy) and scale
+    `RAD_LEN_OVER_B` (see arXiv:1210.5140v2). The table contains quantiles of
+    the unit-scale gamma distribution at probabilities
+    ``(q + 0.5) / LONG_QUANTILES_NUM_QUANTILES`` for equally-spaced `param_a`
+    covering cascade energies from `MIN_CASCADE_ENERGY` to
+    `LONG_QUANTILES_MAX_ENERGY`.
+
+    Returns
+    -------
+    param_a_range : shape (2,) array
+        First and last tabulated shape parameters
+    quantiles : shape (LONG_QUANTILES_NUM_PARAM_A, LONG_QUANTILES_NUM_QUANTILES) array
+
+    """
+    if _LONG_QUANTILE_TABLE:
+        return _LONG_QUANTILE_TABLE[0]
+
+    param_a_range = np.array([
+        PARAM_ALPHA + PARAM_BETA * math.log10(MIN_CASCADE_ENERGY),
+        PARAM_ALPHA + PARAM_BETA * math.log10(LONG_QUANTILES_MAX_ENERGY),
+    ])
+
+    def build():
+        """Compute the quantiles"""
+        from scipy.stats import gamma
+
+        param_a = np.linspace(param_a_range[0], param_a_range[1], LONG_QUANTILES_NUM_PARAM_A)
+        probs = (np.arange(LONG_QUANTILES_NUM_QUANTILES) + 0.5) / LONG_QUANTILES_NUM_QUANTILES
+        return [
+            ('param_a_range', param_a_range),
+            ('quantiles', gamma.ppf(probs[np.newaxis, :], param_a[:, np.newaxis])),
+        ]
+
+    arrays = get_cached_arrays(
+        name='cascade_long_quantiles',
+        key=hash_obj(
+            (param_a_range, LONG_QUANTILES_NUM_PARAM_A, LONG_QUANTILES_NUM_QUANTILES),
+            prec=np.float32,
+            fmt='hex',
+        )[:8],
+        build_func=build,
+    )
+    table = (arrays['param_a_range'], np.ascontiguousarray(arrays['quantiles']))
+    _LONG_QUANTILE_TABLE.append(table)
+    return table
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _long_quantile(quantiles, a_idx0, a_frac, prob):
+    """Interpolate the (unit-scale) longitudinal quantile at probability
+    `prob` between tabulated shape parameters `a_idx0` and `a_idx0 + 1`.
+    Probabilities outside the tabulated range are clamped to the first/last
+    tabulated quantile."""
+    num_quantiles = quantiles.shape[1]
+    pos = min(max(0., prob * num_quantiles - 0.5), num_quantiles - 1.)
+    q_idx0 = min(int(pos), num_quantiles - 2)
+    q_frac = pos - q_idx0
+    lo = quantiles[a_idx0, q_idx0] * (1 - q_frac) + quantiles[a_idx0, q_idx0 + 1] * q_frac
+    hi = quantiles[a_idx0 + 1, q_idx0] * (1 - q_frac) + quantiles[a_idx0 + 1, q_idx0 + 1] * q_frac
+    return lo * (1 - a_frac) + hi * a_frac
+
+def get_one_dim_cascade_num_samples(cascade_energy):
+    """Automatically-chosen number of samples for a :func:`one_dim_cascade`.
+
+    Parameters
+    ----------
+    cascade_energy : float > 0
+
+    Returns
+    -------
+    num_samples : int
+
+    """
+    # Note that num_samples must be 1 for cascade_energy <= MIN_CASCADE_ENERGY
+    # (param_a goes <= 0 at this value and below, where the gamma distribution
+    # is undefined)
+    if cascade_energy <= MIN_CASCADE_ENERGY:
+        return 1
+
+    # See `retro/notebooks/energy_dependent_cascade_num_samples.ipynb`
+    return int(np.round(
+        np.clip(
+            math.exp(0.77 * math.log(cascade_energy) + 2.3),
+            a_min=1,
+            a_max=None,
+        )
+    ))
+
 def one_dim_cascade(
     time,
     x,
@@ -216,38 +467,33 @@ def one_dim_cascade(
     Use as a hypo_kernel with the DiscreteHypo class.
 
     Note that the nubmer of samples is proportional to the energy of the
-    cascade.
+    cascade. Emitters are placed at equally-spaced quantiles of the
+    longitudinal profile (see :func:`get_long_quantile_table`).
 
     Parameters
     ----------
     time, x, y, z, cascade_energy, cascade_azimuth, cascade_zenith
 
     num_samples : int
-        number of samples for the cascade, if < 0  will use auto settings
+        number of samples for the cascade, if < 0  will use auto settings; at
+        most `MAX_NUM_SAMPLES`
 
     Returns
     -------
     sources
 
+    Raises
+    ------
+    ValueError
+        If `num_samples` (given or automatically chosen for `cascade_energy`)
+        exceeds `MAX_NUM_SAMPLES`
+
     """
     if cascade_energy == 0:
         return EMPTY_SOURCES
 
     if num_samples < 0:
-        # Note that num_samples must be 1 for cascade_energy <= MIN_CASCADE_ENERGY
-        # (param_a goes <= 0 at this value and below, causing an exception from
-        # gamma distribution)
-        if cascade_energy <= MIN_CASCADE_ENERGY:
-            num_samples = 1
-        else:
-            # See `retro/notebooks/energy_dependent_cascade_num_samples.ipynb`
-            num_samples = int(np.round(
-                np.clip(
-                    math.exp(0.77 * math.log(cascade_energy) + 2.3),
-                    a_min=1,
-                    a_max=None,
-                )
-            ))
+        num_samples = get_one_dim_cascade_num_samples(cascade_energy)
 
     if num_samples == 1:
         return point_ckv_cascade(
@@ -260,6 +506,64 @@ def one_dim_cascade(
             cascade_zenith=cascade_zenith,
         )
 
+    sources = np.empty(shape=num_samples, dtype=SRC_T)
+    one_dim_cascade_into(
+        sources=sources,
+        time=time,
+        x=x,
+        y=y,
+        z=z,
+        cascade_energy=cascade_energy,
+        cascade_azimuth=cascade_azimuth,
+        cascade_zenith=cascade_zenith,
+        num_samples=num_samples,
+    )
+
+    return sources
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _fill_one_dim_cascade(
+    sources,
+    time,
+    x,
+    y,
+    z,
+    cascade_energy,
+    cascade_azimuth,
+    cascade_zenith,
+    num_samples,
+    param_a_range,
+    long_quantiles,
+    zen_samples,
+    azi_samples,
+):
+    """Fill the first `num_samples` elements of `sources` (an array of dtype
+    SRC_T or a SourcesSoA) with the emitters of a :func:`one_dim_cascade`,
+    placed at equally-spaced quantiles of its longitudinal profile
+    (interpolated from `long_quantiles`; see :func:`get_long_quantile_table`).
+    Nothing is written if `sources` has fewer than `num_samples` elements.
+
+    Returns
+    -------
+    num_samples : int
+
+    """
+    if num_samples > len(sources.time):
+        return num_samples
+
+    # Create longitudinal distribution (from arXiv:1210.5140v2)
+    param_a = (
+        PARAM_ALPHA
+        + PARAM_BETA * math.log10(max(MIN_CASCADE_ENERGY, cascade_energy))
+    )
+    num_param_a = long_quantiles.shape[0]
+    a_pos = min(
+        max(0., (param_a - param_a_range[0]) / (param_a_range[1] - param_a_range[0])),
+        1.,
+    ) * (num_param_a - 1)
+    a_idx0 = min(int(a_pos), num_param_a - 2)
+    a_frac = a_pos - a_idx0
+
     zenith = PI - cascade_zenith
     azimuth = PI + cascade_azimuth
 
@@ -271,71 +575,133 @@ def one_dim_cascade(
     dir_y = sin_zen * sin_azi
     dir_z = cos_zen
 
-    # Create rotation matrix
-    rot_mat = np.array(
-        [[cos_azi * cos_zen, -sin_azi, cos_azi * sin_zen],
-         [sin_azi * cos_zen, cos_zen, sin_azi * sin_zen],
-         [-sin_zen, 0, cos_zen]]
-    )
+    photons_per_sample = CASCADE_PHOTONS_PER_GEV * cascade_energy / num_samples
 
-    # Create longitudinal distribution (from arXiv:1210.5140v2)
-    param_a = (
-        PARAM_ALPHA
-        + PARAM_BETA * math.log10(max(MIN_CASCADE_ENERGY, cascade_energy))
-    )
+    for sample_idx in range(num_samples):
+        long_sample = RAD_LEN_OVER_B * _long_quantile(
+            quantiles=long_quantiles,
+            a_idx0=a_idx0,
+            a_frac=a_frac,
+            prob=(sample_idx + 0.5) / num_samples,
+        )
 
-    long_dist = gamma(param_a, scale=RAD_LEN_OVER_B)
-    long_samples = long_dist.rvs(size=num_samples, random_state=1)
-
-    # Grab samples from angular zenith distribution
-    zen_samples = ZEN_SAMPLES[:num_samples]
-
-    # Grab samples from angular azimuth distribution
-    azi_samples = AZI_SAMPLES[:num_samples]
-
-    # Create angular vectors distribution
-    sin_zen = np.sin(zen_samples)
-    x_ang_dist = sin_zen * np.cos(azi_samples)
-    y_ang_dist = sin_zen * np.sin(azi_samples)
-    z_ang_dist = np.cos(zen_samples)
-    ang_dist = np.concatenate(
-        (x_ang_dist[np.newaxis, :],
-         y_ang_dist[np.newaxis, :],
-         z_ang_dist[np.newaxis, :]),
-        axis=0
-    )
+        # Angular sample, rotated onto the cascade axis
+        sin_zen_sample = math.sin(zen_samples[sample_idx])
+        x_ang = sin_zen_sample * math.cos(azi_samples[sample_idx])
+        y_ang = sin_zen_sample * math.sin(azi_samples[sample_idx])
+        z_ang = math.cos(zen_samples[sample_idx])
 
-    final_ang_dist = np.dot(rot_mat, ang_dist)
-    final_phi_dist = np.arctan2(final_ang_dist[1], final_ang_dist[0])
-    final_theta_dist = np.arccos(final_ang_dist[2])
+        final_x = cos_azi * cos_zen * x_ang - sin_azi * y_ang + cos_azi * sin_zen * z_ang
+        final_y = sin_azi * cos_zen * x_ang + cos_zen * y_ang + sin_azi * sin_zen * z_ang
+        final_z = -sin_zen * x_ang + cos_zen * z_ang
 
-    # Define photons per sample
-    photons_per_sample = CASCADE_PHOTONS_PER_GEV * cascade_energy / num_samples
+        final_phi = math.atan2(final_y, final_x)
+        final_theta = math.acos(final_z)
 
-    # Create photon array
-    sources = np.empty(shape=num_samples, dtype=SRC_T)
+        sources.kind[sample_idx] = SRC_CKV_BETA1
 
-    sources['kind'] = SRC_CKV_BETA1
+        sources.time[sample_idx] = time + long_sample / SPEED_OF_LIGHT_M_PER_NS
+        sources.x[sample_idx] = x + long_sample * dir_x
+        sources.y[sample_idx] = y + long_sample * dir_y
+        sources.z[sample_idx] = z + long_sample * dir_z
 
-    sources['time'] = time + long_samples / SPEED_OF_LIGHT_M_PER_NS
-    sources['x'] = x + long_samples * dir_x
-    sources['y'] = y + long_samples * dir_y
-    sources['z'] = z + long_samples * dir_z
+        sources.photons[sample_idx] = photons_per_sample
 
-    sources['photons'] = photons_per_sample
+        sources.dir_costheta[sample_idx] = final_z
+        sources.dir_sintheta[sample_idx] = math.sin(final_theta)
 
-    sources['dir_costheta'] = final_ang_dist[2]
-    sources['dir_sintheta'] = np.sin(final_theta_dist)
+        sources.dir_phi[sample_idx] = final_phi
+        sources.dir_cosphi[sample_idx] = math.cos(final_phi)
+        sources.dir_sinphi[sample_idx] = math.sin(final_phi)
 
-    sources['dir_phi'] = final_phi_dist
-    sources['dir_cosphi'] = np.cos(final_phi_dist)
-    sources['dir_sinphi'] = np.sin(final_phi_dist)
+        sources.ckv_theta[sample_idx] = THETA_CKV
+        sources.ckv_costheta[sample_idx] = COS_CKV
+        sources.ckv_sintheta[sample_idx] = SIN_CKV
 
-    sources['ckv_theta'] = THETA_CKV
-    sources['ckv_costheta'] = COS_CKV
-    sources['ckv_sintheta'] = SIN_CKV
+    return num_samples
 
-    return sources
+def one_dim_cascade_into(
+    sources,
+    time,
+    x,
+    y,
+    z,
+    cascade_energy,
+    cascade_azimuth,
+    cascade_zenith,
+    num_samples=-1,
+):
+    """Same as :func:`one_dim_cascade` but writing sources into a
+    caller-provided buffer rather than allocating a new array.
+
+    Note that this function itself is not compiled since it fetches the
+    (lazily-computed) longitudinal quantile table, but filling the buffer is.
+
+    Parameters
+    ----------
+    sources : shape (n_buffer,) array of dtype SRC_T, or SourcesSoA
+        Sources are written to the first `num_sources` elements. If the buffer
+        is too small, nothing is written.
+
+    time, x, y, z, cascade_energy, cascade_azimuth, cascade_zenith, num_samples
+        See :func:`one_dim_cascade`
+
+    Returns
+    -------
+    num_sources : int
+        Number of sources for the hypothesis; if greater than the buffer's
+        length, call again with a buffer at least this large
+
+    Raises
+    ------
+    ValueError
+        If `num_samples` exceeds `MAX_NUM_SAMPLES`
+
+    """
+    if cascade_energy == 0:
+        return 0
+
+    if num_samples < 0:
+        num_samples = get_one_dim_cascade_num_samples(cascade_energy)
+
+    if num_samples == 1:
+        return point_ckv_cascade_into(
+            sources=sources,
+            time=time,
+            x=x,
+            y=y,
+            z=z,
+            cascade_energy=cascade_energy,
+            cascade_azimuth=cascade_azimuth,
+            cascade_zenith=cascade_zenith,
+        )
+
+    # The compiled fill does not check bounds on the angular samples
+    if num_samples > MAX_NUM_SAMPLES:
+        raise ValueError(
+            '{} samples requested for cascade_energy={} but at most'
+            ' MAX_NUM_SAMPLES={} angular samples are available'
+            .format(num_samples, cascade_energy, MAX_NUM_SAMPLES)
+        )
+
+    param_a_range, long_quantiles = get_long_quantile_table()
+    zen_samples, azi_samples = get_angular_samples()
+
+    return _fill_one_dim_cascade(
+        sources=sources,
+        time=time,
+        x=x,
+        y=y,
+        z=z,
+        cascade_energy=cascade_energy,
+        cascade_azimuth=cascade_azimuth,
+        cascade_zenith=cascade_zenith,
+        num_samples=num_samples,
+        param_a_range=param_a_range,
+        long_quantiles=long_quantiles,
+        zen_samples=zen_samples[:num_samples],
+        azi_samples=azi_samples[:num_samples],
+    )
 
 def aligned_one_dim_cascade(
     time,
@@ -450,3 +816,52 @@ def scaling_one_dim_delta_cascade(
         num_samples=100,
         **kwargs
     )
+
+
+def test_one_dim_cascade():
+    """Unit tests for `one_dim_cascade` and `one_dim_cascade_into`, including
+    requests for more samples than `MAX_NUM_SAMPLES`"""
+    kw = dict(time=0, x=1, y=2, z=3, cascade_azimuth=1, cascade_zenith=2)
+
+    # Largest energy for which the automatic number of samples fits
+    max_energy = 1e5
+    while get_one_dim_cascade_num_samples(max_energy * 1.01) <= MAX_NUM_SAMPLES:
+        max_energy *= 1.01
+    num_samples = get_one_dim_cascade_num_samples(max_energy)
+    assert 0.9 * MAX_NUM_SAMPLES < num_samples <= MAX_NUM_SAMPLES
+
+    sources = one_dim_cascade(cascade_energy=max_energy, **kw)
+    assert len(sources) == num_samples
+    for field in SRC_T.names:
+        assert np.all(np.isfinite(sources[field])), field
+
+    buf = np.zeros(shape=num_samples, dtype=SRC_T)
+    assert one_dim_cascade_into(sources=buf, cascade_energy=max_energy, **kw) == num_samples
+    assert np.all(buf == sources)
+
+    for cascade_energy, num_samples in [(3e5, -1), (10., MAX_NUM_SAMPLES + 1)]:
+        buf = np.zeros(shape=MAX_NUM_SAMPLES * 2, dtype=SRC_T)
+        for func, func_kw in [
+            (one_dim_cascade, {}),
+            (one_dim_cascade_into, dict(sources=buf)),
+        ]:
+            try:
+                func(
+                    cascade_energy=cascade_energy,
+                    num_samples=num_samples,
+                    **dict(kw, **func_kw)
+                )
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(
+                    '{} did not raise for cascade_energy={}, num_samples={}'
+                    .format(func.__name__, cascade_energy, num_samples)
+                )
+        assert np.all(buf == np.zeros_like(buf))
+
+    print('<< PASS : test_one_dim_cascade >>')
+
+
+if __name__ == '__main__':
+    test_one_dim_cascade()
@@ -7,7 +7,18 @@ Simple class DiscreteHypo for evaluating discrete hypotheses.
 
 from __future__ import absolute_import, division, print_function
 
-__all__ = ['get_hypo_param_names', 'DiscreteHypo']
+__all__ = [
+    'BUFFER_KERNEL_SUFFIX',
+    'INITIAL_SOURCES_BUFFER_SIZE',
+    'get_hypo_param_names',
+    'get_buffer_kernel',
+    'empty_sources_soa',
+    'get_num_sources',
+    'slice_sources',
+    'sources_to_soa_into',
+    'sources_to_soa',
+    'DiscreteHypo',
+]
 
 __author__ = 'P. Eller, J.L. Lanfranchi'
 __license__ = '''Copyright 2017 Philipp Eller and Justin L. Lanfranchi
@@ -31,15 +42,25 @@ from os.path import abspath, dirname
 import sys
 
 import numpy as np
-import numba
 
 if __name__ == '__main__' and __package__ is None:
     RETRO_DIR = dirname(dirname(abspath(__file__)))
     if RETRO_DIR not in sys.path:
         sys.path.append(RETRO_DIR)
+from retro import DFLT_NUMBA_JIT_KWARGS, numba_jit
 from retro.const import (
     EMPTY_SOURCES, PARAM_NAMES, PEGLEG_PARAM_NAMES, SCALING_PARAM_NAMES
 )
+from retro.retro_types import SRC_T, SourcesSoA
+
+
+BUFFER_KERNEL_SUFFIX = '_into'
+"""A kernel `<name>` can have a buffer-filling variant `<name>_into` defined in
+the same module; see :func:`get_buffer_kernel`"""
+
+INITIAL_SOURCES_BUFFER_SIZE = 4096
+"""Initial number of sources each of `DiscreteHypo`'s buffers can hold; buffers
+grow as needed"""
 
 
 def get_hypo_param_names(kernel):
@@ -55,10 +76,8 @@ def get_hypo_param_names(kernel):
     hypo_param_names : tuple
 
     """
-    if isinstance(kernel, numba.targets.registry.CPUDispatcher):
-        py_func = kernel.py_func
-    else:
-        py_func = kernel
+    # Compiled (numba) kernels wrap the Python function as `py_func`
+    py_func = getattr(kernel, 'py_func', kernel)
 
     # Get all the function's argument names
     kernel_argnames = inspect.getargspec(py_func)[0]
@@ -69,6 +88,165 @@ def get_hypo_param_names(kernel):
     return tuple(n for n in PARAM_NAMES if n in kernel_argnames)
 
 
+def get_buffer_kernel(kernel):
+    """Get the buffer-filling variant of a hypo kernel, if one exists.
+
+    The variant of kernel `<name>` must be named `<name>_into` (see
+    `BUFFER_KERNEL_SUFFIX`) and be defined in the same module. It must take the
+    same arguments as the kernel plus a leading `sources` buffer (either a shape
+    (n_buffer,) array of dtype SRC_T or a SourcesSoA of n_buffer-element
+    arrays), write the sources to its first `num_sources` elements, and return
+    `num_sources`. If `num_sources` exceeds n_buffer, nothing is written and
+    the caller must call again with a larger buffer.
+
+    Parameters
+    ----------
+    kernel : callable
+
+    Returns
+    -------
+    buffer_kernel : callable or None
+
+    """
+    py_func = getattr(kernel, 'py_func', kernel)
+
+    module = sys.modules.get(getattr(py_func, '__module__', None))
+    if module is None:
+        return None
+    return getattr(module, py_func.__name__ + BUFFER_KERNEL_SUFFIX, None)
+
+
+def empty_sources_soa(num_sources):
+    """Allocate (uninitialized) struct-of-arrays storage for sources.
+
+    Parameters
+    ----------
+    num_sources : int >= 0
+
+    Returns
+    -------
+    sources_soa : SourcesSoA
+        Each field is a contiguous shape (num_sources,) array of the dtype of
+        that field in SRC_T
+
+    """
+    return SourcesSoA(*[
+        np.empty(shape=num_sources, dtype=SRC_T.fields[name][0]) for name in SRC_T.names
+    ])
+
+
+def get_num_sources(sources):
+    """Get the number of sources in an array of dtype SRC_T or a SourcesSoA.
+
+    Parameters
+    ----------
+    sources : shape (n_sources,) array of dtype SRC_T, or SourcesSoA
+
+    Returns
+    -------
+    num_sources : int
+
+    """
+    if isinstance(sources, SourcesSoA):
+        return len(sources.time)
+    return len(sources)
+
+
+def slice_sources(sources, start, stop=None):
+    """Slice an array of dtype SRC_T or a SourcesSoA (the latter field by
+    field), returning views.
+
+    Parameters
+    ----------
+    sources : shape (n_sources,) array of dtype SRC_T, or SourcesSoA
+    start : int
+    stop : int, optional
+
+    Returns
+    -------
+    sources_slice : same type as `sources`
+
+    """
+    if isinstance(sources, SourcesSoA):
+        return SourcesSoA(*[field[start:stop] for field in sources])
+    return sources[start:stop]
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def sources_to_soa_into(sources, sources_soa):
+    """Convert an array of sources to struct-of-arrays layout, writing into
+    existing arrays (following the buffer protocol of the hypo kernels' `_into`
+    variants; see :func:`get_buffer_kernel`).
+
+    Parameters
+    ----------
+    sources : shape (n_sources,) array of dtype SRC_T
+    sources_soa : SourcesSoA
+        Sources are written to the first `n_sources` elements of each field. If
+        the fields have fewer elements, nothing is written.
+
+    Returns
+    -------
+    num_sources : int
+
+    """
+    num_sources = len(sources)
+    if num_sources > len(sources_soa.time):
+        return num_sources
+    for source_idx in range(num_sources):
+        src = sources[source_idx]
+        sources_soa.kind[source_idx] = src['kind']
+        sources_soa.time[source_idx] = src['time']
+        sources_soa.x[source_idx] = src['x']
+        sources_soa.y[source_idx] = src['y']
+        sources_soa.z[source_idx] = src['z']
+        sources_soa.photons[source_idx] = src['photons']
+        sources_soa.dir_costheta[source_idx] = src['dir_costheta']
+        sources_soa.dir_sintheta[source_idx] = src['dir_sintheta']
+        sources_soa.dir_phi[source_idx] = src['dir_phi']
+        sources_soa.dir_cosphi[source_idx] = src['dir_cosphi']
+        sources_soa.dir_sinphi[source_idx] = src['dir_sinphi']
+        sources_soa.ckv_theta[source_idx] = src['ckv_theta']
+        sources_soa.ckv_costheta[source_idx] = src['ckv_costheta']
+        sources_soa.ckv_sintheta[source_idx] = src['ckv_sintheta']
+    return num_sources
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def sources_to_soa(sources):
+    """Convert an array of sources to struct-of-arrays layout.
+
+    Parameters
+    ----------
+    sources : shape (n_sources,) array of dtype SRC_T
+
+    Returns
+    -------
+    sources_soa : SourcesSoA
+        Each field is a contiguous shape (n_sources,) array
+
+    """
+    num_sources = len(sources)
+    sources_soa = SourcesSoA(
+        np.empty(shape=num_sources, dtype=np.uint32),
+        np.empty(shape=num_sources, dtype=np.float32),
+        np.empty(shape=num_sources, dtype=np.float32),
+        np.empty(shape=num_sources, dtype=np.float32),
+        np.empty(shape=num_sources, dtype=np.float32),
+        np.empty(shape=num_sources, dtype=np.float32),
+        np.empty(shape=num_sources, dtype=np.float32),
+        np.empty(shape=num_sources, dtype=np.float32),
+        np.empty(shape=num_sources, dtype=np.float32),
+        np.empty(shape=num_sources, dtype=np.float32),
+        np.empty(shape=num_sources, dtype=np.float32),
+        np.empty(shape=num_sources, dtype=np.float32),
+        np.empty(shape=num_sources, dtype=np.float32),
+        np.empty(shape=num_sources, dtype=np.float32),
+    )
+    sources_to_soa_into(sources, sources_soa)
+    return sources_soa
+
+
 class DiscreteHypo(object):
     """Discretely-sampled event hypothesis.
 
@@ -103,6 +281,21 @@ class DiscreteHypo(object):
 
     scaling_kernel_kwargs : None or dict
 
+    Notes
+    -----
+    If every kernel of a kind (generic, pegleg, or scaling) has a
+    buffer-filling variant (see :func:`get_buffer_kernel`), the sources of that
+    kind are written into a buffer owned by this object and reused across
+    calls, instead of being allocated (and concatenated and sorted) anew. In
+    that case the arrays returned by `get_*_sources` are views into the buffer
+    and are only valid until the next call for the same kind of sources.
+
+    Likewise, `get_*_sources_soa` produce sources in struct-of-arrays buffers
+    owned by this object (written directly by the buffer-filling variants
+    where available), returning views that are only valid until the next call
+    for the same kind of sources. This is the layout consumed by the LLH
+    functions, so nothing needs to be allocated or converted per hypothesis.
+
     """
     def __init__(
         self,
@@ -171,6 +364,33 @@ class DiscreteHypo(object):
         self._opt_param_names = tuple(all_param_names)
         self.fixed_params = OrderedDict()
 
+        self.generic_buffer_kernels = None
+        """Buffer-filling variants of generic kernels (None unless all have one)"""
+
+        generic_buffer_kernels = tuple(get_buffer_kernel(k) for k in generic_kernels)
+        if all(generic_buffer_kernels):
+            self.generic_buffer_kernels = generic_buffer_kernels
+
+        self.pegleg_buffer_kernel = None
+        if pegleg_kernel:
+            self.pegleg_buffer_kernel = get_buffer_kernel(pegleg_kernel)
+
+        self.scaling_buffer_kernel = None
+        if scaling_kernel:
+            self.scaling_buffer_kernel = get_buffer_kernel(scaling_kernel)
+
+        self._sources_buffers = OrderedDict([
+            (kind, np.empty(shape=INITIAL_SOURCES_BUFFER_SIZE, dtype=SRC_T))
+            for kind in ('generic', 'pegleg', 'scaling')
+        ])
+        self._sources_soa_buffers = OrderedDict([
+            (kind, empty_sources_soa(INITIAL_SOURCES_BUFFER_SIZE))
+            for kind in ('generic', 'pegleg', 'scaling')
+        ])
+        self._sources_soa_views = OrderedDict([
+            (kind, (None, None, None)) for kind in ('generic', 'pegleg', 'scaling')
+        ])
+
     @property
     def opt_param_names(self):
         """tuple of strings : Hypothesis parameter names to be handled by a
@@ -214,6 +434,151 @@ class DiscreteHypo(object):
         """int: Number of hypothesis parameters to be handled by a generic optimizer"""
         return len(self.opt_param_names)
 
+    def _fill_sources_buffer(
+        self, kind, buffer_kernels, param_names, kernels_kwargs, hypo, soa=False
+    ):
+        """Write the sources from `buffer_kernels` one after the other into the
+        buffer for `kind` (the struct-of-arrays buffer if `soa`), growing it if
+        necessary.
+
+        Returns
+        -------
+        sources : shape (n_sources,) array of dtype SRC_T, or SourcesSoA
+            View into the buffer
+
+        """
+        buffers = self._sources_soa_buffers if soa else self._sources_buffers
+        buf = buffers[kind]
+        num_sources = 0
+        for buffer_kernel, kernel_param_names, kwargs in zip(
+            buffer_kernels, param_names, kernels_kwargs
+        ):
+            total_kwargs = {a:hypo[a] for a in kernel_param_names}
+            total_kwargs.update(kwargs)
+            while True:
+                num_kernel_sources = buffer_kernel(
+                    sources=slice_sources(buf, num_sources) if num_sources else buf,
+                    **total_kwargs
+                )
+                buf_size = get_num_sources(buf)
+                if num_sources + num_kernel_sources <= buf_size:
+                    break
+                new_size = max(2*buf_size, num_sources + num_kernel_sources)
+                if soa:
+                    new_buf = empty_sources_soa(new_size)
+                    for new_field, field in zip(new_buf, buf):
+                        new_field[:num_sources] = field[:num_sources]
+                else:
+                    new_buf = np.empty(shape=new_size, dtype=SRC_T)
+                    new_buf[:num_sources] = buf[:num_sources]
+                buf = new_buf
+                buffers[kind] = buf
+            num_sources += num_kernel_sources
+        if soa:
+            return self._get_sources_soa_view(kind, num_sources)
+        return buf[:num_sources]
+
+    def get_generic_sources_soa(self, hypo):
+        """Like `get_generic_sources` but return sources in struct-of-arrays
+        layout, written directly by buffer-filling kernels where available and
+        converted otherwise.
+
+        Returns
+        -------
+        sources : SourcesSoA
+            Views into a buffer owned by this object
+
+        """
+        hypo.update(self.fixed_params)
+        if self.generic_buffer_kernels is None:
+            return self._sources_to_soa_buffer('generic', self.get_generic_sources(hypo))
+        return self._fill_sources_buffer(
+            kind='generic',
+            buffer_kernels=self.generic_buffer_kernels,
+            param_names=self.generic_param_names,
+            kernels_kwargs=self.generic_kernels_kwargs,
+            hypo=hypo,
+            soa=True,
+        )
+
+    def get_pegleg_sources_soa(self, hypo):
+        """Like `get_pegleg_sources` but return sources in struct-of-arrays
+        layout; see `get_generic_sources_soa`.
+
+        Returns
+        -------
+        sources : SourcesSoA
+            Views into a buffer owned by this object
+
+        """
+        hypo.update(self.fixed_params)
+        if self.pegleg_kernel is None:
+            return self._get_sources_soa_view('pegleg', 0)
+        if self.pegleg_buffer_kernel is None:
+            return self._sources_to_soa_buffer('pegleg', self.get_pegleg_sources(hypo))
+        return self._fill_sources_buffer(
+            kind='pegleg',
+            buffer_kernels=(self.pegleg_buffer_kernel,),
+            param_names=(self.pegleg_param_names,),
+            kernels_kwargs=(self.pegleg_kernel_kwargs,),
+            hypo=hypo,
+            soa=True,
+        )
+
+    def get_scaling_sources_soa(self, hypo):
+        """Like `get_scaling_sources` but return sources in struct-of-arrays
+        layout; see `get_generic_sources_soa`.
+
+        Returns
+        -------
+        sources : SourcesSoA
+            Views into a buffer owned by this object
+
+        """
+        hypo.update(self.fixed_params)
+        if self.scaling_kernel is None:
+            return self._get_sources_soa_view('scaling', 0)
+        if self.scaling_buffer_kernel is None:
+            return self._sources_to_soa_buffer('scaling', self.get_scaling_sources(hypo))
+        return self._fill_sources_buffer(
+            kind='scaling',
+            buffer_kernels=(self.scaling_buffer_kernel,),
+            param_names=(self.scaling_param_names,),
+            kernels_kwargs=(self.scaling_kernel_kwargs,),
+            hypo=hypo,
+            soa=True,
+        )
+
+    def _sources_to_soa_buffer(self, kind, sources):
+        """Convert `sources` into the struct-of-arrays buffer for `kind`,
+        growing it if necessary.
+
+        Returns
+        -------
+        sources : SourcesSoA
+            Views into the buffer
+
+        """
+        num_sources = len(sources)
+        if num_sources > len(self._sources_soa_buffers[kind].time):
+            self._sources_soa_buffers[kind] = empty_sources_soa(
+                max(2*len(self._sources_soa_buffers[kind].time), num_sources)
+            )
+        sources_to_soa_into(sources, self._sources_soa_buffers[kind])
+        return self._get_sources_soa_view(kind, num_sources)
+
+    def _get_sources_soa_view(self, kind, num_sources):
+        """Get views of the first `num_sources` elements of the struct-of-arrays
+        buffer for `kind`; the last views of each kind are reused while the
+        buffer and number of sources are unchanged, as is typical from one
+        hypothesis to the next."""
+        buf = self._sources_soa_buffers[kind]
+        cached_buf, cached_num_sources, view = self._sources_soa_views[kind]
+        if cached_buf is not buf or cached_num_sources != num_sources:
+            view = slice_sources(buf, 0, num_sources)
+            self._sources_soa_views[kind] = (buf, num_sources, view)
+        return view
+
     def get_generic_sources(self, hypo):
         """Evaluate the discrete hypothesis (all hypo kernels) given particular
         parameters and return the sources produced by the hypothesis.
@@ -228,6 +593,16 @@ class DiscreteHypo(object):
 
         """
         hypo.update(self.fixed_params)
+        if self.generic_buffer_kernels is not None:
+            # Note that sources are left in the order the kernels produce them
+            # rather than sorted by time (nothing downstream depends on order)
+            return self._fill_sources_buffer(
+                kind='generic',
+                buffer_kernels=self.generic_buffer_kernels,
+                param_names=self.generic_param_names,
+                kernels_kwargs=self.generic_kernels_kwargs,
+                hypo=hypo,
+            )
         sources = []
         for kernel, param_names, kwargs in zip(
             self.generic_kernels,
@@ -262,6 +637,14 @@ class DiscreteHypo(object):
         hypo.update(self.fixed_params)
         if self.pegleg_kernel is None:
             return EMPTY_SOURCES
+        if self.pegleg_buffer_kernel is not None:
+            return self._fill_sources_buffer(
+                kind='pegleg',
+                buffer_kernels=(self.pegleg_buffer_kernel,),
+                param_names=(self.pegleg_param_names,),
+                kernels_kwargs=(self.pegleg_kernel_kwargs,),
+                hypo=hypo,
+            )
         total_kwargs = {a:hypo[a] for a in self.pegleg_param_names}
         total_kwargs.update(self.pegleg_kernel_kwargs)
         return self.pegleg_kernel(**total_kwargs)
@@ -285,6 +668,14 @@ class DiscreteHypo(object):
         hypo.update(self.fixed_params)
         if self.scaling_kernel is None:
             return EMPTY_SOURCES
+        if self.scaling_buffer_kernel is not None:
+            return self._fill_sources_buffer(
+                kind='scaling',
+                buffer_kernels=(self.scaling_buffer_kernel,),
+                param_names=(self.scaling_param_names,),
+                kernels_kwargs=(self.scaling_kernel_kwargs,),
+                hypo=hypo,
+            )
         total_kwargs = {a:hypo[a] for a in self.scaling_param_names}
         total_kwargs.update(self.scaling_kernel_kwargs)
         return self.scaling_kernel(**total_kwargs)
@@ -15,12 +15,17 @@ from __future__ import absolute_import, division, print_function
 __all__ = [
     'MUON_KINDS',
     'ALL_REALS',
-    'MULEN_INTERP',
-    'TABLE_LOWER_BOUND',
-    'TABLE_UPPER_BOUND',
+    'DEDX_FPATH',
+    'NUM_MULEN_SAMPLES',
+    'get_muon_length_table',
+    'get_mulen_interp',
+    'get_muen_interp',
     'pegleg_muon',
     'const_energy_loss_muon',
     'table_energy_loss_muon',
+    'pegleg_muon_into',
+    'const_energy_loss_muon_into',
+    'table_energy_loss_muon_into',
     'pegleg_eval',
 ]
 
@@ -39,23 +44,25 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.'''
 
+from collections import OrderedDict
 import csv
 import math
 from os.path import abspath, dirname, join
 import sys
 
 import numpy as np
-from scipy import interpolate
 
 RETRO_DIR = dirname(dirname(dirname(abspath(__file__))))
 if __name__ == '__main__' and __package__ is None:
     if RETRO_DIR not in sys.path:
         sys.path.append(RETRO_DIR)
+from retro import DFLT_NUMBA_JIT_KWARGS, numba_jit
 from retro.const import (
     COS_CKV, SIN_CKV, THETA_CKV, SPEED_OF_LIGHT_M_PER_NS, TRACK_M_PER_GEV,
     TRACK_PHOTONS_PER_M, SRC_CKV_BETA1, EMPTY_SOURCES
 )
 from retro.retro_types import SRC_T
+from retro.utils.misc import get_cached_arrays, get_file_md5
 
 
 MUON_KINDS = sorted([k[:-len('_muon')] for k in __all__ if k.endswith('_muon')])
@@ -220,32 +227,103 @@ def const_energy_loss_muon(
     return sources
 
 
-# Create spline (for table_energy_loss_muon)
-with open(join(RETRO_DIR, 'data', 'dedx_total_e.csv'), 'r') as csvfile:
-    # pylint: disable=invalid-name
-    reader = csv.reader(csvfile)
-    rows = []
-    for row in reader:
-        rows.append(row)
+DEDX_FPATH = join(RETRO_DIR, 'data', 'dedx_total_e.csv')
+"""Tabulated muon stopping power (dE/dx) vs. energy, used to compute muon
+length as a function of energy (see :func:`get_muon_length_table`)"""
 
-energies = np.array([float(x) for x in rows[0][1:]])
+NUM_MULEN_SAMPLES = int(1e4)
+"""Number of (log-spaced) energies at which muon length is tabulated"""
 
-TABLE_UPPER_BOUND = np.max(energies)
-TABLE_LOWER_BOUND = np.min(energies)
+_MUON_LENGTH_TABLE = OrderedDict()
+"""Holds the muon length table and interpolants once they are built"""
 
-stopping_power = np.array([float(x) for x in rows[1][1:]])
-dxde = interpolate.UnivariateSpline(x=energies, y=1/stopping_power, s=0, k=3)
-esamps = np.logspace(np.log10(TABLE_LOWER_BOUND), np.log10(TABLE_UPPER_BOUND), int(1e4))
-dxde_samps = np.clip(dxde(esamps), a_min=0, a_max=np.inf)
 
-lengths = [0]
-for idx, egy in enumerate(esamps[1:]):
-    lengths.append(np.trapz(y=dxde_samps[:idx+1], x=esamps[:idx+1]))
-lengths = np.clip(np.array(lengths), a_min=0, a_max=np.inf)
+def get_muon_length_table():
+    """Get muon length (in meters) tabulated vs. muon energy (in GeV), computed
+    from `DEDX_FPATH` the first time this is called and cached on disk (see
+    `retro.CACHE_DIR`) keyed by the hash of that file's contents.
 
-MULEN_INTERP = interpolate.UnivariateSpline(x=esamps, y=lengths, k=1, s=0)
-# does that work? :P
-MUEN_INTERP = interpolate.UnivariateSpline(y=esamps[1:], x=lengths[1:], k=1, s=0)
+    Returns
+    -------
+    table : OrderedDict
+        Keys are "energies" and "lengths" (both shape (NUM_MULEN_SAMPLES,)
+        arrays), and "bounds" (shape (2,) array with the lowest and highest
+        energies in `DEDX_FPATH`)
+
+    """
+    if 'table' in _MUON_LENGTH_TABLE:
+        return _MUON_LENGTH_TABLE['table']
+
+    def build():
+        """Integrate dx/dE, splined from the tabulated stopping power"""
+        from scipy import interpolate
+
+        with open(DEDX_FPATH, 'r') as csvfile:
+            rows = list(csv.reader(csvfile))
+
+        energies = np.array([float(x) for x in rows[0][1:]])
+        lower_bound, upper_bound = np.min(energies), np.max(energies)
+
+        stopping_power = np.array([float(x) for x in rows[1][1:]])
+        dxde = interpolate.UnivariateSpline(x=energies, y=1/stopping_power, s=0, k=3)
+        esamps = np.logspace(np.log10(lower_bound), np.log10(upper_bound), NUM_MULEN_SAMPLES)
+        dxde_samps = np.clip(dxde(esamps), a_min=0, a_max=np.inf)
+
+        # lengths[i] is the trapezoidal integral over the first i samples
+        # (i.e., excluding sample i itself)
+        cum_lengths = np.cumsum(0.5 * (dxde_samps[1:] + dxde_samps[:-1]) * np.diff(esamps))
+        lengths = np.zeros_like(esamps)
+        lengths[2:] = cum_lengths[:-1]
+        lengths = np.clip(lengths, a_min=0, a_max=np.inf)
+
+        return [
+            ('energies', esamps),
+            ('lengths', lengths),
+            ('bounds', np.array([lower_bound, upper_bound])),
+        ]
+
+    table = get_cached_arrays(
+        name='muon_lengths',
+        key='{}_{}'.format(get_file_md5(DEDX_FPATH)[:8], NUM_MULEN_SAMPLES),
+        build_func=build,
+    )
+    _MUON_LENGTH_TABLE['table'] = table
+    return table
+
+
+def get_mulen_interp():
+    """Get the interpolant for muon length (m) as a function of energy (GeV).
+
+    Returns
+    -------
+    mulen_interp : scipy.interpolate.UnivariateSpline
+
+    """
+    if 'mulen_interp' not in _MUON_LENGTH_TABLE:
+        from scipy import interpolate
+        table = get_muon_length_table()
+        _MUON_LENGTH_TABLE['mulen_interp'] = interpolate.UnivariateSpline(
+            x=table['energies'], y=table['lengths'], k=1, s=0
+        )
+    return _MUON_LENGTH_TABLE['mulen_interp']
+
+
+def get_muen_interp():
+    """Get the interpolant for muon energy (GeV) as a function of length (m).
+
+    Returns
+    -------
+    muen_interp : scipy.interpolate.UnivariateSpline
+
+    """
+    if 'muen_interp' not in _MUON_LENGTH_TABLE:
+        from scipy import interpolate
+        table = get_muon_length_table()
+        # does that work? :P
+        _MUON_LENGTH_TABLE['muen_interp'] = interpolate.UnivariateSpline(
+            y=table['energies'][1:], x=table['lengths'][1:], k=1, s=0
+        )
+    return _MUON_LENGTH_TABLE['muen_interp']
 
 
 def table_energy_loss_muon(
@@ -286,13 +364,14 @@ def table_energy_loss_muon(
     if track_energy == 0:
         return EMPTY_SOURCES
 
-    if track_energy > TABLE_UPPER_BOUND:
+    table_upper_bound = get_muon_length_table()['bounds'][1]
+    if track_energy > table_upper_bound:
         raise ValueError('Make sure to set energy bounds such that track_energy'
                          ' cannot exceed table upper limit of {:.3f}'
-                         ' GeV'.format(TABLE_UPPER_BOUND))
+                         ' GeV'.format(table_upper_bound))
 
     # Total expected length of muon from table
-    length = MULEN_INTERP(track_energy)
+    length = get_mulen_interp()(track_energy)
 
     # Since table cuts off, this can be 0 even for track_energy != 0
     if length <= 0:
@@ -343,6 +422,292 @@ def table_energy_loss_muon(
     return sources
 
 
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _fill_track_sources(
+    sources,
+    num_sources,
+    time,
+    x,
+    y,
+    z,
+    track_azimuth,
+    track_zenith,
+    dt,
+    sampled_dt_start,
+):
+    """Fill the first `num_sources` elements of `sources` (an array of dtype
+    SRC_T or a SourcesSoA) with equally-spaced (in time) track segments, the
+    first at `sampled_dt_start` and each following one `dt` later (i.e., what
+    the array-returning track kernels compute with `np.arange`)."""
+    segment_length = dt * SPEED_OF_LIGHT_M_PER_NS
+    photons_per_segment = segment_length * TRACK_PHOTONS_PER_M
+
+    # NOTE: add pi to make dir vector go in "math-standard" vector notation
+    opposite_zenith = np.pi - track_zenith
+    opposite_azimuth = np.pi + track_azimuth
+
+    dir_costheta = math.cos(opposite_zenith)
+    dir_sintheta = math.sin(opposite_zenith)
+
+    dir_cosphi = math.cos(opposite_azimuth)
+    dir_sinphi = math.sin(opposite_azimuth)
+
+    dir_x = dir_sintheta * dir_cosphi
+    dir_y = dir_sintheta * dir_sinphi
+    dir_z = dir_costheta
+
+    for source_idx in range(num_sources):
+        sampled_dt = sampled_dt_start + source_idx * dt
+        sources.kind[source_idx] = SRC_CKV_BETA1
+        sources.time[source_idx] = time + sampled_dt
+        sources.x[source_idx] = x + sampled_dt * (dir_x * SPEED_OF_LIGHT_M_PER_NS)
+        sources.y[source_idx] = y + sampled_dt * (dir_y * SPEED_OF_LIGHT_M_PER_NS)
+        sources.z[source_idx] = z + sampled_dt * (dir_z * SPEED_OF_LIGHT_M_PER_NS)
+        sources.photons[source_idx] = photons_per_segment
+
+        sources.dir_costheta[source_idx] = dir_costheta
+        sources.dir_sintheta[source_idx] = dir_sintheta
+
+        sources.dir_phi[source_idx] = opposite_azimuth
+        sources.dir_cosphi[source_idx] = dir_cosphi
+        sources.dir_sinphi[source_idx] = dir_sinphi
+
+        sources.ckv_theta[source_idx] = THETA_CKV
+        sources.ckv_costheta[source_idx] = COS_CKV
+        sources.ckv_sintheta[source_idx] = SIN_CKV
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _fill_length_track_sources(
+    sources,
+    time,
+    x,
+    y,
+    z,
+    length,
+    track_azimuth,
+    track_zenith,
+    dt,
+):
+    """Fill `sources` with the segments of a track of length `length`; see
+    :func:`const_energy_loss_muon_into` for the buffer protocol."""
+    # Same number of samples as `np.arange(dt*0.5, length/SPEED_OF_LIGHT_M_PER_NS, dt)`
+    num_sources = max(0, int(math.ceil((length/SPEED_OF_LIGHT_M_PER_NS - dt*0.5) / dt)))
+    sampled_dt_start = dt * 0.5
+    # At least one segment
+    if num_sources == 0:
+        num_sources = 1
+        sampled_dt_start = length/2./SPEED_OF_LIGHT_M_PER_NS
+
+    if num_sources > len(sources.time):
+        return num_sources
+
+    _fill_track_sources(
+        sources=sources,
+        num_sources=num_sources,
+        time=time,
+        x=x,
+        y=y,
+        z=z,
+        track_azimuth=track_azimuth,
+        track_zenith=track_zenith,
+        dt=dt,
+        sampled_dt_start=sampled_dt_start,
+    )
+    return num_sources
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def pegleg_muon_into(
+    sources,
+    time,
+    x,
+    y,
+    z,
+    track_azimuth,
+    track_zenith,
+    dt,
+    n_segments=3000,
+):
+    """Same as :func:`pegleg_muon` but writing sources into a caller-provided
+    buffer rather than allocating a new array.
+
+    Parameters
+    ----------
+    sources : shape (n_buffer,) array of dtype SRC_T, or SourcesSoA
+        Sources are written to the first `num_sources` elements. If the buffer
+        is too small, nothing is written.
+
+    time, x, y, z, track_azimuth, track_zenith, dt, n_segments
+        See :func:`pegleg_muon`
+
+    Returns
+    -------
+    num_sources : int
+        Number of sources for the hypothesis; if greater than the buffer's
+        length, call again with a buffer at least this large
+
+    """
+    # Same number of samples as `np.arange(dt*0.5, (n_segments + 0.5)*dt, dt)`
+    num_sources = max(0, int(math.ceil(((n_segments + 0.5)*dt - dt*0.5) / dt)))
+    if num_sources > len(sources.time):
+        return num_sources
+
+    _fill_track_sources(
+        sources=sources,
+        num_sources=num_sources,
+        time=time,
+        x=x,
+        y=y,
+        z=z,
+        track_azimuth=track_azimuth,
+        track_zenith=track_zenith,
+        dt=dt,
+        sampled_dt_start=dt*0.5,
+    )
+    return num_sources
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def const_energy_loss_muon_into(
+    sources,
+    time,
+    x,
+    y,
+    z,
+    track_energy,
+    track_azimuth,
+    track_zenith,
+    dt,
+):
+    """Same as :func:`const_energy_loss_muon` but writing sources into a
+    caller-provided buffer rather than allocating a new array.
+
+    Parameters
+    ----------
+    sources : shape (n_buffer,) array of dtype SRC_T, or SourcesSoA
+        Sources are written to the first `num_sources` elements. If the buffer
+        is too small, nothing is written.
+
+    time, x, y, z, track_energy, track_azimuth, track_zenith, dt
+        See :func:`const_energy_loss_muon`
+
+    Returns
+    -------
+    num_sources : int
+        Number of sources for the hypothesis; if greater than the buffer's
+        length, call again with a buffer at least this large
+
+    """
+    if track_energy == 0:
+        return 0
+
+    return _fill_length_track_sources(
+        sources=sources,
+        time=time,
+        x=x,
+        y=y,
+        z=z,
+        length=track_energy * TRACK_M_PER_GEV,
+        track_azimuth=track_azimuth,
+        track_zenith=track_zenith,
+        dt=dt,
+    )
+
+
+def table_energy_loss_muon_into(
+    sources,
+    time,
+    x,
+    y,
+    z,
+    track_energy,
+    track_azimuth,
+    track_zenith,
+    dt,
+):
+    """Same as :func:`table_energy_loss_muon` but writing sources into a
+    caller-provided buffer rather than allocating a new array.
+
+    Parameters
+    ----------
+    sources : shape (n_buffer,) array of dtype SRC_T, or SourcesSoA
+        Sources are written to the first `num_sources` elements. If the buffer
+        is too small, nothing is written.
+
+    time, x, y, z, track_energy, track_azimuth, track_zenith, dt
+        See :func:`table_energy_loss_muon`
+
+    Returns
+    -------
+    num_sources : int
+        Number of sources for the hypothesis; if greater than the buffer's
+        length, call again with a buffer at least this large
+
+    """
+    table = get_muon_length_table()
+    return _table_energy_loss_muon_into(
+        sources=sources,
+        time=time,
+        x=x,
+        y=y,
+        z=z,
+        track_energy=track_energy,
+        track_azimuth=track_azimuth,
+        track_zenith=track_zenith,
+        dt=dt,
+        mulen_energies=table['energies'],
+        mulen_lengths=table['lengths'],
+        table_upper_bound=table['bounds'][1],
+    )
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _table_energy_loss_muon_into(
+    sources,
+    time,
+    x,
+    y,
+    z,
+    track_energy,
+    track_azimuth,
+    track_zenith,
+    dt,
+    mulen_energies,
+    mulen_lengths,
+    table_upper_bound,
+):
+    """Compiled implementation of :func:`table_energy_loss_muon_into`, with
+    the muon length table passed in"""
+    # Check for no-track condition
+    if track_energy == 0:
+        return 0
+
+    if track_energy > table_upper_bound:
+        raise ValueError('Make sure to set energy bounds such that track_energy'
+                         ' cannot exceed table upper limit')
+
+    # Total expected length of muon from table (linear interpolation, as done
+    # by the interpolant from `get_mulen_interp`)
+    length = np.interp(track_energy, mulen_energies, mulen_lengths)
+
+    # Since table cuts off, this can be 0 even for track_energy != 0
+    if length <= 0:
+        return 0
+
+    return _fill_length_track_sources(
+        sources=sources,
+        time=time,
+        x=x,
+        y=y,
+        z=z,
+        length=length,
+        track_azimuth=track_azimuth,
+        track_zenith=track_zenith,
+        dt=dt,
+    )
+
+
 def pegleg_eval(pegleg_idx, dt, const_e_loss, mmc=False):
     """Convert a pegleg index into track energy in GeV.
 
@@ -367,4 +732,4 @@ def pegleg_eval(pegleg_idx, dt, const_e_loss, mmc=False):
         a = 0.268
         b = 0.00047
         return (np.exp(length*b) - 1)*a/b
-    return MUEN_INTERP(length)
+    return get_muen_interp()(length)
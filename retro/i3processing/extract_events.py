@@ -27,7 +27,6 @@ from argparse import ArgumentParser
 from collections import OrderedDict
 from copy import deepcopy
 from os.path import abspath, basename, dirname, join
-import cPickle as pickle
 import re
 import sys
 
@@ -39,6 +38,7 @@ if __name__ == '__main__' and __package__ is None:
         sys.path.append(RETRO_DIR)
 from retro.retro_types import PHOTON_T, PULSE_T, TRIGGER_T
 from retro.utils.misc import expand, mkdir
+from retro.utils.ragged import save_ragged_series
 
 
 FILENAME_INFO_RE = re.compile(
@@ -718,15 +718,15 @@ def extract_events(
     if truth:
         np.save(join(outdir, 'truth.npy'), np.array(truths))
 
+    # Series are stored in ragged columnar format (see retro.utils.ragged)
+    # such that single events can be read without unpickling entire files
     for name in photons:
-        pickle.dump(photons_d[name],
-                    open(join(photon_series_dir, name + '.pkl'), 'wb'),
-                    protocol=pickle.HIGHEST_PROTOCOL)
+        save_ragged_series(join(photon_series_dir, name), photons_d[name],
+                           dtype=PHOTON_T, per_dom=True)
 
     for name in pulses:
-        pickle.dump(pulses_d[name],
-                    open(join(pulse_series_dir, name + '.pkl'), 'wb'),
-                    protocol=pickle.HIGHEST_PROTOCOL)
+        save_ragged_series(join(pulse_series_dir, name), pulses_d[name],
+                           dtype=PULSE_T, per_dom=True)
         np.save(join(pulse_series_dir, name + 'TimeRange' + '.npy'),
                 np.array(pulses_d[name + 'TimeRange'], dtype=np.float32))
 
@@ -734,9 +734,9 @@ def extract_events(
         np.save(join(recos_dir, name + '.npy'), np.array(recos_d[name]))
 
     for name in triggers:
-        pickle.dump(trigger_hierarchies[name],
-                    open(join(trigger_hierarchy_dir, name + '.pkl'), 'wb'),
-                    protocol=pickle.HIGHEST_PROTOCOL)
+        save_ragged_series(join(trigger_hierarchy_dir, name),
+                           trigger_hierarchies[name], dtype=TRIGGER_T,
+                           per_dom=False)
 
 
 def parse_args(description=__doc__):
@@ -56,9 +56,13 @@ from retro.retro_types import (
     HIT_T, SD_INDEXER_T, HITS_SUMMARY_T, ConfigID, TypeID, SourceID
 )
 from retro.tables.retro_5d_tables import (
-    NORM_VERSIONS, TABLE_KINDS, Retro5DTables
+    NORM_VERSIONS, TABLE_KINDS, Retro5DTables, cast_table_to_ftype,
+    get_table_validation_facts
 )
 from retro.utils.misc import expand
+from retro.utils.ragged import (
+    EventSeries, is_ragged_series, iterate_ragged_series
+)
 
 
 I3_FNAME_INFO_RE = re.compile(
@@ -87,6 +91,8 @@ def setup_dom_tables(
     compute_t_indep_exp=True,
     no_noise=False,
     force_no_mmap=False,
+    convolve_time_jitter=False,
+    num_load_threads=1,
 ):
     """Instantiate and load single-DOM tables.
 
@@ -104,6 +110,15 @@ def setup_dom_tables(
     compute_t_indep_exp : bool, optional
     no_noise : bool, optional
     force_no_mmap : bool, optional
+    convolve_time_jitter : bool, optional
+        Convolve the time-dependent tables with the DOM jitter kernel (see
+        `retro.tables.pexp_5d.get_jitter_kernel`) so `pexp` needs only a single
+        lookup per hit and source. Each convolved table file is cached to
+        (and subsequently loaded from) a file alongside the original table
+        (or in `retro.CACHE_DIR` if that is not writable) with a name
+        identifying the jitter kernel.
+    num_load_threads : int, optional
+        Number of table files to read from disk concurrently
 
     Returns
     -------
@@ -146,6 +161,7 @@ def setup_dom_tables(
     )
 
     if '{subdet' in dom_tables_fname_proto:
+        fpaths_sd_indices = []
         doms = const.ALL_DOMS
         for subdet in ['ic', 'dc']:
             if subdet == 'ic':
@@ -168,12 +184,14 @@ def setup_dom_tables(
                 if not shared_table_sd_indices:
                     continue
 
-                dom_tables.load_table(
-                    fpath=fpath,
-                    sd_indices=shared_table_sd_indices,
-                    step_length=step_length,
-                    mmap=mmap,
-                )
+                fpaths_sd_indices.append((fpath, shared_table_sd_indices))
+
+        dom_tables.load_tables(
+            fpaths_sd_indices=fpaths_sd_indices,
+            step_length=step_length,
+            mmap=mmap,
+            num_threads=num_load_threads,
+        )
 
     elif '{string}' in dom_tables_fname_proto:
         raise NotImplementedError('dom_tables_fname_proto with {string} not'
@@ -184,6 +202,7 @@ def setup_dom_tables(
                                   ' not implemented')
 
     elif '{cluster_idx}' in dom_tables_fname_proto:
+        fpaths_sd_indices = []
         cluster_idx = -1
         while True:
             cluster_idx += 1
@@ -198,12 +217,14 @@ def setup_dom_tables(
             sd_indices = set(const.omkeys_to_sd_indices(omkeys))
             shared_table_sd_indices = sd_indices.intersection(use_sd_indices)
 
-            dom_tables.load_table(
-                fpath=dpath,
-                sd_indices=shared_table_sd_indices,
-                step_length=step_length,
-                mmap=mmap,
-            )
+            fpaths_sd_indices.append((dpath, shared_table_sd_indices))
+
+        dom_tables.load_tables(
+            fpaths_sd_indices=fpaths_sd_indices,
+            step_length=step_length,
+            mmap=mmap,
+            num_threads=num_load_threads,
+        )
 
     else:
         stacked_tables_fpath = expand(join(
@@ -222,16 +243,36 @@ def setup_dom_tables(
             stacked_tables_meta_fpath=stacked_tables_meta_fpath,
             stacked_tables_fpath=stacked_tables_fpath,
             stacked_t_indep_tables_fpath=stacked_t_indep_tables_fpath,
+            mmap_tables=mmap,
             mmap_t_indep=mmap,
+            num_threads=num_load_threads,
+        )
+
+    if convolve_time_jitter:
+        from retro.tables.pexp_5d import get_jitter_kernel
+        jitter_dt, jitter_weights = get_jitter_kernel()
+        dom_tables.convolve_time_jitter(
+            jitter_dt=jitter_dt,
+            jitter_weights=jitter_weights,
+            use_cache=True,
+            mmap=mmap,
         )
 
-    for table in dom_tables.tables:
-        assert np.all(np.isfinite(table['weight'])), 'table not finite!'
-        assert np.all(table['weight'] >= 0), 'table is negative!'
-        assert np.min(table['index']) >= 0, 'table has negative index'
-        if dom_tables.template_library is not None:
-            assert np.max(table['index']) < dom_tables.template_library.shape[0], \
-                    'table too large index'
+    # Validation results for memory-mapped tables are cached alongside them,
+    # so unchanged tables need not be read in their entirety at every startup
+    if dom_tables.is_stacked:
+        tables = [dom_tables.tables]
+    else:
+        tables = dom_tables.tables
+    for table in tables:
+        facts = get_table_validation_facts(table)
+        assert facts['all_finite'], 'table not finite!'
+        assert facts['all_nonnegative'], 'table is negative!'
+        if 'min_index' in facts:
+            assert facts['min_index'] >= 0, 'table has negative index'
+            if dom_tables.template_library is not None:
+                assert facts['max_index'] < dom_tables.template_library.shape[0], \
+                        'table too large index'
     if dom_tables.template_library is not None:
         assert np.all(np.isfinite(dom_tables.template_library)), 'templates not finite!'
         assert np.all(dom_tables.template_library >= 0), 'templates have negative values!'
@@ -277,7 +318,7 @@ def setup_tdi_tables(tdi=None, mmap=False):
         be = load_pickle(join(dirname(tdi_), 'tdi_bin_edges.pkl'))
         meta = load_pickle(join(dirname(tdi_), 'tdi_metadata.pkl'))
         meta['bin_edges'] = be
-        tdi_table = np.load(tdi_, mmap_mode=mmap_mode)
+        tdi_table = cast_table_to_ftype(np.load(tdi_, mmap_mode=mmap_mode))
 
         tdi_metas.append(meta)
         tdi_tables.append(tdi_table)
@@ -489,14 +530,14 @@ def get_events(
         photons = sorted(photons)
         file_iterator_tree['photons'] = iterators = OrderedDict()
         for photon_series in photons:
-            iterators[photon_series] = iterate_file(
-                fpath=join(events_base, 'photons', photon_series + '.pkl'), **slice_kw
+            iterators[photon_series] = iterate_series(
+                join(events_base, 'photons', photon_series), **slice_kw
             )
     if pulses:
         file_iterator_tree['pulses'] = iterators = OrderedDict()
         for pulse_series in sorted(pulses):
-            iterators[pulse_series] = iterate_file(
-                fpath=join(events_base, 'pulses', pulse_series + '.pkl'), **slice_kw
+            iterators[pulse_series] = iterate_series(
+                join(events_base, 'pulses', pulse_series), **slice_kw
             )
             iterators[pulse_series + 'TimeRange'] = iterate_file(
                 fpath=join(events_base,
@@ -513,8 +554,8 @@ def get_events(
     if triggers:
         file_iterator_tree['triggers'] = iterators = OrderedDict()
         for trigger_hier in sorted(triggers):
-            iterators[trigger_hier] = iterate_file(
-                fpath=join(events_base, 'triggers', trigger_hier + '.pkl'), **slice_kw
+            iterators[trigger_hier] = iterate_series(
+                join(events_base, 'triggers', trigger_hier), **slice_kw
             )
 
     if hits and hits[0] == 'photons':
@@ -545,6 +586,29 @@ def get_events(
         event_idx += step
 
 
+def iterate_series(path, start=0, stop=None, step=None):
+    """Iterate through events' photon, pulse, or trigger series stored either
+    in ragged format (see `retro.utils.ragged`) in directory `path` or, if no
+    such directory exists, in the legacy pickle file "`path`.pkl".
+
+    Parameters
+    ----------
+    path : string
+        Path to the series, without extension
+    start, stop, step : optional
+        Arguments passed to `slice` for extracting select events
+
+    Yields
+    ------
+    series : EventSeries, array, or sequence
+        Series of each event
+
+    """
+    if is_ragged_series(path):
+        return iterate_ragged_series(path, start=start, stop=stop, step=step)
+    return iterate_file(fpath=path + '.pkl', start=start, stop=stop, step=step)
+
+
 def iterate_file(fpath, start=0, stop=None, step=None):
     """Iterate through the elements in a pickle (.pkl) or numpy (.npy) file. If
     a pickle file, structure must be a sequence of objects, one object per
@@ -616,6 +680,9 @@ def get_hits(event, path, angsens_model=None):
     event
 
     path
+        Path within `event` to the series; this is either a sequence of
+        ``((string, dom, pmt), items)`` tuples (as stored in legacy pickle
+        files) or an `EventSeries` (as retrieved from ragged storage)
 
     angsens_model : str, numpy.polynomial.Polynomial, or None
         If specified and photons are extracted, weights for the photons will be
@@ -699,14 +766,7 @@ def get_hits(event, path, angsens_model=None):
             time_window_start = min(time_window_start, tr_time + left_dt)
             time_window_stop = max(time_window_stop, tr_time + right_dt)
 
-    hits = []
-    hits_indexer = []
-    offset = 0
-
-    for (string, dom, pmt), p in series:
-        sd_idx = const.get_sd_idx(string=string, dom=dom, pmt=pmt)
-        num = len(p)
-        sd_hits = np.empty(shape=num, dtype=HIT_T)
+    def fill_hits(sd_hits, p):
         sd_hits['time'] = p['time']
         if not photons:
             sd_hits['charge'] = p['charge']
@@ -715,15 +775,41 @@ def get_hits(event, path, angsens_model=None):
         else:
             sd_hits['charge'] = 1
 
-        hits.append(sd_hits)
-        hits_indexer.append((sd_idx, offset, num))
-        offset += num
+    if isinstance(series, EventSeries):
+        # Ragged storage already holds the event's items contiguously, in DOM
+        # order, so hits can be filled in one go from the flat data
+        doms = series.doms
+        if np.any(doms['pmt'] > 0):
+            raise NotImplementedError('PMT != 0 is not implemented')
+        hits = np.empty(shape=len(series.data), dtype=HIT_T)
+        fill_hits(hits, series.data)
+        hits_indexer = np.empty(shape=len(doms), dtype=SD_INDEXER_T)
+        hits_indexer['sd_idx'] = const.get_sd_idx(
+            string=doms['string'].astype(np.int64), dom=doms['dom'].astype(np.int64)
+        )
+        hits_indexer['offset'] = doms['offset']
+        hits_indexer['num'] = doms['num']
 
-    hits = np.concatenate(hits) #, dtype=HIT_T)
-    if hits.dtype != HIT_T:
-        raise TypeError('got dtype {}'.format(hits.dtype))
+    else:
+        hits = []
+        hits_indexer = []
+        offset = 0
 
-    hits_indexer = np.array(hits_indexer, dtype=SD_INDEXER_T)
+        for (string, dom, pmt), p in series:
+            sd_idx = const.get_sd_idx(string=string, dom=dom, pmt=pmt)
+            num = len(p)
+            sd_hits = np.empty(shape=num, dtype=HIT_T)
+            fill_hits(sd_hits, p)
+
+            hits.append(sd_hits)
+            hits_indexer.append((sd_idx, offset, num))
+            offset += num
+
+        hits = np.concatenate(hits) #, dtype=HIT_T)
+        if hits.dtype != HIT_T:
+            raise TypeError('got dtype {}'.format(hits.dtype))
+
+        hits_indexer = np.array(hits_indexer, dtype=SD_INDEXER_T)
 
     hit_times = hits['time']
     hit_charges = hits['charge']
@@ -898,6 +984,18 @@ def parse_args(
             help='''Specify to NOT memory map the tables. If not specified, a
             sensible default is chosen for the type of tables being used.'''
         )
+        group.add_argument(
+            '--convolve-time-jitter', action='store_true',
+            help='''Convolve the DOM tables with the time-jitter kernel when
+            loading them, replacing the jitter sampling done for every
+            hit in pexp with a single table lookup'''
+        )
+        group.add_argument(
+            '--num-load-threads', type=int, default=1,
+            help='''Number of table files to read concurrently; values > 1
+            can greatly reduce startup time when loading many tables, or
+            tables on a network filesystem'''
+        )
 
     if tdi_tables:
         group = parser.add_argument_group(
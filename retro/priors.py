@@ -3,7 +3,9 @@
 # pylint: disable=wrong-import-position, too-many-return-statements
 
 """
-Prior definition generator and prior funcion generator to use for multinest
+Prior definition generator and prior funcion generator to use for multinest,
+plus a compiled prior "engine" that transforms an entire parameter vector (or
+a batch of them) from the unit hypercube in a single nopython call
 """
 
 from __future__ import absolute_import, division, print_function
@@ -17,7 +19,13 @@ __all__ = [
     'PRI_SPEFIT2',
     'PRI_SPEFIT2TIGHT',
     'PRI_CAUCHY',
+    'PRI_KIND_CODES',
+    'get_prior_def',
     'get_prior_fun',
+    'get_prior_engine',
+    'prior_transform',
+    'prior_transform_batch',
+    'prior_transform_inverse',
 ]
 
 __author__ = 'J.L. Lanfranchi, P. Eller'
@@ -35,18 +43,19 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.'''
 
+import math
 from math import acos, exp
 
 from os.path import abspath, dirname
 import sys
 
 import numpy as np
-from scipy import stats
 
 if __name__ == '__main__' and __package__ is None:
     RETRO_DIR = dirname(dirname(abspath(__file__)))
     if RETRO_DIR not in sys.path:
         sys.path.append(RETRO_DIR)
+from retro import DFLT_NUMBA_JIT_KWARGS, numba_jit
 from retro.const import TWO_PI
 
 
@@ -59,14 +68,108 @@ PRI_SPEFIT2 = 'spefit2'
 PRI_SPEFIT2TIGHT = 'spefit2tight'
 PRI_CAUCHY = 'cauchy'
 
+_PRI_UNIT_UNIFORM = 0
+_PRI_UNIFORM = 1
+_PRI_LOG_UNIFORM = 2
+_PRI_COSINE = 3
+_PRI_LOG_NORMAL = 4
+_PRI_CAUCHY = 5
 
-def get_prior_fun(dim_num, dim_name, event, **kwargs):
-    """Generate prior function given a prior definition and the actual event
+PRI_KIND_CODES = {
+    PRI_UNIFORM: _PRI_UNIFORM,
+    PRI_LOG_UNIFORM: _PRI_LOG_UNIFORM,
+    PRI_COSINE: _PRI_COSINE,
+    PRI_LOG_NORMAL: _PRI_LOG_NORMAL,
+    PRI_CAUCHY: _PRI_CAUCHY,
+}
+"""Integer codes identifying each prior kind to the compiled prior engine (see
+`get_prior_engine`)"""
+
+_NUM_PRIOR_PARAMS = 5
+"""Max number of parameters describing a single dimension's prior"""
+
+_SQRT2 = math.sqrt(2)
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _norm_isf(q):
+    """Inverse survival function of the standard normal distribution for `q`
+    in (0, 1), i.e. sqrt(2) * erfinv(1 - 2*q).
+
+    Uses P. J. Acklam's rational approximation (relative error < 1.2e-9)
+    refined by one Halley iteration on `math.erfc`, giving close to double
+    precision. Everything is formulated in terms of the smaller of `q` and
+    1 - `q` (rather than going through 1 - 2*`q`) to retain precision far into
+    the tails.
+
+    """
+    tail = min(q, 1 - q)
+
+    if tail < 0.02425:
+        r = math.sqrt(-2 * math.log(tail))
+        x = -(
+            ((((-7.784894002430293e-03*r - 3.223964580411365e-01)*r
+               - 2.400758277161838e+00)*r - 2.549732539343734e+00)*r
+             + 4.374664141464968e+00)*r + 2.938163982698783e+00
+        ) / (
+            (((7.784695709041462e-03*r + 3.224671290700398e-01)*r
+              + 2.445134137142996e+00)*r + 3.754408661907416e+00)*r + 1
+        )
+    else:
+        r = 0.5 - tail
+        rsq = r * r
+        x = r * (
+            ((((-3.969683028665376e+01*rsq + 2.209460984245205e+02)*rsq
+               - 2.759285104469687e+02)*rsq + 1.383577518672690e+02)*rsq
+             - 3.066479806614716e+01)*rsq + 2.506628277459239e+00
+        ) / (
+            ((((-5.447609879822406e+01*rsq + 1.615858368580409e+02)*rsq
+               - 1.556989798598866e+02)*rsq + 6.680131188771972e+01)*rsq
+             - 1.328068155288572e+01)*rsq + 1
+        )
+
+    # x >= 0 is now the approximate upper-tail quantile of `tail`
+    pdf = math.exp(-0.5 * x * x) / math.sqrt(2 * math.pi)
+    if pdf > 0:
+        u = (0.5 * math.erfc(x / _SQRT2) - tail) / pdf
+        x += u / (1 - 0.5 * u * x)
+
+    if q > 0.5:
+        return -x
+    return x
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _cauchy_isf(q, loc, scale):
+    """Inverse survival function of the Cauchy distribution; equivalent to
+    `scipy.stats.cauchy(loc, scale).isf(q)`"""
+    return loc + scale * math.tan(math.pi * (0.5 - q))
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _lognorm_isf(q, shape, loc, scale, high):
+    """Inverse survival function of the lognormal distribution; equivalent to
+    `scipy.stats.lognorm(shape, loc, scale).isf(q)` except that `high` is
+    returned where the result would be infinite (`q` <= 0)"""
+    if q <= 0:
+        return high
+    if q >= 1:
+        return loc
+    return loc + scale * math.exp(shape * _norm_isf(q))
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def _clip(val, low, high):
+    """Clip scalar `val` to the range [`low`, `high`]"""
+    return min(max(val, low), high)
+
+
+def get_prior_def(dim_name, event, **kwargs):
+    """Generate the prior definition for a dimension given user-specified
+    options and the actual event
 
     Parameters
     ----------
-    dim_num : int
-        the cube dimension number from multinest
     dim_name : str
         parameter name
     event : event
@@ -74,8 +177,8 @@ def get_prior_fun(dim_num, dim_name, event, **kwargs):
 
     Returns
     -------
-    prior_func : callable
     prior_def : tuple
+        (kind, args)
 
     """
     hits_summary = event['hits_summary']
@@ -260,8 +363,28 @@ def get_prior_fun(dim_num, dim_name, event, **kwargs):
         kind = kwargs.get('kind', None)
         raise ValueError('Unknown prior %s for dim %s'%(kind, dim_name))
 
-    # create prior function
+    return prior_def
+
+
+def get_prior_fun(dim_num, dim_name, event, **kwargs):
+    """Generate prior function given a prior definition and the actual event
+
+    Parameters
+    ----------
+    dim_num : int
+        the cube dimension number from multinest
+    dim_name : str
+        parameter name
+    event : event
+    kwargs : any additional arguments
+
+    Returns
+    -------
+    prior_func : callable
+    prior_def : tuple
 
+    """
+    prior_def = get_prior_def(dim_name=dim_name, event=event, **kwargs)
     kind, args = prior_def
 
     if kind == PRI_UNIFORM:
@@ -299,17 +422,270 @@ def get_prior_fun(dim_num, dim_name, event, **kwargs):
 
     elif kind == PRI_LOG_NORMAL:
         shape, loc, scale, low, high = args
-        lognorm = stats.lognorm(shape, loc, scale)
-        def prior_func(cube, lognorm=lognorm, n=dim_num, low=low, high=high): # pylint: disable=missing-docstring
-            cube[n] = np.clip(lognorm.isf(cube[n]), a_min=low, a_max=high)
+        def prior_func(cube, n=dim_num, shape=shape, loc=loc, scale=scale, low=low, high=high): # pylint: disable=missing-docstring
+            cube[n] = _clip(_lognorm_isf(cube[n], shape, loc, scale, high), low, high)
 
     elif kind == PRI_CAUCHY:
         loc, scale, low, high = args
-        cauchy = stats.cauchy(loc=loc, scale=scale)
-        def prior_func(cube, cauchy=cauchy, n=dim_num, low=low, high=high): # pylint: disable=missing-docstring
-            cube[n] = np.clip(cauchy.isf(cube[n]), a_min=low, a_max=high)
+        def prior_func(cube, n=dim_num, loc=loc, scale=scale, low=low, high=high): # pylint: disable=missing-docstring
+            cube[n] = _clip(_cauchy_isf(cube[n], loc, scale), low, high)
     else:
         raise NotImplementedError('Prior "{}" not implemented.'
                                   .format(kind))
 
     return prior_func, prior_def
+
+
+def get_prior_engine(prior_defs):
+    """Encode prior definitions (as returned by `get_prior_def`) as arrays
+    for use by `prior_transform` and `prior_transform_batch`.
+
+    Each dimension is described by an integer kind code and up to
+    `_NUM_PRIOR_PARAMS` floating-point parameters:
+
+    * uniform on [0, 1]: no parameters (the transform is a no-op)
+    * uniform: (minval, width)
+    * log_uniform: (log_min, log_width)
+    * cosine: no parameters
+    * log_normal: (shape, loc, scale, low, high)
+    * cauchy: (loc, scale, low, high)
+
+    Parameters
+    ----------
+    prior_defs : sequence of tuples
+        One (kind, args) tuple per dimension, in the order of the dimensions
+        in the cube
+
+    Returns
+    -------
+    kinds : shape (n_dims,) array of uint8
+    params : shape (n_dims, _NUM_PRIOR_PARAMS) array of float64
+
+    """
+    n_dims = len(prior_defs)
+    kinds = np.empty(shape=n_dims, dtype=np.uint8)
+    params = np.zeros(shape=(n_dims, _NUM_PRIOR_PARAMS), dtype=np.float64)
+
+    for dim_num, (kind, args) in enumerate(prior_defs):
+        if kind not in PRI_KIND_CODES:
+            raise NotImplementedError('Prior "{}" not implemented.'.format(kind))
+        code = PRI_KIND_CODES[kind]
+
+        if kind == PRI_UNIFORM:
+            if tuple(args) == (0, 1):
+                code = _PRI_UNIT_UNIFORM
+            else:
+                minval = np.min(args)
+                params[dim_num, :2] = (minval, np.max(args) - minval)
+        elif kind == PRI_LOG_UNIFORM:
+            params[dim_num, :2] = (
+                np.log(np.min(args)), np.log(np.max(args) / np.min(args))
+            )
+        elif kind == PRI_COSINE:
+            assert tuple(args) == (0, np.pi)
+        else:
+            params[dim_num, :len(args)] = args
+
+        kinds[dim_num] = code
+
+    return kinds, params
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def prior_transform(cube, kinds, params):
+    """Map a point in the unit hypercube onto physical parameter values,
+    in-place.
+
+    Parameters
+    ----------
+    cube : shape (n_dims,) array of float64
+    kinds, params : arrays
+        As returned by `get_prior_engine`
+
+    """
+    for dim_num in range(kinds.shape[0]):
+        kind = kinds[dim_num]
+        val = cube[dim_num]
+        if kind == _PRI_UNIFORM:
+            val = val * params[dim_num, 1] + params[dim_num, 0]
+        elif kind == _PRI_LOG_UNIFORM:
+            val = math.exp(val * params[dim_num, 1] + params[dim_num, 0])
+        elif kind == _PRI_COSINE:
+            val = math.acos(2 * val - 1)
+        elif kind == _PRI_LOG_NORMAL:
+            high = params[dim_num, 4]
+            val = _clip(
+                _lognorm_isf(
+                    val, params[dim_num, 0], params[dim_num, 1],
+                    params[dim_num, 2], high
+                ),
+                params[dim_num, 3],
+                high,
+            )
+        elif kind == _PRI_CAUCHY:
+            val = _clip(
+                _cauchy_isf(val, params[dim_num, 0], params[dim_num, 1]),
+                params[dim_num, 2],
+                params[dim_num, 3],
+            )
+        cube[dim_num] = val
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def prior_transform_batch(cubes, kinds, params):
+    """Apply `prior_transform` to each row of `cubes`, in-place.
+
+    Parameters
+    ----------
+    cubes : shape (n_points, n_dims) array of float64
+    kinds, params : arrays
+        As returned by `get_prior_engine`
+
+    """
+    for point_idx in range(cubes.shape[0]):
+        prior_transform(cubes[point_idx], kinds, params)
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def prior_transform_inverse(param_vals, kinds, params, cube):
+    """Find the point in the unit hypercube that `prior_transform` maps onto
+    physical parameter values `param_vals`.
+
+    Each dimension's transform is monotonic (increasing or decreasing), so the
+    inverse is found by bisection, simultaneously in all dimensions. Values
+    outside the range of a dimension's prior map onto the nearest edge of the
+    cube.
+
+    Parameters
+    ----------
+    param_vals : shape (n_dims,) array of float64
+    kinds, params : arrays
+        As returned by `get_prior_engine`
+    cube : shape (n_dims,) array of float64
+        Populated with the result
+
+    """
+    n_dims = kinds.shape[0]
+    low = np.zeros(n_dims)
+    high = np.ones(n_dims)
+
+    # Determine direction of each transform away from the (possibly infinite)
+    # values at the edges of the cube
+    quarter_vals = np.empty(n_dims)
+    for dim_num in range(n_dims):
+        quarter_vals[dim_num] = 0.25
+    prior_transform(quarter_vals, kinds, params)
+    for dim_num in range(n_dims):
+        cube[dim_num] = 0.75
+    prior_transform(cube, kinds, params)
+    increasing = np.empty(n_dims, dtype=np.bool_)
+    for dim_num in range(n_dims):
+        increasing[dim_num] = cube[dim_num] >= quarter_vals[dim_num]
+
+    for _ in range(64):
+        for dim_num in range(n_dims):
+            cube[dim_num] = 0.5 * (low[dim_num] + high[dim_num])
+        prior_transform(cube, kinds, params)
+        for dim_num in range(n_dims):
+            mid = 0.5 * (low[dim_num] + high[dim_num])
+            if (cube[dim_num] < param_vals[dim_num]) == increasing[dim_num]:
+                low[dim_num] = mid
+            else:
+                high[dim_num] = mid
+
+    for dim_num in range(n_dims):
+        cube[dim_num] = 0.5 * (low[dim_num] + high[dim_num])
+
+
+def test_prior_transform():
+    """Unit tests for `prior_transform_batch` and `prior_transform_inverse`,
+    comparing the former against the scipy-based transforms it replaces"""
+    from scipy import stats
+
+    prior_defs = [
+        (PRI_UNIFORM, (0, 1)),
+        (PRI_UNIFORM, (-860, 870)),
+        (PRI_LOG_UNIFORM, (0.1, 1000)),
+        (PRI_COSINE, (0, np.pi)),
+        (PRI_LOG_NORMAL, (0.6486628230670546, -0.1072667784813348, 0.6337073562137334,
+                          0, np.pi)),
+        (PRI_LOG_NORMAL, (0.5, -1, 2, -1, 1e300)),
+        (PRI_CAUCHY, (10, 12, -860, 870)),
+        (PRI_CAUCHY, (-1000, 40, -1e6, 1e6)),
+    ]
+
+    def ref_transform(q, kind, args):
+        """Transform of the unit interval as done with scipy before the
+        compiled prior engine"""
+        if kind == PRI_UNIFORM:
+            return np.min(args) + q * (np.max(args) - np.min(args))
+        if kind == PRI_LOG_UNIFORM:
+            return np.exp(q * np.log(np.max(args) / np.min(args)) + np.log(np.min(args)))
+        if kind == PRI_COSINE:
+            return np.arccos(2 * q - 1)
+        if kind == PRI_LOG_NORMAL:
+            shape, loc, scale, low, high = args
+            # scipy's lognorm.isf evaluates the ppf at 1 - q, so loses
+            # precision for small q (and is infinite below ~1e-16); use the
+            # equivalent expression in terms of the normal isf there
+            vals = np.where(
+                q < 1e-5,
+                loc + scale * np.exp(shape * stats.norm.isf(q)),
+                stats.lognorm(shape, loc, scale).isf(q),
+            )
+        else:
+            loc, scale, low, high = args
+            vals = stats.cauchy(loc, scale).isf(q)
+        return np.clip(vals, a_min=low, a_max=high)
+
+    # Include the edges of and points deep in the tails of the unit interval
+    rand = np.random.RandomState(0)
+    tails = np.array([0, 1e-300, 1e-100, 1e-20, 1e-10, 1e-5, 0.02425, 0.5])
+    edge_qs = np.concatenate([tails, 1 - tails])
+
+    kinds, params = get_prior_engine(prior_defs)
+    n_dims = len(prior_defs)
+    cubes = np.concatenate([
+        np.repeat(edge_qs[:, np.newaxis], n_dims, axis=1),
+        rand.uniform(size=(1000, n_dims)),
+    ])
+    orig_cubes = cubes.copy()
+    prior_transform_batch(cubes, kinds, params)
+
+    for dim_num, (kind, args) in enumerate(prior_defs):
+        ref = ref_transform(orig_cubes[:, dim_num], kind, args)
+        test = cubes[:, dim_num]
+        if kind == PRI_CAUCHY:
+            # `math.tan` near pi/2 is finite where scipy's isf is infinite,
+            # but both are clipped to the same limits
+            assert np.allclose(test, ref, rtol=1e-12, atol=0), (kind, args)
+        else:
+            assert np.allclose(test, ref, rtol=1e-9, atol=1e-12), (kind, args)
+
+    # Standard normal isf vs. scipy deep in both tails
+    norm_qs = np.concatenate([np.logspace(-300, -1, 300), 1 - np.logspace(-15, -1, 100)])
+    norm_test = np.array([_norm_isf(q) for q in norm_qs])
+    assert np.allclose(norm_test, stats.norm.isf(norm_qs), rtol=1e-12, atol=0)
+
+    # `prior_transform_inverse` round trip away from the clipped regions
+    for cube in rand.uniform(0.01, 0.99, size=(100, n_dims)):
+        param_vals = cube.copy()
+        prior_transform(param_vals, kinds, params)
+        inv_cube = np.empty(n_dims)
+        prior_transform_inverse(param_vals, kinds, params, inv_cube)
+        assert np.allclose(inv_cube, cube, rtol=0, atol=1e-9)
+        prior_transform(inv_cube, kinds, params)
+        assert np.allclose(inv_cube, param_vals, rtol=1e-9, atol=1e-9)
+
+    # Values beyond a prior's range map onto the nearest edge of the cube
+    beyond = np.array([2, 1000, 1e4, -1, 4, 1e300, 1e4, -1e300])
+    inv_cube = np.empty(n_dims)
+    prior_transform_inverse(beyond, kinds, params, inv_cube)
+    edges = np.array([1, 1, 1, 1, 0, 0, 0, 1])
+    assert np.allclose(inv_cube, edges, atol=1e-9), inv_cube
+
+    print('<< PASS : test_prior_transform >>')
+
+
+if __name__ == '__main__':
+    test_prior_transform()
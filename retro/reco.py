@@ -10,9 +10,12 @@ from __future__ import absolute_import, division, print_function
 
 __all__ = [
     'METHODS',
+    'WARM_START_METHODS',
     'CRS_STOP_FLAGS',
     'REPORT_AFTER',
     'APPEND_FILE',
+    'CRS_NUM_TRIALS',
+    'WARM_START_PRIOR_DEFS',
     'Reco',
     'get_multinest_meta',
     'parse_args',
@@ -36,13 +39,19 @@ limitations under the License.'''
 
 from argparse import ArgumentParser
 from collections import OrderedDict
+from glob import glob
+import multiprocessing
 import os
-from os.path import abspath, dirname, isdir, join
+from os.path import abspath, basename, dirname, isdir, join
 import pickle
 from shutil import rmtree
 import sys
 from tempfile import mkdtemp
+import threading
 import time
+import traceback
+
+from six.moves import queue
 
 import numpy as np
 import xarray as xr
@@ -52,16 +61,28 @@ if __name__ == '__main__' and __package__ is None:
     if RETRO_DIR not in sys.path:
         sys.path.append(RETRO_DIR)
 from retro import init_obj
-from retro.retro_types import EVT_DOM_INFO_T, EVT_HIT_INFO_T, SPHER_T
-from retro.utils.geom import (
-    rotate_points, add_vectors, fill_from_spher, fill_from_cart, reflect
+from retro.const import EMPTY_SOURCES
+from retro.crs2 import CRS_STOP_FLAGS, crs2_minimize, spher_from_angles
+from retro.utils.geom import rotate_points, add_vectors
+from retro.utils.checkpoint import (
+    CHECKPOINT_EXT, load_checkpoint, remove_checkpoint, save_checkpoint
+)
+from retro.utils.estimate_store import (
+    ESTIMATE_STORE_EXT, append_estimate, read_estimate_columns, recover_estimate_store
 )
 from retro.utils.misc import expand, mkdir, sort_dict
 from retro.utils.stats import estimate_from_llhp
-from retro.priors import get_prior_fun
+from retro.priors import (
+    get_prior_def, get_prior_engine, prior_transform, prior_transform_batch,
+    prior_transform_inverse
+)
+from retro.hypo.discrete_hypo import sources_to_soa
 from retro.hypo.discrete_muon_kernels import pegleg_eval
-from retro.tables.pexp_5d import generate_pexp_and_llh_functions
+from retro.tables.pexp_5d import (
+    generate_dom_grid, generate_event_dom_hit_info, generate_pexp_and_llh_functions
+)
 from retro.hypo.discrete_cascade_kernels import SCALING_CASCADE_ENERGY
+from retro.retro_types import EVT_DOM_INFO_T, EVT_HIT_INFO_T, SRC_T
 
 
 METHODS = set([
@@ -77,16 +98,24 @@ METHODS = set([
     "truth",
 ])
 
-CRS_STOP_FLAGS = {
-    0: 'max iterations reached',
-    1: 'stddev below threshold',
-    2: 'no improvement',
-    3: 'vertex stddev below threshold'
-}
+WARM_START_METHODS = METHODS.difference(["test", "truth"])
+"""Methods that can start from `warm_start_reco`; for "crs_prefit_mn" and
+"experimental_trackfit" this applies to the prefit"""
 
 # TODO: make following args to `__init__` or `run`
 REPORT_AFTER = 100
 APPEND_FILE = True
+CRS_NUM_TRIALS = 8
+
+WARM_START_PRIOR_DEFS = OrderedDict([
+    ('x', dict(kind='cauchy', scale=15, half_width=300)),
+    ('y', dict(kind='cauchy', scale=15, half_width=300)),
+    ('z', dict(kind='cauchy', scale=10, half_width=200)),
+    ('time', dict(kind='cauchy', scale=40, half_width=800)),
+])
+"""Priors used in place of the user-specified priors for these dimensions when
+narrowing priors about a warm start; each is centered on the warm-start value
+and limited to +/- `half_width` about it"""
 
 
 class Reco(object):
@@ -101,7 +130,8 @@ class Reco(object):
     ----------
     events_kw, dom_tables_kw, tdi_tables_kw : mappings
         As returned by `retro.init_obj.parse_args`; `other_kw` must contain
-        key "outdir".
+        key "outdir". `events_kw` can be None, in which case events must be
+        set via `set_events` before calling `run`.
 
     outdir : string
         Directory in which to save any generated files
@@ -110,6 +140,57 @@ class Reco(object):
         Whether to save llhp (within 30 LLH of max-LLH) to disk; default is
         False
 
+    llh_cache_size : int, optional
+        If > 0, remember the LLH results of up to this many of the most
+        recently evaluated hypotheses for the event being reconstructed, and
+        return these instead of recomputing LLHs for hypotheses revisited by
+        the minimizer; default is 0, i.e., no caching
+
+    llh_cache_resolution : float, optional
+        Hypotheses whose (optimized) parameter values all round to the same
+        multiple of this value are considered identical by the LLH cache
+
+    warm_start_reco : string, optional
+        Name of a reco stored with the events (see
+        `retro.init_obj.get_events`) from which to warm-start the
+        reconstructions run by `run` with any of `WARM_START_METHODS` (running
+        other methods with a warm start is an error); see
+        `generate_prior_method`. Default is None, i.e., no warm start.
+
+    narrow_priors : bool, optional
+        Whether to narrow the priors about the warm start given by
+        `warm_start_reco`; see `generate_prior_method`
+
+    resume : bool, optional
+        Resume a previous run with the same `outdir` and events: events whose
+        final estimate is already stored are skipped, estimates are appended
+        to the existing stores (estimates already stored are not written
+        again), and optimizer checkpoints left by an interrupted event are
+        resumed from (and removed once the event's final estimate is written)
+
+    checkpoint_interval : float, optional
+        If not None, snapshot the optimizer state mid-event to
+        "{outdir}/evt{event_idx}.{method}.*.ckpt" (at most once per this many
+        seconds for CRS2; MultiNest keeps its own output files there) such
+        that an interrupted event can be resumed; checkpoints (and temporary
+        files left by interrupted writes) are removed once the event's final
+        estimate is written, whether or not checkpointing is enabled
+
+    Attributes
+    ----------
+    estimate_sink : object with a `put` method, or None
+        If not None, estimates are not written to disk by `make_estimate` but
+        are passed as ``estimate_sink.put(('estimate', (estimate, fname,
+        event_prefix)))``
+
+    llh_cache_stats : OrderedDict
+        Keys "hits" and "misses" counting the LLH cache lookups for the
+        current event
+
+    warm_start : OrderedDict or None
+        Values of (a subset of) the optimized params from which to start the
+        minimizer, as set by `generate_prior_method`
+
     """
     def __init__(
         self,
@@ -118,70 +199,133 @@ class Reco(object):
         tdi_tables_kw,
         outdir,
         save_llhp=False,
+        llh_cache_size=0,
+        llh_cache_resolution=1e-3,
+        warm_start_reco=None,
+        narrow_priors=False,
+        resume=False,
+        checkpoint_interval=None,
     ):
-        self.events_kw = events_kw
         self.dom_tables_kw = dom_tables_kw
         self.tdi_tables_kw = tdi_tables_kw
+        self.outdir = outdir
+        self.save_llhp = save_llhp
+        self.llh_cache_size = llh_cache_size
+        self.llh_cache_resolution = llh_cache_resolution
+        self.llh_cache_stats = OrderedDict([('hits', 0), ('misses', 0)])
+        self.warm_start_reco = warm_start_reco
+        self.narrow_priors = narrow_priors
+        self.resume = resume
+        self.checkpoint_interval = checkpoint_interval
+
+        self.method = None
+        self.completed_event_idxs = set()
+        self._stored_event_idxs = {}
+        self.checkpoint_counter = 0
+
+        self.events_kw = None
+        self.attrs = None
+        self._get_events = None
+        self.events_start = None
+        self.events_step = None
+        self.events_stop = None
+        self.slice_prefix = None
+        self.event_counter = -1
+        if events_kw is not None:
+            self.set_events(events_kw)
+
+        self.outdir = expand(self.outdir)
+        mkdir(self.outdir)
+        self.dom_tables = init_obj.setup_dom_tables(**dom_tables_kw)
+        self.tdi_tables, self.tdi_metas = init_obj.setup_tdi_tables(**tdi_tables_kw)
+        self.pexp, self.get_llh, self.get_llh_batch, _ = generate_pexp_and_llh_functions(
+            dom_tables=self.dom_tables,
+            tdi_tables=self.tdi_tables,
+            tdi_metas=self.tdi_metas,
+        )
+        self.event_prefix = None
+        self.current_event = None
+        self.current_event_idx = -1
+        self.hypo_handler = None
+        self.prior = None
+        self.prior_batch = None
+        self.prior_inverse = None
+        self.priors_used = None
+        self.warm_start = None
+        self.loglike = None
+        self.loglike_batch = None
+        self.param_values = None
+        self.log_likelihoods = None
+        self.n_params = None
+        self.n_opt_params = None
+        self.estimate_sink = None
+
+    def set_events(self, events_kw):
+        """Set (or replace) the events to be reconstructed by subsequent
+        calls to `run` or `run_parallel`.
+
+        Parameters
+        ----------
+        events_kw : mapping
+            Keyword arguments to `retro.init_obj.get_events`
+
+        """
+        self.events_kw = events_kw
         self.attrs = sort_dict(dict(
             events_kw=sort_dict(self.events_kw),
             dom_tables_kw=sort_dict(self.dom_tables_kw),
             tdi_tables_kw=sort_dict(self.tdi_tables_kw),
         ))
         self._get_events = init_obj.get_events(**events_kw)
-        self.outdir = outdir
-        self.save_llhp = save_llhp
 
         # Replace None values for `start` and `step` for fewer branches in
         # subsequent logic (i.e., these will always be integers)
-        self.events_start = 0 if events_kw['start'] is None else events_kw['start']
-        self.events_step = 1 if events_kw['step'] is None else events_kw['step']
+        self.events_start = events_kw.get('start', None) or 0
+        self.events_step = events_kw.get('step', None) or 1
         # Nothing we can do about None for `stop` since we don't know how many
         # events there are in total.
-        self.events_stop = events_kw['stop']
+        self.events_stop = events_kw.get('stop', None)
 
         self.slice_prefix = join(
-            outdir,
+            self.outdir,
             'slc{start}:{stop}:{step}.'.format(
                 start=self.events_start,
                 stop='' if self.events_stop is None else self.events_stop,
                 step=self.events_step,
             )
         )
-        """Slice-notation string to append to *estimate filenames if
+        """Slice-notation string to prefix *estimate store names with if
         APPEND_FILE is True"""
 
-        self.outdir = expand(self.outdir)
-        mkdir(self.outdir)
-        self.dom_tables = init_obj.setup_dom_tables(**dom_tables_kw)
-        self.tdi_tables, self.tdi_metas = init_obj.setup_tdi_tables(**tdi_tables_kw)
-        self.pexp, self.get_llh, _ = generate_pexp_and_llh_functions(
-            dom_tables=self.dom_tables,
-            tdi_tables=self.tdi_tables,
-            tdi_metas=self.tdi_metas,
-        )
-        self.event_prefix = None
-        self.current_event = None
-        self.current_event_idx = -1
         self.event_counter = -1
-        self.hypo_handler = None
-        self.prior = None
-        self.priors_used = None
-        self.loglike = None
-        self.n_params = None
-        self.n_opt_params = None
 
     @property
     def events(self):
         """Iterator over events which sets class variables `event_prefix`,
         `current_event`, `current_event_idx`, and `event_counter` for each
-        event retrieved."""
+        event retrieved; events in `completed_event_idxs` are skipped."""
         for event_idx, event in self._get_events:
+            if event_idx in self.completed_event_idxs:
+                print('Skipping already-reconstructed event: "{}"'.format(event_idx))
+                continue
             print('Operating on event: "{}"'.format(event_idx))
             self.event_prefix = join(self.outdir, 'evt{}.'.format(event_idx))
             self.current_event = event
             self.current_event_idx = event_idx
             self.event_counter += 1
+            self.checkpoint_counter = 0
+            self.llh_cache_stats['hits'] = self.llh_cache_stats['misses'] = 0
             yield self.current_event
+            # Also covers checkpoints left by an earlier (interrupted) run made
+            # with a `checkpoint_interval`
+            for path in glob('{}{}.*{}'.format(self.event_prefix, self.method, CHECKPOINT_EXT)):
+                remove_checkpoint(path)
+            if self.llh_cache_size > 0:
+                hits = self.llh_cache_stats['hits']
+                lookups = hits + self.llh_cache_stats['misses']
+                print('LLH cache: {} hits / {} lookups ({:.1f}%)'.format(
+                    hits, lookups, 100 * hits / max(lookups, 1)
+                ))
 
     def setup_hypo(self, **kwargs):
         """Setup hypothesis and record `n_params` and `n_opt_params`
@@ -213,10 +357,15 @@ class Reco(object):
             raise ValueError(
                 'Unrecognized `method` "{}"; must be one of {}'.format(method, METHODS)
             )
+        self.check_warm_start_method(method)
 
         print('Running "{}" reconstruction...'.format(method))
         t00 = time.time()
 
+        self.method = method
+        if self.estimate_sink is None:
+            self.prepare_resume()
+
         for _ in self.events:
             if method in (
                 'multinest',
@@ -240,7 +389,9 @@ class Reco(object):
                         ('y', dict(kind='SPEFit2', extent='tight')),
                         ('z', dict(kind='SPEFit2', extent='tight')),
                         ('time', dict(kind='SPEFit2', extent='tight')),
-                    ])
+                    ]),
+                    warm_start=self.get_warm_start(self.warm_start_reco),
+                    narrow_priors=self.narrow_priors,
                 )
 
                 param_values = []
@@ -290,6 +441,8 @@ class Reco(object):
 
                 t1 = time.time()
                 run_info['run_time'] = t1 - t0
+                if self.warm_start is not None:
+                    run_info['warm_start'] = self.warm_start
 
                 if self.save_llhp:
                     llhp_fname = '{}.llhp'.format(method)
@@ -317,7 +470,9 @@ class Reco(object):
                         ('y', dict(kind='SPEFit2', extent='tight')),
                         ('z', dict(kind='SPEFit2', extent='tight')),
                         ('time', dict(kind='SPEFit2', extent='tight')),
-                    ])
+                    ]),
+                    warm_start=self.get_warm_start(self.warm_start_reco),
+                    narrow_priors=self.narrow_priors,
                 )
 
                 param_values = []
@@ -342,6 +497,8 @@ class Reco(object):
 
                 t1 = time.time()
                 run_info['run_time'] = t1 - t0
+                if self.warm_start is not None:
+                    run_info['warm_start'] = self.warm_start
 
                 if self.save_llhp:
                     llhp_fname = '{}.llhp'.format(method)
@@ -372,7 +529,9 @@ class Reco(object):
                         ('y', dict(kind='SPEFit2', extent='tight')),
                         ('z', dict(kind='SPEFit2', extent='tight')),
                         ('time', dict(kind='SPEFit2', extent='tight')),
-                    ])
+                    ]),
+                    warm_start=self.get_warm_start(self.warm_start_reco),
+                    narrow_priors=self.narrow_priors,
                 )
 
                 param_values = []
@@ -397,6 +556,8 @@ class Reco(object):
 
                 t1 = time.time()
                 prefit_run_info['run_time'] = t1 - t0
+                if self.warm_start is not None:
+                    prefit_run_info['warm_start'] = self.warm_start
 
                 if self.save_llhp:
                     llhp_fname = '{}.llhp_prefit'.format(method)
@@ -418,45 +579,12 @@ class Reco(object):
                     track_time_step=1.,
                 )
 
-                # Setup prior
-
-                pft_est = prefit_estimate.sel(kind='mean')
-                pft_x = float(pft_est.sel(param='x'))
-                pft_y = float(pft_est.sel(param='y'))
-                pft_z = float(pft_est.sel(param='z'))
-                pft_time = float(pft_est.sel(param='time'))
+                # Setup prior narrowed about the prefit
 
                 self.generate_prior_method(
-                    prior_defs=OrderedDict([
-                        ('x', dict(
-                            kind='cauchy',
-                            loc=pft_x,
-                            scale=15,
-                            low=pft_x - 300,
-                            high=pft_x + 300,
-                        )),
-                        ('y', dict(
-                            kind='cauchy',
-                            loc=pft_y,
-                            scale=15,
-                            low=pft_y - 300,
-                            high=pft_y + 300,
-                        )),
-                        ('z', dict(
-                            kind='cauchy',
-                            loc=pft_z,
-                            scale=10,
-                            low=pft_z - 200,
-                            high=pft_z + 200,
-                        )),
-                        ('time', dict(
-                            kind='cauchy',
-                            loc=pft_time,
-                            scale=40,
-                            low=pft_time - 800,
-                            high=pft_time + 800,
-                        )),
-                    ])
+                    prior_defs=OrderedDict(),
+                    warm_start=self.get_warm_start(prefit_estimate, kind='mean'),
+                    narrow_priors=True,
                 )
 
                 param_values = []
@@ -559,7 +687,9 @@ class Reco(object):
                         ('y', dict(kind='SPEFit2', extent='tight')),
                         ('z', dict(kind='SPEFit2', extent='tight')),
                         ('time', dict(kind='SPEFit2', extent='tight')),
-                    ])
+                    ]),
+                    warm_start=self.get_warm_start(self.warm_start_reco),
+                    narrow_priors=self.narrow_priors,
                 )
 
                 param_values = []
@@ -584,6 +714,8 @@ class Reco(object):
 
                 t1 = time.time()
                 prefit_run_info['run_time'] = t1 - t0
+                if self.warm_start is not None:
+                    prefit_run_info['warm_start'] = self.warm_start
 
                 if self.save_llhp:
                     llhp_fname = '{}.llhp_prefit'.format(method)
@@ -673,50 +805,217 @@ class Reco(object):
 
         print('Total script run time is {:.3f} s'.format(time.time() - t00))
 
-    def generate_prior_method(self, prior_defs):
-        """Generate the prior transform method `self.prior` and info
+    def get_warm_start(self, source, kind='median'):
+        """Get values of the optimized params from a previous fit of the
+        current event, for use as `warm_start` in `generate_prior_method`.
+
+        Params not found in `source` (or with non-finite values there) are
+        omitted. A param named e.g. "track_zenith" is looked up as "zenith" if
+        `source` has no "track_zenith" (as for stored track recos like
+        SPEFit2).
+
+        Parameters
+        ----------
+        source : string, xarray.DataArray, or None
+            Name of a reco stored with the current event or an estimate as
+            returned by `make_estimate` (e.g. that of a cheap prefit); None
+            (e.g. `self.warm_start_reco` if not set) means no warm start
+        kind : string, optional
+            Kind of estimate to use if `source` is an estimate
+
+        Returns
+        -------
+        warm_start : OrderedDict or None
+            None if `source` is None
+
+        """
+        if source is None:
+            return None
+
+        if isinstance(source, xr.DataArray):
+            est = source.sel(kind=kind)
+            names = [str(n) for n in est['param'].values]
+            get_value = lambda name: float(est.sel(param=name))
+        else:
+            reco = self.current_event['recos'][source]
+            names = reco.dtype.names
+            get_value = lambda name: float(reco[name])
+
+        warm_start = OrderedDict()
+        for param_name in self.hypo_handler.opt_param_names:
+            name = param_name
+            if name not in names and name.split('_', 1)[0] in ('track', 'cascade'):
+                name = name.split('_', 1)[1]
+            if name not in names:
+                continue
+            value = get_value(name)
+            if not np.isfinite(value):
+                continue
+            if 'azimuth' in param_name:
+                value %= 2 * np.pi
+            warm_start[param_name] = value
+
+        return warm_start
+
+    def check_warm_start_method(self, method):
+        """Raise a ValueError if a warm start was requested (via
+        `warm_start_reco` or `narrow_priors`) but `method` cannot use it."""
+        if method in WARM_START_METHODS:
+            return
+        if self.warm_start_reco is not None or self.narrow_priors:
+            raise ValueError(
+                'Method "{}" does not use `warm_start_reco` or `narrow_priors`;'
+                ' methods that do are {}'.format(method, sorted(WARM_START_METHODS))
+            )
+
+    def generate_prior_method(self, prior_defs, warm_start=None, narrow_priors=False):
+        """Generate the prior transform methods `self.prior`,
+        `self.prior_batch`, and `self.prior_inverse` and info
         `self.priors_used` for a given event.
 
         Parameters
         ----------
         prior_defs : dict
+        warm_start : mapping, optional
+            Values of (a subset of) the optimized params near which to start
+            the minimizer, e.g. as returned by `get_warm_start`; stored as
+            `self.warm_start`. The CRS2, nlopt, scipy, and skopt minimizers
+            start from this point; MultiNest only benefits via `narrow_priors`.
+        narrow_priors : bool, optional
+            Replace `prior_defs` for dimensions in `WARM_START_PRIOR_DEFS`
+            with the priors defined there, centered on the `warm_start`
+            values
 
         """
-        prior_funcs = []
+        self.warm_start = None
+        if warm_start:
+            self.warm_start = OrderedDict(warm_start)
+
+        if narrow_priors and self.warm_start:
+            prior_defs = OrderedDict(prior_defs)
+            for dim_name, narrow_def in WARM_START_PRIOR_DEFS.items():
+                if dim_name not in self.warm_start:
+                    continue
+                loc = self.warm_start[dim_name]
+                half_width = narrow_def['half_width']
+                prior_defs[dim_name] = dict(
+                    kind=narrow_def['kind'],
+                    loc=loc,
+                    scale=narrow_def['scale'],
+                    low=loc - half_width,
+                    high=loc + half_width,
+                )
+
         self.priors_used = OrderedDict()
 
-        for dim_num, dim_name in enumerate(self.hypo_handler.opt_param_names):
+        for dim_name in self.hypo_handler.opt_param_names:
             if prior_defs.has_key(dim_name):
                 kwargs = prior_defs[dim_name]
             else:
                 kwargs = {}
 
-            prior_fun, prior_def = get_prior_fun(
-                dim_num=dim_num,
+            self.priors_used[dim_name] = get_prior_def(
                 dim_name=dim_name,
                 event=self.current_event,
                 **kwargs
             )
-            prior_funcs.append(prior_fun)
-            self.priors_used[dim_name] = prior_def
+
+        kinds, params = get_prior_engine(list(self.priors_used.values()))
+        n_dims = len(kinds)
 
         def prior(cube, ndim=None, nparams=None): # pylint: disable=unused-argument
-            """Apply `prior_funcs` to the hypercube to map values from the unit
-            hypercube onto values in the physical parameter space.
+            """Map values from the unit hypercube onto values in the physical
+            parameter space.
 
             The result overwrites the values in `cube`.
 
             Parameters
             ----------
-            cube
+            cube : array or ctypes pointer to doubles
+                MultiNest passes the latter
             ndim
             nparams
 
             """
-            for prior_func in prior_funcs:
-                prior_func(cube)
+            if not isinstance(cube, np.ndarray):
+                cube = np.ctypeslib.as_array(cube, shape=(n_dims,))
+            prior_transform(cube, kinds, params)
+
+        def prior_batch(cubes):
+            """Map each row of `cubes` from the unit hypercube onto values in
+            the physical parameter space, overwriting the values in `cubes`.
+
+            Parameters
+            ----------
+            cubes : shape (n_points, n_dims) array of float64
+
+            """
+            prior_transform_batch(cubes, kinds, params)
+
+        def prior_inverse(param_vals):
+            """Map physical parameter values `param_vals` onto the unit
+            hypercube.
+
+            Parameters
+            ----------
+            param_vals : shape (n_dims,) array of float64
+
+            Returns
+            -------
+            cube : shape (n_dims,) array of float64
+
+            """
+            cube = np.empty(shape=n_dims, dtype=np.float64)
+            prior_transform_inverse(
+                np.asarray(param_vals, dtype=np.float64), kinds, params, cube
+            )
+            return cube
 
         self.prior = prior
+        self.prior_batch = prior_batch
+        self.prior_inverse = prior_inverse
+
+    def get_warm_start_params(self, default):
+        """Get the point in the physical parameter space at which to start
+        the minimizer.
+
+        Parameters
+        ----------
+        default : shape (n_opt_params,) array
+            Values for dimensions without a value in `self.warm_start`
+
+        Returns
+        -------
+        param_vals : shape (n_opt_params,) array of float64
+
+        """
+        param_vals = np.array(default, dtype=np.float64)
+        if self.warm_start:
+            for dim_num, dim_name in enumerate(self.hypo_handler.opt_param_names):
+                if dim_name in self.warm_start:
+                    param_vals[dim_num] = self.warm_start[dim_name]
+        return param_vals
+
+    def get_warm_start_cube(self, default):
+        """Get the point in the unit hypercube at which to start the
+        minimizer.
+
+        Parameters
+        ----------
+        default : shape (n_opt_params,) array
+            Unit-hypercube values for dimensions without a value in
+            `self.warm_start`
+
+        Returns
+        -------
+        cube : shape (n_opt_params,) array of float64
+
+        """
+        if not self.warm_start:
+            return np.array(default, dtype=np.float64)
+        param_vals = np.array(default, dtype=np.float64)
+        self.prior(param_vals)
+        return self.prior_inverse(self.get_warm_start_params(param_vals))
 
     def generate_loglike_method(self, param_values, log_likelihoods, t_start):
         """Generate the LLH callback method `self.loglike` for a given event.
@@ -725,6 +1024,8 @@ class Reco(object):
         ----------
         param_values : list
         log_likelihoods : list
+            Also kept as `self.param_values` and `self.log_likelihoods`, such
+            that optimizer checkpoints can include (and restore) them
         t_start : list
             Needs to be a list for start time to be passed by reference and
             therefore universally accessible within all methods that require
@@ -760,48 +1061,16 @@ class Reco(object):
             ('cascade_energy', event['truth']['cascade_energy']),
             ('neutrino_energy', event['truth']['energy']),
         ])
-        num_operational_doms = np.sum(dom_info['operational'])
-
-        # Array containing only DOMs operational during the event & info
-        # relevant to the hits these DOMs got (if any)
-        event_dom_info = np.zeros(shape=num_operational_doms, dtype=EVT_DOM_INFO_T)
-
-        # Array containing all relevant hit info for the event, including a
-        # pointer back to the index of the DOM in the `event_dom_info` array
-        event_hit_info = np.zeros(shape=hits.size, dtype=EVT_HIT_INFO_T)
-
-        # Copy 'time' and 'charge' over directly; add 'event_dom_idx' below
-        event_hit_info[['time', 'charge']] = hits[['time', 'charge']]
-
-        copy_fields = ['sd_idx', 'x', 'y', 'z', 'quantum_efficiency', 'noise_rate_per_ns']
 
         print('all noise rate %.5f' % np.sum(dom_info['noise_rate_per_ns']))
         print('DOMs with zero noise %i' % np.sum(dom_info['noise_rate_per_ns'] == 0))
 
-        # Fill `event_{hit,dom}_info` arrays only for operational DOMs
-        for dom_idx, this_dom_info in enumerate(dom_info[dom_info['operational']]):
-            this_event_dom_info = event_dom_info[dom_idx:dom_idx+1]
-            this_event_dom_info[copy_fields] = this_dom_info[copy_fields]
-            sd_idx = this_dom_info['sd_idx']
-            this_event_dom_info['table_idx'] = sd_idx_table_indexer[sd_idx]
-
-            # Copy any hit info from `hits_indexer` and total charge from
-            # `hits` into `event_hit_info` and `event_dom_info` arrays
-            this_hits_indexer = hits_indexer[hits_indexer['sd_idx'] == sd_idx]
-            if len(this_hits_indexer) == 0:
-                this_event_dom_info['hits_start_idx'] = 0
-                this_event_dom_info['hits_stop_idx'] = 0
-                this_event_dom_info['total_observed_charge'] = 0
-                continue
-
-            start = this_hits_indexer[0]['offset']
-            stop = start + this_hits_indexer[0]['num']
-            event_hit_info[start:stop]['event_dom_idx'] = dom_idx
-            this_event_dom_info['hits_start_idx'] = start
-            this_event_dom_info['hits_stop_idx'] = stop
-            this_event_dom_info['total_observed_charge'] = (
-                np.sum(hits[start:stop]['charge'])
-            )
+        event_dom_info, event_hit_info = generate_event_dom_hit_info(
+            dom_info=dom_info,
+            sd_idx_table_indexer=sd_idx_table_indexer,
+            hits=hits,
+            hits_indexer=hits_indexer,
+        )
 
         print('this evt. noise rate %.5f'%np.sum(event_dom_info['noise_rate_per_ns']))
         print('DOMs with zero noise: %i'%np.sum(event_dom_info['noise_rate_per_ns'] == 0))
@@ -818,46 +1087,52 @@ class Reco(object):
         assert np.sum(event_dom_info['total_observed_charge']) > 0, 'no charge'
         assert np.isfinite(np.sum(event_dom_info['total_observed_charge'])), 'inf charge'
 
-        def loglike(cube, ndim=None, nparams=None): # pylint: disable=unused-argument
-            """Get log likelihood values.
+        # Spatial index so only DOMs near each source are visited
+        dom_grid = generate_dom_grid(event_dom_info)
+
+        # Bounded LRU cache of (llh, pegleg_idx, scalefactor) keyed by the
+        # quantized hypothesis parameters
+        llh_cache_size = self.llh_cache_size
+        llh_cache_resolution = self.llh_cache_resolution
+        llh_cache = OrderedDict() if llh_cache_size > 0 else None
+        llh_cache_stats = self.llh_cache_stats
+
+        def get_cache_key(cube):
+            """Quantize parameter values to identify nearly-identical hypotheses"""
+            vals = np.array(cube[:n_opt_params], dtype=np.float64)
+            return tuple(np.round(vals / llh_cache_resolution).astype(np.int64).tolist())
+
+        def cache_lookup(key):
+            """Get cached result for `key` (or None), marking it most recently used"""
+            result = llh_cache.pop(key, None)
+            if result is None:
+                llh_cache_stats['misses'] += 1
+            else:
+                llh_cache[key] = result
+                llh_cache_stats['hits'] += 1
+            return result
 
-            Defined as a closure to capture particulars of the event and priors
-            without having to pass these as parameters to the function.
+        def cache_store(key, result):
+            """Cache `result`, evicting the least recently used if full"""
+            llh_cache[key] = result
+            if len(llh_cache) > llh_cache_size:
+                llh_cache.popitem(last=False)
 
-            Note that this is called _after_ `prior` has been called, so `cube`
-            already contains the parameter values scaled to be in their
-            physical ranges.
+        def record_result(cube, llh, pegleg_idx, scalefactor, t0):
+            """Check a computed LLH, append it and its parameter values to
+            `log_likelihoods` and `param_values`, and periodically report
+            progress.
 
             Parameters
             ----------
             cube
-            ndim : int, optional
-            nparams : int, optional
-
-            Returns
-            -------
             llh : float
+            pegleg_idx : int or float
+            scalefactor : float
+            t0 : float
+                Time at which computation of this LLH started
 
             """
-            t0 = time.time()
-            if len(t_start) == 0:
-                t_start.append(time.time())
-
-            hypo = OrderedDict(list(zip(opt_param_names, cube)))
-
-            generic_sources = hypo_handler.get_generic_sources(hypo)
-            pegleg_sources = hypo_handler.get_pegleg_sources(hypo)
-            scaling_sources = hypo_handler.get_scaling_sources(hypo)
-
-            llh, pegleg_idx, scalefactor = self.get_llh(
-                generic_sources=generic_sources,
-                pegleg_sources=pegleg_sources,
-                scaling_sources=scaling_sources,
-                event_hit_info=event_hit_info,
-                event_dom_info=event_dom_info,
-                pegleg_stepsize=1,
-            )
-
             assert np.isfinite(llh), 'LLH not finite'
             assert llh < 0, 'LLH positive'
 
@@ -914,9 +1189,145 @@ class Reco(object):
                 print('this llh took:    {:.3f} ms'.format((t1 - t0)*1000))
                 print('')
 
+        def loglike(cube, ndim=None, nparams=None): # pylint: disable=unused-argument
+            """Get log likelihood values.
+
+            Defined as a closure to capture particulars of the event and priors
+            without having to pass these as parameters to the function.
+
+            Note that this is called _after_ `prior` has been called, so `cube`
+            already contains the parameter values scaled to be in their
+            physical ranges.
+
+            Parameters
+            ----------
+            cube
+            ndim : int, optional
+            nparams : int, optional
+
+            Returns
+            -------
+            llh : float
+
+            """
+            t0 = time.time()
+            if len(t_start) == 0:
+                t_start.append(time.time())
+
+            result = None
+            if llh_cache is not None:
+                key = get_cache_key(cube)
+                result = cache_lookup(key)
+
+            if result is None:
+                hypo = OrderedDict(list(zip(opt_param_names, cube)))
+
+                # Struct-of-arrays views into buffers owned by `hypo_handler`,
+                # so nothing is allocated per hypothesis
+                generic_sources = hypo_handler.get_generic_sources_soa(hypo)
+                pegleg_sources = hypo_handler.get_pegleg_sources_soa(hypo)
+                scaling_sources = hypo_handler.get_scaling_sources_soa(hypo)
+
+                result = self.get_llh(
+                    generic_sources=generic_sources,
+                    pegleg_sources=pegleg_sources,
+                    scaling_sources=scaling_sources,
+                    event_hit_info=event_hit_info,
+                    event_dom_info=event_dom_info,
+                    pegleg_stepsize=1,
+                    dom_grid=dom_grid,
+                )
+                if llh_cache is not None:
+                    cache_store(key, result)
+
+            llh, pegleg_idx, scalefactor = result
+            record_result(cube, llh, pegleg_idx, scalefactor, t0)
+
             return llh
 
+        def loglike_batch(cubes):
+            """Get log likelihood values for several points at once, which are
+            evaluated in parallel.
+
+            Parameters
+            ----------
+            cubes : shape (n_points, n_dims) array
+                Each row contains parameter values already scaled to be in
+                their physical ranges (i.e., after `prior` has been applied)
+
+            Returns
+            -------
+            llhs : shape (n_points,) array
+
+            """
+            t0 = time.time()
+            if len(t_start) == 0:
+                t_start.append(time.time())
+
+            num_points = len(cubes)
+            llhs = np.empty(shape=num_points)
+            pegleg_idxs = np.empty(shape=num_points)
+            scalefactors = np.empty(shape=num_points)
+
+            # Only compute LLHs for points not in the cache (and only once for
+            # points repeated within `cubes`)
+            if llh_cache is None:
+                to_compute = [(None, [i]) for i in range(num_points)]
+            else:
+                keys_positions = OrderedDict()
+                for i, cube in enumerate(cubes):
+                    key = get_cache_key(cube)
+                    if key in keys_positions:
+                        keys_positions[key].append(i)
+                        llh_cache_stats['hits'] += 1
+                        continue
+                    result = cache_lookup(key)
+                    if result is None:
+                        keys_positions[key] = [i]
+                    else:
+                        llhs[i], pegleg_idxs[i], scalefactors[i] = result
+                to_compute = list(keys_positions.items())
+
+            # Copy sources since `hypo_handler` may reuse its buffers from one
+            # hypothesis to the next
+            all_sources = OrderedDict([('generic', []), ('pegleg', []), ('scaling', [])])
+            for _, positions in to_compute:
+                cube = cubes[positions[0]]
+                hypo = OrderedDict(list(zip(opt_param_names, cube)))
+                all_sources['generic'].append(hypo_handler.get_generic_sources(hypo).copy())
+                all_sources['pegleg'].append(hypo_handler.get_pegleg_sources(hypo).copy())
+                all_sources['scaling'].append(hypo_handler.get_scaling_sources(hypo).copy())
+
+            if to_compute:
+                batch_kw = OrderedDict()
+                for kind, sources in all_sources.items():
+                    offsets = np.zeros(shape=len(sources) + 1, dtype=np.int64)
+                    offsets[1:] = np.cumsum([len(s) for s in sources])
+                    batch_kw[kind + '_sources'] = np.concatenate(sources)
+                    batch_kw[kind + '_sources_offsets'] = offsets
+
+                results = zip(*self.get_llh_batch(
+                    event_hit_info=event_hit_info,
+                    event_dom_info=event_dom_info,
+                    pegleg_stepsize=1,
+                    dom_grid=dom_grid,
+                    **batch_kw
+                ))
+                for (key, positions), result in zip(to_compute, results):
+                    if llh_cache is not None:
+                        cache_store(key, result)
+                    for i in positions:
+                        llhs[i], pegleg_idxs[i], scalefactors[i] = result
+
+            for cube, llh, pegleg_idx, scalefactor in zip(cubes, llhs, pegleg_idxs, scalefactors):
+                record_result(cube, llh, pegleg_idx, scalefactor, t0)
+
+            return llhs
+
         self.loglike = loglike
+        self.loglike_batch = loglike_batch
+        self.param_values = param_values
+        self.log_likelihoods = log_likelihoods
 
     def make_llhp(self, log_likelihoods, param_values, fname=None):
         """Create a structured numpy array containing the reco information;
@@ -1032,12 +1443,11 @@ class Reco(object):
         run_info : mapping, optional
         fname : string, optional
             * If not provided, estimate is not written to disk.
-            * If provided and APPEND_FILE is True, an `xarray.Dataset` where
-              each contained `xarray.DataArray` is one event's reconstruction
-              (plus run and estimate metadata); the name of each DataArray is
-              the event index, and Reco metadata is stored to `Dataset.attrs`;
-              output file is
-                {outdir}/slc{start}:{stop}:{step}.{fname}.pkl
+            * If provided and APPEND_FILE is True, the estimate is appended
+              to an estimate store (see `retro.utils.estimate_store`) at
+                {outdir}/slc{start}:{stop}:{step}.{fname}.est
+              with Reco metadata as store attrs; read this back via
+              `retro.utils.estimate_store.load_estimates`
             * If provided and APPEND_FILE is False, event and run_info metadata
               is written as an `xarray.DataArray` containing estimate and
               metadata to file at
@@ -1067,32 +1477,50 @@ class Reco(object):
         if not fname:
             return estimate
 
-        if APPEND_FILE:
-            estimate_outf = os.path.join(
-                self.outdir, '{}{}.pkl'.format(self.slice_prefix, fname)
+        if self.estimate_sink is not None:
+            self.estimate_sink.put(('estimate', (estimate, fname, self.event_prefix)))
+        else:
+            self._write_estimate(
+                estimate=estimate,
+                fname=fname,
+                event_prefix=self.event_prefix,
+                first_in_file=self.event_counter == 0,
             )
-            file_exists = os.path.isfile(estimate_outf)
-            if self.event_counter == 0:
-                if file_exists:
-                    raise IOError('File already exists at "{}"'.format(estimate_outf))
-                # create new Dataset
-                dataset = xr.Dataset()
-                dataset.attrs = self.attrs
-            else:
-                if not file_exists:
-                    raise IOError(
-                        'Output file with previous events does not exist at "{}"'
-                        .format(estimate_outf)
-                    )
-                dataset = pickle.load(open(estimate_outf, 'rb'))
-            dataset[estimate.name] = estimate
-            pickle.dump(
-                obj=dataset,
-                file=open(estimate_outf, 'wb'),
-                protocol=pickle.HIGHEST_PROTOCOL,
+
+        return estimate
+
+    def _write_estimate(self, estimate, fname, event_prefix, first_in_file):
+        """Write an estimate to disk; see `make_estimate` for the files
+        written.
+
+        Parameters
+        ----------
+        estimate : xarray.DataArray
+        fname : string
+        event_prefix : string
+        first_in_file : bool
+            Whether to create a new estimate store if APPEND_FILE is True
+            (otherwise the estimate is appended to the existing store)
+
+        """
+        if APPEND_FILE:
+            store_path = '{}{}{}'.format(self.slice_prefix, fname, ESTIMATE_STORE_EXT)
+            if self.resume:
+                stored_event_idxs = self.get_stored_event_idxs(fname)
+                event_idx = estimate.attrs['event_idx']
+                if event_idx in stored_event_idxs:
+                    print('Estimate "{}" of event "{}" already stored'.format(fname, event_idx))
+                    return
+                stored_event_idxs.add(event_idx)
+                first_in_file = first_in_file and not isdir(store_path)
+            append_estimate(
+                store_path=store_path,
+                estimate=estimate,
+                create=first_in_file,
+                store_attrs=self.attrs,
             )
         else: # save each event reco estimate as its own pickle file
-            estimate_outf = '{}{}.pkl'.format(self.event_prefix, fname)
+            estimate_outf = '{}{}.pkl'.format(event_prefix, fname)
             print('Saving estimate to "{}"'.format(estimate_outf))
             pickle.dump(
                 obj=estimate,
@@ -1100,7 +1528,270 @@ class Reco(object):
                 protocol=pickle.HIGHEST_PROTOCOL,
             )
 
-        return estimate
+    def get_stored_event_idxs(self, fname):
+        """Get indices of events whose estimate `fname` is stored on disk
+        (see `make_estimate`). For an estimate store, this also recovers the
+        store from a crash (see
+        `retro.utils.estimate_store.recover_estimate_store`) the first time it
+        is accessed.
+
+        Parameters
+        ----------
+        fname : string
+
+        Returns
+        -------
+        event_idxs : set of ints
+            Updated by `_write_estimate` as further estimates are written
+
+        """
+        if fname not in self._stored_event_idxs:
+            event_idxs = set()
+            if APPEND_FILE:
+                store_path = '{}{}{}'.format(self.slice_prefix, fname, ESTIMATE_STORE_EXT)
+                if isdir(store_path):
+                    recover_estimate_store(store_path)
+                    _, records = read_estimate_columns(store_path, mmap=False)
+                    event_idxs.update(int(idx) for idx in records['event_idx'])
+            else:
+                suffix = '.{}.pkl'.format(fname)
+                for fpath in glob(join(self.outdir, 'evt*' + suffix)):
+                    event_idxs.add(int(basename(fpath)[len('evt'):-len(suffix)]))
+            self._stored_event_idxs[fname] = event_idxs
+        return self._stored_event_idxs[fname]
+
+    def prepare_resume(self):
+        """If `resume` is True, find the events already reconstructed with
+        `method` (i.e., whose final estimate is stored) so that these are
+        skipped by `events`; otherwise, no events are skipped."""
+        self._stored_event_idxs = {}
+        self.completed_event_idxs = set()
+        if self.resume:
+            self.completed_event_idxs = set(
+                self.get_stored_event_idxs('{}.estimate'.format(self.method))
+            )
+            if self.completed_event_idxs:
+                print('Resuming: {} events already reconstructed'.format(
+                    len(self.completed_event_idxs)
+                ))
+
+    def get_checkpoint_path(self, kind):
+        """Get the path of the checkpoint for the next optimizer run on the
+        current event.
+
+        Optimizer runs are numbered in the order they occur for an event, so
+        the same recipe run again on the event finds the same checkpoints.
+
+        Parameters
+        ----------
+        kind : string
+            Kind of optimizer, e.g. "crs"
+
+        Returns
+        -------
+        path : string or None
+            None if neither `resume` nor checkpointing is enabled
+
+        """
+        counter = self.checkpoint_counter
+        self.checkpoint_counter += 1
+        if not self.resume and self.checkpoint_interval is None:
+            return None
+        return '{}{}.{}.{}{}'.format(
+            self.event_prefix, self.method, counter, kind, CHECKPOINT_EXT
+        )
+
+    def run_parallel(self, method, num_workers):
+        """Run reconstructions on events in `num_workers` worker processes.
+
+        Workers are forked from this process after tables are loaded and the
+        LLH functions are compiled (see `compile_llh_functions`), so they use
+        the very same tables (memory mapped from disk where the table kind
+        allows, otherwise shared copy-on-write; tables are never written to)
+        and compiled functions without reloading or recompiling anything.
+
+        Each worker evaluates batches of hypotheses serially (see
+        `get_llh_batch_serially`) rather than with the multithreaded
+        `get_llh_batch`, as otherwise every worker would start as many threads
+        as there are cores. Parallelism therefore comes from `num_workers`
+        alone, which should be about the number of cores available.
+
+        Events are read in this
+        process and handed out to whichever worker is free; estimates are
+        sent back and written to disk by this process alone, so output files
+        are the same as for `run` (except that events may appear in a
+        different order).
+
+        Parameters
+        ----------
+        method : string
+            One of `METHODS`; see `run`
+        num_workers : int > 0
+
+        """
+        if method not in METHODS:
+            raise ValueError(
+                'Unrecognized `method` "{}"; must be one of {}'.format(method, METHODS)
+            )
+        if num_workers < 1:
+            raise ValueError('`num_workers` must be >= 1; got {}'.format(num_workers))
+        self.check_warm_start_method(method)
+
+        print('Running "{}" reconstruction in {} worker processes...'
+              .format(method, num_workers))
+        t00 = time.time()
+
+        # Workers only send estimates back, so figure out here which events to
+        # skip when resuming
+        self.method = method
+        self.prepare_resume()
+
+        self.compile_llh_functions()
+
+        event_queue = multiprocessing.Queue(maxsize=2 * num_workers)
+        result_queue = multiprocessing.Queue()
+
+        workers = []
+        for _ in range(num_workers):
+            worker = multiprocessing.Process(
+                target=self._run_worker,
+                args=(method, event_queue, result_queue),
+            )
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+
+        def feed_events():
+            """Put events and then one stop sentinel per worker on the queue"""
+            for event_idx_and_event in self._get_events:
+                if event_idx_and_event[0] in self.completed_event_idxs:
+                    continue
+                event_queue.put(event_idx_and_event)
+            for _ in range(num_workers):
+                event_queue.put(None)
+
+        feeder = threading.Thread(target=feed_events)
+        feeder.daemon = True
+        feeder.start()
+
+        written_fnames = set()
+        num_workers_done = 0
+        try:
+            while num_workers_done < num_workers:
+                try:
+                    kind, payload = result_queue.get(timeout=1)
+                except queue.Empty:
+                    if any(w.exitcode not in (None, 0) for w in workers):
+                        raise RuntimeError('Reco worker process died')
+                    continue
+
+                if kind == 'estimate':
+                    estimate, fname, event_prefix = payload
+                    self._write_estimate(
+                        estimate=estimate,
+                        fname=fname,
+                        event_prefix=event_prefix,
+                        first_in_file=fname not in written_fnames,
+                    )
+                    written_fnames.add(fname)
+                elif kind == 'error':
+                    raise RuntimeError('Reco worker process failed:\n' + payload)
+                elif kind == 'done':
+                    num_workers_done += 1
+        finally:
+            for worker in workers:
+                if worker.is_alive() and num_workers_done < num_workers:
+                    worker.terminate()
+                worker.join()
+
+        print('Total script run time is {:.3f} s'.format(time.time() - t00))
+
+    def _run_worker(self, method, event_queue, result_queue):
+        """Target of worker processes started by `run_parallel`: reconstruct
+        events pulled from `event_queue` until a `None` sentinel is
+        encountered, sending estimates to and reporting completion (or
+        failure) via `result_queue`."""
+        try:
+            self._get_events = iter(event_queue.get, None)
+            self.estimate_sink = result_queue
+            self.get_llh_batch = self.get_llh_batch_serially
+            self.run(method=method)
+        except Exception: # pylint: disable=broad-except
+            result_queue.put(('error', traceback.format_exc()))
+        else:
+            result_queue.put(('done', None))
+
+    def compile_llh_functions(self):
+        """Compile `get_llh` by evaluating it once on a dummy event.
+
+        Numba compiles functions lazily, upon their first call; calling
+        `get_llh` here, before `run_parallel` forks its workers, means the
+        workers inherit the compiled code instead of each compiling it anew.
+        The dummy event's arrays have the same types as those of real events,
+        so no further compilation is triggered later on.
+
+        `get_llh_batch` is not compiled here, since workers evaluate batches
+        via `get_llh_batch_serially` (and running the multithreaded
+        `get_llh_batch` would start numba's thread pool prior to forking).
+
+        """
+        t0 = time.time()
+        event_dom_info = np.zeros(shape=1, dtype=EVT_DOM_INFO_T)
+        event_dom_info['quantum_efficiency'] = 1
+        event_dom_info['noise_rate_per_ns'] = 1e-7
+        event_dom_info['hits_stop_idx'] = 1
+        event_dom_info['total_observed_charge'] = 1
+        event_hit_info = np.zeros(shape=1, dtype=EVT_HIT_INFO_T)
+        event_hit_info['charge'] = 1
+        self.get_llh(
+            generic_sources=sources_to_soa(np.zeros(shape=1, dtype=SRC_T)),
+            pegleg_sources=sources_to_soa(EMPTY_SOURCES),
+            scaling_sources=sources_to_soa(EMPTY_SOURCES),
+            event_hit_info=event_hit_info,
+            event_dom_info=event_dom_info,
+            pegleg_stepsize=1,
+            dom_grid=generate_dom_grid(event_dom_info),
+        )
+        print('Compiled LLH functions in {:.3f} s'.format(time.time() - t0))
+
+    def get_llh_batch_serially(
+        self,
+        generic_sources,
+        generic_sources_offsets,
+        pegleg_sources,
+        pegleg_sources_offsets,
+        scaling_sources,
+        scaling_sources_offsets,
+        event_hit_info,
+        event_dom_info,
+        pegleg_stepsize,
+        dom_grid,
+    ):
+        """Drop-in replacement for `get_llh_batch` which evaluates hypotheses
+        one after another with `get_llh` (i.e., using a single thread), used by
+        `run_parallel` workers. See `get_llh_batch` for parameters and return
+        values."""
+        num_hypos = len(generic_sources_offsets) - 1
+        llhs = np.empty(shape=num_hypos)
+        pegleg_stop_idxs = np.empty(shape=num_hypos)
+        scalefactors = np.empty(shape=num_hypos)
+        for hypo_idx in range(num_hypos):
+            llhs[hypo_idx], pegleg_stop_idxs[hypo_idx], scalefactors[hypo_idx] = self.get_llh(
+                generic_sources=sources_to_soa(generic_sources[
+                    generic_sources_offsets[hypo_idx]:generic_sources_offsets[hypo_idx + 1]
+                ]),
+                pegleg_sources=sources_to_soa(pegleg_sources[
+                    pegleg_sources_offsets[hypo_idx]:pegleg_sources_offsets[hypo_idx + 1]
+                ]),
+                scaling_sources=sources_to_soa(scaling_sources[
+                    scaling_sources_offsets[hypo_idx]:scaling_sources_offsets[hypo_idx + 1]
+                ]),
+                event_hit_info=event_hit_info,
+                event_dom_info=event_dom_info,
+                pegleg_stepsize=pegleg_stepsize,
+                dom_grid=dom_grid,
+            )
+        return llhs, pegleg_stop_idxs, scalefactors
 
     def run_test(self, seed):
         """Random sampling instead of an actual minimizer"""
@@ -1169,10 +1860,15 @@ class Reco(object):
         use_priors,
         use_sobol,
         seed,
+        num_trials=None,
     ):
         """Implementation of the CRS2 algorithm, adapted to work with spherical
         coordinates (correct centroid calculation, reflection, and mutation).
 
+        The minimizer itself is the compiled engine in `retro.crs2`, which
+        proposes `num_trials` trial points per iteration; these are evaluated
+        in a single call to `loglike_batch`, i.e., in parallel.
+
         At the moment Cartesian (standard) parameters and spherical parameters
         are assumed to have particular names (i.e., spherical coordinates start
         with "az" and "zen"). Furthermore, all Cartesian coordinates must come
@@ -1184,9 +1880,10 @@ class Reco(object):
         n_live : int
             Number of live points
         max_iter : int
-            Maximum iterations
+            Maximum iterations, counted in trial points
         max_noimprovement : int
-            Maximum iterations with no improvement of best point
+            Maximum iterations (counted in trial points) with no improvement of
+            best point
         min_fn_std : float
             Break if stddev of function values across all livepoints drops
             below this threshold
@@ -1194,11 +1891,14 @@ class Reco(object):
             Break condition on stddev of vertex
         use_priors : bool
             Use priors during minimization; if `False`, priors are only used
-            for sampling the initial distributions
+            for sampling the initial distributions. If `self.warm_start` is
+            set, the first point of the initial population is the warm start.
         use_sobol : bool
             Use a Sobol sequence instead of numpy pseudo-random numbers
         seed : int
             Random seed
+        num_trials : int, optional
+            Number of trial points per iteration; defaults to `CRS_NUM_TRIALS`
 
         Returns
         -------
@@ -1219,6 +1919,9 @@ class Reco(object):
         if use_sobol:
             from sobol import i4_sobol
 
+        if num_trials is None:
+            num_trials = CRS_NUM_TRIALS
+
         kwargs = sort_dict(dict(
             n_live=n_live,
             max_iter=max_iter,
@@ -1228,6 +1931,7 @@ class Reco(object):
             use_priors=use_priors,
             use_sobol=use_sobol,
             seed=seed,
+            num_trials=num_trials,
         ))
 
         rand = np.random.RandomState(seed=seed)
@@ -1248,204 +1952,133 @@ class Reco(object):
             assert 'az' in az_param, '"{}" not azimuth param'.format(az_param)
             assert 'zen' in zen_param, '"{}" not zenith param'.format(zen_param)
 
-        # setup arrays to store points
-        s_cart = np.zeros(shape=(n_live, n_cart))
-        s_spher = np.zeros(shape=(n_live, n_spher_param_pairs), dtype=SPHER_T)
-        fx = np.zeros(shape=(n_live,))
-
-        def fun(x):
-            """Callable for minimizer"""
+        def fun_batch(xs):
+            """Map points `xs` onto physical parameter values and return
+            negative LLHs"""
             if use_priors:
-                param_vals = np.zeros_like(x)
-                param_vals[:n_cart] = x[:n_cart]
-                self.prior(param_vals)
-                param_vals[n_cart:] = x[n_cart:]
+                param_vals = np.zeros_like(xs)
+                param_vals[:, :n_cart] = xs[:, :n_cart]
+                self.prior_batch(param_vals)
+                param_vals[:, n_cart:] = xs[:, n_cart:]
             else:
-                param_vals = x
-            llh = self.loglike(param_vals)
-            return -llh
+                param_vals = xs
+            return -self.loglike_batch(param_vals)
+
+        checkpoint_path = self.get_checkpoint_path('crs')
+        state = None
+        if self.resume and checkpoint_path is not None:
+            state = load_checkpoint(checkpoint_path)
+            if state is not None and state['kwargs'] != kwargs:
+                print('Ignoring CRS checkpoint "{}" made with different settings'
+                      .format(checkpoint_path))
+                state = None
+
+        if state is not None:
+            print('Resuming CRS from checkpoint "{}"'.format(checkpoint_path))
+            s_cart = state['cart']
+            s_spher = state['spher']
+            fx = state['fx']
+            rand.set_state(state['rand_state'])
+            self.param_values[:] = state['param_values']
+            self.log_likelihoods[:] = state['log_likelihoods']
+
+        else:
+            # generate initial population
+            initial_xs = np.empty(shape=(n_live, n_opt_params))
+            for i in range(n_live):
+                if use_sobol:
+                    # sobol seems to do slightly better
+                    initial_xs[i], _ = i4_sobol(n_opt_params, i+1)
+                else:
+                    initial_xs[i] = rand.uniform(0, 1, n_opt_params)
+            all_prior_param_vals = np.copy(initial_xs)
+            self.prior_batch(all_prior_param_vals)
 
-        def create_x(x_cart, x_spher):
-            """Patch Cartesian and spherical coordinates into one array"""
-            # TODO: make proper
-            x = np.empty(shape=n_opt_params)
-            x[:n_cart] = x_cart
-            x[n_cart+1::2] = x_spher['zen']
-            x[n_cart::2] = x_spher['az']
-            return x
-
-        # generate initial population
-        for i in range(n_live):
-            if use_sobol:
-                # sobol seems to do slightly better
-                x, _ = i4_sobol(n_opt_params, i+1)
-            else:
-                x = rand.uniform(0, 1, n_opt_params)
-            param_vals = np.copy(x)
-            self.prior(param_vals)
             # always transform angles!
-            x[n_cart:] = param_vals[n_cart:]
+            initial_xs[:, n_cart:] = all_prior_param_vals[:, n_cart:]
             if not use_priors:
-                x[:n_cart] = param_vals[:n_cart]
-
-            # break up into cartesiand and spherical coordinates
-            s_cart[i] = x[:n_cart]
-            s_spher[i]['zen'] = x[n_cart+1::2]
-            s_spher[i]['az'] = x[n_cart::2]
-            fill_from_spher(s_spher[i])
-            fx[i] = fun(x)
-
-        best_llh = np.min(fx)
-        no_improvement_counter = -1
-
-        # optional bookkeeping
-        num_simplex_successes = 0
-        num_mutation_successes = 0
-        num_failures = 0
-        stopping_flag = 0
-
-        # minimizer loop
-        iter_num = 0
-        for iter_num in range(max_iter):
-            if iter_num % REPORT_AFTER == 0:
-                print(
-                    'simplex: %i, mutation: %i, failed: %i'
-                    % (num_simplex_successes, num_mutation_successes, num_failures)
-                )
-
-            # break condition 1
-            if np.std(fx) < min_fn_std:
-                stopping_flag = 1
-                break
-
-            # break condition 2
-            if no_improvement_counter > max_noimprovement:
-                stopping_flag = 2
-                break
-
-            # break condition 3
-            done = []
-            stds = []
-            for dim, cond in zip(('x', 'y', 'z', 'time'), min_vertex_std):
-                if dim in opt_param_names:
-                    std = np.std(s_cart[:, opt_param_names.index(dim)])
-                    stds.append(std)
-                    done.append(std < cond)
-            if len(done) > 0 and all(done):
-                stopping_flag = 3
-                break
-
-            new_best_llh = np.min(fx)
-
-            if new_best_llh < best_llh:
-                best_llh = new_best_llh
-                no_improvement_counter = 0
-            else:
-                no_improvement_counter += 1
-
-            worst_idx = np.argmax(fx)
-            best_idx = np.argmin(fx)
-
-            # choose n_opt_params random points but not best
-            choice = rand.choice(n_live - 1, n_opt_params, replace=False)
-            choice[choice >= best_idx] += 1
-
-            # Cartesian centroid
-            centroid_cart = (
-                (np.sum(s_cart[choice[:-1]], axis=0) + s_cart[best_idx]) / n_opt_params
+                initial_xs[:, :n_cart] = all_prior_param_vals[:, :n_cart]
+
+            if self.warm_start:
+                warm_start_params = self.get_warm_start_params(all_prior_param_vals[0])
+                initial_xs[0] = warm_start_params
+                if use_priors:
+                    initial_xs[0, :n_cart] = self.prior_inverse(warm_start_params)[:n_cart]
+
+            # break up into Cartesian coordinates and unit vectors
+            s_cart = np.ascontiguousarray(initial_xs[:, :n_cart])
+            s_spher = np.empty(shape=(n_live, n_spher_param_pairs, 3))
+            spher_from_angles(
+                np.ascontiguousarray(initial_xs[:, n_cart::2]),
+                np.ascontiguousarray(initial_xs[:, n_cart+1::2]),
+                s_spher,
             )
 
-            # reflect point
-            new_x_cart = 2*centroid_cart - s_cart[choice[-1]]
-
-            # spherical centroid
-            centroid_spher = np.zeros(n_spher_param_pairs, dtype=SPHER_T)
-            centroid_spher['x'] = (
-                np.sum(s_spher['x'][choice[:-1]], axis=0) + s_spher['x'][best_idx]
-            ) / n_opt_params
-            centroid_spher['y'] = (
-                np.sum(s_spher['y'][choice[:-1]], axis=0) + s_spher['y'][best_idx]
-            ) / n_opt_params
-            centroid_spher['z'] = (
-                np.sum(s_spher['z'][choice[:-1]], axis=0) + s_spher['z'][best_idx]
-            ) / n_opt_params
-            fill_from_cart(centroid_spher)
-
-            # reflect point
-            new_x_spher = np.zeros(n_spher_param_pairs, dtype=SPHER_T)
-            reflect(s_spher[choice[-1]], centroid_spher, new_x_spher)
-
-            if use_priors:
-                outside = np.any(new_x_cart < 0) or np.any(new_x_cart > 1)
-            else:
-                outside = False
-
-            if not outside:
-                new_fx = fun(create_x(new_x_cart, new_x_spher))
-
-                if new_fx < fx[worst_idx]:
-                    # found better point
-                    s_cart[worst_idx] = new_x_cart
-                    s_spher[worst_idx] = new_x_spher
-                    fx[worst_idx] = new_fx
-                    num_simplex_successes += 1
-                    continue
-
-            # mutation
-            w = rand.uniform(0, 1, n_cart)
-            new_x_cart2 = (1 + w) * s_cart[best_idx] - w * new_x_cart
-
-            # first reflect at best point
-            reflected_new_x_spher = np.zeros(n_spher_param_pairs, dtype=SPHER_T)
-            reflect(new_x_spher, s_spher[best_idx], reflected_new_x_spher)
-
-            new_x_spher2 = np.zeros_like(new_x_spher)
-
-            # now do a combination of best and reflected point with weight w
-            for dim in ('x', 'y', 'z'):
-                w = rand.uniform(0, 1, n_spher_param_pairs)
-                new_x_spher2[dim] = (
-                    (1 - w) * s_spher[best_idx][dim]
-                    + w * reflected_new_x_spher[dim]
-                )
-            fill_from_cart(new_x_spher2)
-
-            if use_priors:
-                outside = np.any(new_x_cart2 < 0) or np.any(new_x_cart2 > 1)
-            else:
-                outside = False
-
-            if not outside:
-                new_fx = fun(create_x(new_x_cart2, new_x_spher2))
-
-                if new_fx < fx[worst_idx]:
-                    # found better point
-                    s_cart[worst_idx] = new_x_cart2
-                    s_spher[worst_idx] = new_x_spher2
-                    fx[worst_idx] = new_fx
-                    num_mutation_successes += 1
-                    continue
-
-            # if we get here no method was successful in replacing worst
-            # point -> start over
-            num_failures += 1
-
-        print(CRS_STOP_FLAGS[stopping_flag])
-
-        fit_meta = sort_dict(dict(
-            stopping_flag=stopping_flag,
-            stopping_message=CRS_STOP_FLAGS[stopping_flag],
-            num_simplex_successes=num_simplex_successes,
-            num_mutation_successes=num_mutation_successes,
-            num_failures=num_failures,
-            iterations=iter_num,
-        ))
+            # evaluate the initial population all at once
+            fx = fun_batch(initial_xs)
+
+        def make_checkpoint(crs_state=None, fit_meta=None):
+            """Save the current state of the minimization, or its result if
+            `fit_meta` is given"""
+            save_checkpoint(checkpoint_path, OrderedDict([
+                ('kwargs', kwargs),
+                ('cart', s_cart),
+                ('spher', s_spher),
+                ('fx', fx),
+                ('rand_state', rand.get_state()),
+                ('crs_state', crs_state),
+                ('fit_meta', fit_meta),
+                ('param_values', self.param_values),
+                ('log_likelihoods', self.log_likelihoods),
+            ]))
+
+        checkpoint = None
+        if self.checkpoint_interval is not None:
+            last_checkpoint_time = [time.time()]
+            def checkpoint(crs_state):
+                """Called by `crs2_minimize` every iteration; save the state
+                at most every `checkpoint_interval` seconds"""
+                if time.time() - last_checkpoint_time[0] < self.checkpoint_interval:
+                    return
+                make_checkpoint(crs_state=crs_state)
+                last_checkpoint_time[0] = time.time()
+
+        vertex_std_idx = []
+        vertex_std_min = []
+        for dim, cond in zip(('x', 'y', 'z', 'time'), min_vertex_std):
+            if dim in opt_param_names:
+                vertex_std_idx.append(opt_param_names.index(dim))
+                vertex_std_min.append(cond)
+
+        if state is not None and state['fit_meta'] is not None:
+            # Minimization had finished
+            fit_meta = state['fit_meta']
+        else:
+            fit_meta = crs2_minimize(
+                fun_batch=fun_batch,
+                cart=s_cart,
+                spher=s_spher,
+                fx=fx,
+                rand=rand,
+                max_iter=max_iter,
+                max_noimprovement=max_noimprovement,
+                min_fn_std=min_fn_std,
+                vertex_std_idx=vertex_std_idx,
+                vertex_std_min=vertex_std_min,
+                bounded=use_priors,
+                num_trials=num_trials,
+                report_after=REPORT_AFTER,
+                state=None if state is None else state['crs_state'],
+                checkpoint=checkpoint,
+            )
+            if self.checkpoint_interval is not None:
+                make_checkpoint(fit_meta=fit_meta)
 
         run_info = sort_dict(dict(
             method='run_crs',
             method_description='CRS2spherical+lm+sampling',
             kwargs=kwargs,
-            fit_meta=fit_meta,
+            fit_meta=sort_dict(fit_meta),
         ))
         return run_info
 
@@ -1458,7 +2091,11 @@ class Reco(object):
         ))
 
         # initial guess
-        x0 = 0.5 * np.ones(shape=self.n_opt_params)
+        x0 = np.clip(
+            self.get_warm_start_cube(0.5 * np.ones(shape=self.n_opt_params)),
+            eps,
+            1 - eps,
+        )
 
         def fun(x, *args): # pylint: disable=unused-argument, missing-docstring
             param_vals = np.copy(x)
@@ -1472,7 +2109,15 @@ class Reco(object):
         settings['eps'] = eps
 
         if method == 'differential_evolution':
-            optimize.differential_evolution(fun, bounds=bounds, popsize=100)
+            popsize = 100
+            init = 'latinhypercube'
+            if self.warm_start:
+                # random initial population, with the warm start as one member
+                init = np.random.RandomState(seed=0).uniform(
+                    eps, 1 - eps, size=(popsize * self.n_opt_params, self.n_opt_params)
+                )
+                init[0] = x0
+            optimize.differential_evolution(fun, bounds=bounds, popsize=popsize, init=init)
         else:
             optimize.minimize(fun, x0, method=method, bounds=bounds, options=settings)
 
@@ -1483,7 +2128,7 @@ class Reco(object):
         from skopt import gp_minimize #, forest_minimize
 
         # initial guess
-        x0 = 0.5 * np.ones(shape=self.n_opt_params)
+        x0 = self.get_warm_start_cube(0.5 * np.ones(shape=self.n_opt_params))
 
         def fun(x, *args): # pylint: disable=unused-argument, missing-docstring
             param_vals = np.copy(x)
@@ -1562,19 +2207,23 @@ class Reco(object):
 
         # initial guess
 
-        angles = np.linspace(0, 1, 3)
-        angles = 0.5 * (angles[1:] + angles[:-1])
+        if self.warm_start:
+            x0 = self.get_warm_start_cube(0.5 * np.ones(shape=self.n_opt_params))
+            x = opt.optimize(x0) # pylint: disable=unused-variable
+        else:
+            angles = np.linspace(0, 1, 3)
+            angles = 0.5 * (angles[1:] + angles[:-1])
 
-        for zen in angles:
-            for az in angles:
-                x0 = 0.5 * np.ones(shape=self.n_opt_params)
+            for zen in angles:
+                for az in angles:
+                    x0 = 0.5 * np.ones(shape=self.n_opt_params)
 
-                for i in range(self.n_opt_params):
-                    if 'az' in self.hypo_handler.opt_param_names[i]:
-                        x0[i] = az
-                    elif 'zen' in self.hypo_handler.opt_param_names[i]:
-                        x0[i] = zen
-                x = opt.optimize(x0) # pylint: disable=unused-variable
+                    for i in range(self.n_opt_params):
+                        if 'az' in self.hypo_handler.opt_param_names[i]:
+                            x0[i] = az
+                        elif 'zen' in self.hypo_handler.opt_param_names[i]:
+                            x0[i] = zen
+                    x = opt.optimize(x0) # pylint: disable=unused-variable
 
         #local_opt = nlopt.opt(nlopt.LN_NELDERMEAD, self.n_opt_params)
         #local_opt.set_lower_bounds([0.]*self.n_opt_params)
@@ -1724,7 +2373,34 @@ class Reco(object):
         print('Runing MultiNest...')
 
         fit_meta = {}
-        tmpdir = mkdtemp()
+        checkpoint_path = self.get_checkpoint_path('mn')
+        resume = False
+        dump_callback = None
+        if self.checkpoint_interval is None:
+            tmpdir = mkdtemp()
+        else:
+            # MultiNest's own output files serve as its checkpoint; keep them
+            # in a persistent directory (removed once the event is done), along
+            # with the LLHP recorded so far
+            tmpdir = checkpoint_path
+            mkdir(tmpdir)
+            llhp_checkpoint_path = join(tmpdir, 'llhp' + CHECKPOINT_EXT)
+            if self.resume:
+                state = load_checkpoint(llhp_checkpoint_path)
+                if state is not None and state['kwargs'] == mn_kwargs:
+                    print('Resuming MultiNest from "{}"'.format(tmpdir))
+                    self.param_values[:] = state['param_values']
+                    self.log_likelihoods[:] = state['log_likelihoods']
+                    resume = True
+
+            def dump_callback(*args): # pylint: disable=unused-argument
+                """Called by MultiNest whenever it updates its output files"""
+                save_checkpoint(llhp_checkpoint_path, OrderedDict([
+                    ('kwargs', mn_kwargs),
+                    ('param_values', self.param_values),
+                    ('log_likelihoods', self.log_likelihoods),
+                ]))
+
         outputfiles_basename = join(tmpdir, '')
         try:
             pymultinest.run(
@@ -1732,14 +2408,16 @@ class Reco(object):
                 Prior=self.prior,
                 verbose=True,
                 outputfiles_basename=outputfiles_basename,
-                resume=False,
+                resume=resume,
                 write_output=True,
                 n_iter_before_update=REPORT_AFTER,
+                dump_callback=dump_callback,
                 **mn_kwargs
             )
             fit_meta = get_multinest_meta(outputfiles_basename=outputfiles_basename)
         finally:
-            rmtree(tmpdir)
+            if self.checkpoint_interval is None:
+                rmtree(tmpdir)
 
         run_info = sort_dict(dict(
             method='run_multinest',
@@ -1816,6 +2494,47 @@ def parse_args(description=__doc__):
         '--save-llhp', action='store_true',
         help='Whether to save LLHP within 30 LLH of max-LLH to disk'
     )
+    parser.add_argument(
+        '--num-workers', type=int, default=1,
+        help='''Number of worker processes reconstructing events in parallel,
+        all sharing one copy of the tables; default is 1, i.e., reconstruct
+        events serially in this process. Workers evaluate LLHs with a single
+        thread each (a single process uses all cores for batches of
+        hypotheses), so use about as many workers as there are cores'''
+    )
+    parser.add_argument(
+        '--llh-cache-size', type=int, default=0,
+        help='''Number of most recently evaluated hypotheses per event whose
+        LLHs are cached so the minimizer revisiting them does not recompute
+        them; default is 0, i.e., no caching'''
+    )
+    parser.add_argument(
+        '--llh-cache-resolution', type=float, default=1e-3,
+        help='''Hypotheses whose parameter values all round to the same
+        multiple of this value share an LLH cache entry'''
+    )
+    parser.add_argument(
+        '--warm-start-reco', default=None,
+        help='''Name of a reco stored with the events (e.g. "SPEFit2") from
+        which to start the minimizer (for "crs_prefit_mn" and
+        "experimental_trackfit", the prefit); not allowed with methods "test"
+        and "truth"'''
+    )
+    parser.add_argument(
+        '--narrow-priors', action='store_true',
+        help='''Narrow the priors on x, y, z, and time about the reco given by
+        --warm-start-reco'''
+    )
+    parser.add_argument(
+        '--resume', action='store_true',
+        help='''Skip events whose estimates are already in --outdir and resume
+        optimizers from checkpoints left by an interrupted run'''
+    )
+    parser.add_argument(
+        '--checkpoint-interval', type=float, default=None,
+        help='''Checkpoint optimizer state at most every this many seconds;
+        default is to not checkpoint'''
+    )
 
     split_kwargs = init_obj.parse_args(
         dom_tables=True, tdi_tables=True, events=True, parser=parser
@@ -1829,6 +2548,10 @@ if __name__ == '__main__':
     kwargs = parse_args()
     other_kw = kwargs.pop('other_kw')
     method = other_kw.pop('method')
+    num_workers = other_kw.pop('num_workers')
     kwargs.update(other_kw)
     my_reco = Reco(**kwargs)
-    my_reco.run(method=method)
+    if num_workers > 1:
+        my_reco.run_parallel(method=method, num_workers=num_workers)
+    else:
+        my_reco.run(method=method)
@@ -0,0 +1,383 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+
+"""
+Long-lived reconstruction server: load tables and compile the LLH functions
+once, then reconstruct events for jobs submitted over a Unix socket, streaming
+estimates back to the client as each event finishes.
+
+Start a server with the same table arguments as `retro/reco.py`, e.g. ::
+
+    reco_server.py --socket /tmp/retro.sock --outdir /tmp/out <table args>
+
+and submit jobs from Python via `submit_job`; stop the server via
+`shutdown_server` (or by killing the process).
+
+Messages are pickled, so whoever can connect to the socket can run arbitrary
+code as the server process: the protocol is for trusted local use only. The
+socket is created accessible only to the user running the server (mode 0600);
+do not loosen its permissions or expose it to other users.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__all__ = [
+    'send_msg',
+    'recv_msg',
+    'RecoServer',
+    'submit_job',
+    'shutdown_server',
+    'parse_args',
+]
+
+__author__ = 'J.L. Lanfranchi, P. Eller'
+__license__ = '''Copyright 2018 Justin L. Lanfranchi and Philipp Eller
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.'''
+
+from argparse import ArgumentParser
+import os
+from os.path import abspath, dirname, exists
+import socket
+import stat
+import struct
+import sys
+import time
+import traceback
+
+from six.moves import cPickle as pickle
+
+if __name__ == '__main__' and __package__ is None:
+    RETRO_DIR = dirname(dirname(abspath(__file__)))
+    if RETRO_DIR not in sys.path:
+        sys.path.append(RETRO_DIR)
+from retro import init_obj
+from retro.reco import METHODS, Reco
+from retro.utils.misc import expand
+
+
+_MSG_LEN_FMT = '>Q'
+_MSG_LEN_SIZE = struct.calcsize(_MSG_LEN_FMT)
+
+
+def send_msg(sock, obj):
+    """Send a picklable object over a socket as a length-prefixed message.
+
+    Parameters
+    ----------
+    sock : socket.socket
+    obj : picklable object
+
+    """
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(struct.pack(_MSG_LEN_FMT, len(data)) + data)
+
+
+def _recv_exactly(sock, num_bytes):
+    """Receive exactly `num_bytes` from `sock`; return None if the connection
+    is closed first."""
+    chunks = []
+    remaining = num_bytes
+    while remaining > 0:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_msg(sock):
+    """Receive an object sent via `send_msg`.
+
+    The object is unpickled, so only receive from trusted peers.
+
+    Parameters
+    ----------
+    sock : socket.socket
+
+    Returns
+    -------
+    obj : object or None
+        None if the connection was closed
+
+    """
+    header = _recv_exactly(sock, _MSG_LEN_SIZE)
+    if header is None:
+        return None
+    data = _recv_exactly(sock, struct.unpack(_MSG_LEN_FMT, header)[0])
+    if data is None:
+        return None
+    return pickle.loads(data)
+
+
+class _SocketSink(object):
+    """Pass estimates on to a client as they are produced; see
+    `Reco.estimate_sink`"""
+    def __init__(self, sock):
+        self.sock = sock
+
+    def put(self, msg):
+        """Send `msg` to the client"""
+        send_msg(self.sock, msg)
+
+
+class RecoServer(object):
+    """Keep tables loaded and LLH functions compiled in a `Reco` object, and
+    reconstruct events for jobs received over a Unix socket, one job at a
+    time.
+
+    A job is a dict with keys "method" (one of `METHODS`) and "events_kw"
+    (keyword arguments to `retro.init_obj.get_events`); the server replies
+    with one ``('estimate', (estimate, fname, event_prefix))`` message per
+    estimate produced, followed by either ``('done', None)`` or ``('error',
+    traceback_string)``. A job ``{'command': 'shutdown'}`` stops the server.
+
+    Jobs are unpickled, so the server is for trusted local use only; its
+    socket is made accessible only to the user running the server.
+
+    Parameters
+    ----------
+    socket_path : string
+        Path at which to create the Unix socket
+    dom_tables_kw, tdi_tables_kw, outdir, save_llhp
+        Passed to `Reco`; note that estimates are streamed to the client and
+        _not_ written to `outdir` by the server
+    llh_cache_size, llh_cache_resolution, warm_start_reco, narrow_priors
+        Passed to `Reco`
+
+    """
+    def __init__(
+        self,
+        socket_path,
+        dom_tables_kw,
+        tdi_tables_kw,
+        outdir,
+        save_llhp=False,
+        llh_cache_size=0,
+        llh_cache_resolution=1e-3,
+        warm_start_reco=None,
+        narrow_priors=False,
+    ):
+        self.socket_path = expand(socket_path)
+        self.reco = Reco(
+            events_kw=None,
+            dom_tables_kw=dom_tables_kw,
+            tdi_tables_kw=tdi_tables_kw,
+            outdir=outdir,
+            save_llhp=save_llhp,
+            llh_cache_size=llh_cache_size,
+            llh_cache_resolution=llh_cache_resolution,
+            warm_start_reco=warm_start_reco,
+            narrow_priors=narrow_priors,
+        )
+
+    def serve_forever(self):
+        """Accept and run jobs until a shutdown command is received"""
+        if exists(self.socket_path):
+            if not stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+                raise IOError(
+                    'Path "{}" exists and is not a socket'.format(self.socket_path)
+                )
+            # Left behind by a previous server that was killed
+            os.remove(self.socket_path)
+
+        server_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            # Restrict the socket to the current user from its creation on, as
+            # anyone able to connect can run arbitrary code via pickled jobs
+            old_umask = os.umask(0o177)
+            try:
+                server_sock.bind(self.socket_path)
+            finally:
+                os.umask(old_umask)
+            os.chmod(self.socket_path, stat.S_IRUSR | stat.S_IWUSR)
+            server_sock.listen(5)
+            print('Listening for reco jobs at "{}"'.format(self.socket_path))
+            keep_serving = True
+            while keep_serving:
+                conn, _ = server_sock.accept()
+                try:
+                    keep_serving = self.handle(conn)
+                finally:
+                    conn.close()
+        finally:
+            server_sock.close()
+            if exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def handle(self, conn):
+        """Run a single job received on connection `conn`.
+
+        Parameters
+        ----------
+        conn : socket.socket
+
+        Returns
+        -------
+        keep_serving : bool
+
+        """
+        job = recv_msg(conn)
+        if job is None:
+            return True
+
+        if job.get('command') == 'shutdown':
+            send_msg(conn, ('done', None))
+            return False
+
+        t0 = time.time()
+        try:
+            method = job['method']
+            if method not in METHODS:
+                raise ValueError(
+                    'Unrecognized `method` "{}"; must be one of {}'.format(method, METHODS)
+                )
+            self.reco.set_events(job['events_kw'])
+            self.reco.estimate_sink = _SocketSink(conn)
+            self.reco.run(method=method)
+        except socket.error:
+            print('Client disconnected; abandoning job')
+            return True
+        except Exception: # pylint: disable=broad-except
+            reply = ('error', traceback.format_exc())
+        else:
+            reply = ('done', None)
+        finally:
+            self.reco.estimate_sink = None
+
+        try:
+            send_msg(conn, reply)
+        except socket.error:
+            pass
+        print('Job took {:.3f} s'.format(time.time() - t0))
+
+        return True
+
+
+def submit_job(socket_path, method, events_kw):
+    """Submit a reconstruction job to a running `RecoServer` and iterate over
+    the estimates as the server produces them.
+
+    Parameters
+    ----------
+    socket_path : string
+    method : string
+        One of `METHODS`
+    events_kw : mapping
+        Keyword arguments to `retro.init_obj.get_events`
+
+    Yields
+    ------
+    estimate : xarray.DataArray
+    fname : string
+        Name of the kind of estimate, e.g. "estimate" or "prefit_estimate"
+
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(expand(socket_path))
+        send_msg(sock, dict(method=method, events_kw=dict(events_kw)))
+        while True:
+            msg = recv_msg(sock)
+            if msg is None:
+                raise IOError('Reco server closed the connection')
+            kind, payload = msg
+            if kind == 'estimate':
+                estimate, fname, _ = payload
+                yield estimate, fname
+            elif kind == 'done':
+                return
+            elif kind == 'error':
+                raise RuntimeError('Reco server failed:\n' + payload)
+            else:
+                raise ValueError('Unexpected message kind "{}"'.format(kind))
+    finally:
+        sock.close()
+
+
+def shutdown_server(socket_path):
+    """Stop a running `RecoServer` once it is finished with its current job.
+
+    Parameters
+    ----------
+    socket_path : string
+
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(expand(socket_path))
+        send_msg(sock, dict(command='shutdown'))
+        recv_msg(sock)
+    finally:
+        sock.close()
+
+
+def parse_args(description=__doc__):
+    """Parse command-line arguments.
+
+    Returns
+    -------
+    split_kwargs : dict of dicts
+        Contains keys "dom_tables_kw", "tdi_tables_kw", and "other_kw"
+
+    """
+    parser = ArgumentParser(description=description)
+
+    parser.add_argument(
+        '--socket', required=True,
+        help='Path at which to create the Unix socket to listen on'
+    )
+    parser.add_argument(
+        '--outdir', required=True
+    )
+    parser.add_argument(
+        '--save-llhp', action='store_true',
+        help='Whether to save LLHP within 30 LLH of max-LLH to disk'
+    )
+    parser.add_argument(
+        '--llh-cache-size', type=int, default=0,
+        help='''Number of most recently evaluated hypotheses per event whose
+        LLHs are cached; default is 0, i.e., no caching'''
+    )
+    parser.add_argument(
+        '--llh-cache-resolution', type=float, default=1e-3,
+        help='''Hypotheses whose parameter values all round to the same
+        multiple of this value share an LLH cache entry'''
+    )
+    parser.add_argument(
+        '--warm-start-reco', default=None,
+        help='''Name of a reco stored with the events (e.g. "SPEFit2") from
+        which to start the minimizer'''
+    )
+    parser.add_argument(
+        '--narrow-priors', action='store_true',
+        help='''Narrow the priors on x, y, z, and time about the reco given by
+        --warm-start-reco'''
+    )
+
+    split_kwargs = init_obj.parse_args(
+        dom_tables=True, tdi_tables=True, parser=parser
+    )
+
+    return split_kwargs
+
+
+if __name__ == '__main__':
+    # pylint: disable=invalid-name
+    kwargs = parse_args()
+    other_kw = kwargs.pop('other_kw')
+    kwargs['socket_path'] = other_kw.pop('socket')
+    kwargs.update(other_kw)
+    RecoServer(**kwargs).serve_forever()
@@ -24,14 +24,18 @@ __all__ = [
     'DOM_INFO_T',
     'EVT_DOM_INFO_T',
     'HIT_T',
+    'EVENT_INDEXER_T',
+    'DOM_INDEXER_T',
     'SD_INDEXER_T',
     'HITS_SUMMARY_T',
     'EVT_HIT_INFO_T',
+    'DOM_GRID_T',
     'TypeID',
     'SourceID',
     'SubtypeID',
     'TRIGGER_T',
     'SRC_T',
+    'SourcesSoA',
     'SPHER_T',
 ]
 
@@ -188,10 +192,20 @@ HIT_T = np.dtype([
     ('charge', np.float32)
 ])
 
-#EVENT_INDEXER_T = np.dtype([
-#    ('first_idx', np.uint32),
-#    ('num', np.uint32)
-#])
+EVENT_INDEXER_T = np.dtype([
+    ('first_idx', np.uint64),
+    ('num', np.uint32)
+])
+"""Locate an event's entries within a flat array holding those of all events"""
+
+DOM_INDEXER_T = np.dtype([
+    ('string', np.uint16),
+    ('dom', np.uint16),
+    ('pmt', np.uint16),
+    ('offset', np.uint64),
+    ('num', np.uint32)
+])
+"""Locate a single DOM's (or PMT's) pulses or photons within a flat array"""
 
 SD_INDEXER_T = np.dtype([
     ('sd_idx', np.uint32),
@@ -216,6 +230,15 @@ EVT_HIT_INFO_T = np.dtype([
     ('event_dom_idx', np.uint32),
 ])
 
+# uniform grid in the xy-plane used to look up operational DOMs near a point
+DOM_GRID_T = np.dtype([
+    ('x_min', np.float64),
+    ('y_min', np.float64),
+    ('cell_size', np.float64),
+    ('num_x_cells', np.uint32),
+    ('num_y_cells', np.uint32),
+])
+
 # type to store spherical coordinates and handy quantities
 SPHER_T = np.dtype([
     ('zen',np.float32),
@@ -365,3 +388,12 @@ SRC_T = np.dtype([
     ('ckv_sintheta', np.float32),
 ], align=True)
 """Each source point is described by (up to) these 9 fields"""
+
+SourcesSoA = namedtuple( # pylint: disable=invalid-name
+    typename='SourcesSoA',
+    field_names=SRC_T.names,
+)
+"""Struct-of-arrays alternative to an array of dtype SRC_T: one contiguous
+array per field of SRC_T (each of that field's dtype), such that loops over
+sources only touch the fields they use. See
+:func:`retro.hypo.discrete_hypo.sources_to_soa`"""
@@ -12,13 +12,30 @@ __all__ = [
     'Minimizer',
     'StepSpacing',
     'LLHChoice',
+    'EarlyStop',
     'MACHINE_EPS',
     'MAX_RAD_SQ',
     'SCALE_FACTOR_MINIMIZER',
+    'SCALE_FACTOR_MAX',
     'PEGLEG_SPACING',
     'PEGLEG_LLH_CHOICE',
     'PEGLEG_BEST_DELTA_LLH_THRESHOLD',
+    'PEGLEG_EARLY_STOP',
+    'PEGLEG_MAX_GETTING_WORSE_STEPS',
+    'PEGLEG_STOP_DELTA_LLH',
+    'PEGLEG_COARSE_STEPSIZE',
+    'PEGLEG_REFINE_FACTOR',
+    'PEGLEG_REFINE_DELTA_LLH',
     'USE_JITTER',
+    'JITTER_DT',
+    'JITTER_SIGMA',
+    'get_jitter_kernel',
+    'DOM_GRID_CELL_SIZE',
+    'address_as_void_pointer',
+    'get_array_address',
+    'generate_event_dom_hit_info',
+    'generate_dom_grid',
+    'find_nearby_doms',
     'generate_pexp_and_llh_functions',
 ]
 
@@ -38,22 +55,27 @@ See the License for the specific language governing permissions and
 limitations under the License.'''
 
 from collections import OrderedDict
+from contextlib import contextmanager
 import enum
 import math
 from os.path import abspath, dirname
 import sys
 
 import numpy as np
+from numba import carray, prange, types
+from numba.extending import intrinsic
 from scipy import stats
 
 if __name__ == '__main__' and __package__ is None:
     RETRO_DIR = dirname(dirname(dirname(abspath(__file__))))
     if RETRO_DIR not in sys.path:
         sys.path.append(RETRO_DIR)
-from retro import DFLT_NUMBA_JIT_KWARGS, numba_jit
+from retro import ACCUM_FTYPE, DFLT_NUMBA_JIT_KWARGS, numba_jit
 from retro.const import SPEED_OF_LIGHT_M_PER_NS, SRC_OMNI, SRC_CKV_BETA1
+from retro.retro_types import DOM_GRID_T, EVT_DOM_INFO_T, EVT_HIT_INFO_T
 from retro.utils.geom import generate_digitizer
 from retro.hypo.discrete_cascade_kernels import SCALING_CASCADE_ENERGY
+from retro.hypo.discrete_hypo import sources_to_soa
 
 
 class Minimizer(enum.IntEnum):
@@ -61,12 +83,14 @@ class Minimizer(enum.IntEnum):
     GRADIENT_DESCENT = 0
     NEWTON = 1
     BINARY_SEARCH = 2
+    SAFEGUARDED_NEWTON = 3
 
 
 class StepSpacing(enum.IntEnum):
     """Pegleg step spacing"""
     LINEAR = 0
     LOG = 1
+    COARSE_TO_FINE = 2
 
 
 class LLHChoice(enum.IntEnum):
@@ -76,25 +100,63 @@ class LLHChoice(enum.IntEnum):
     MEDIAN = 2
 
 
+class EarlyStop(enum.IntEnum):
+    """Rule for terminating the Pegleg loop before all sources are added"""
+    NEVER = 0
+    GETTING_WORSE_COUNTER = 1
+    DELTA_LLH = 2
+
+
 MACHINE_EPS = 1e-10
 
 MAX_RAD_SQ = 500**2
 """Maximum radius to consider, squared (units of m^2)"""
 
-SCALE_FACTOR_MINIMIZER = Minimizer.BINARY_SEARCH
+SCALE_FACTOR_MINIMIZER = Minimizer.SAFEGUARDED_NEWTON
 """Choice of which minimizer to use for computing scaling factor for scaling sources"""
 
+SCALE_FACTOR_MAX = 1000. / SCALING_CASCADE_ENERGY
+"""Upper limit on the scaling factor for scaling sources"""
+
 PEGLEG_SPACING = StepSpacing.LINEAR
 """Pegleg adds segments either linearly (same number of segments independent of energy)
 or logarithmically (more segments are added the longer the track"""
 
 PEGLEG_LLH_CHOICE = LLHChoice.MEAN
-"""How to choose best LLH from all Pegleg steps"""
+"""How to choose best LLH from all Pegleg steps; must be `LLHChoice.MAX` for
+`StepSpacing.LOG` and `StepSpacing.COARSE_TO_FINE` spacing"""
 
 PEGLEG_BEST_DELTA_LLH_THRESHOLD = 0.1
 """For Pegleg `LLHChoice` that require a range of LLH and average (mean, median, etc.),
 take all LLH that are within this threshold of the maximum LLH"""
 
+PEGLEG_EARLY_STOP = EarlyStop.GETTING_WORSE_COUNTER
+"""Rule for stopping the Pegleg loop early"""
+
+PEGLEG_MAX_GETTING_WORSE_STEPS = 100
+"""For `EarlyStop.GETTING_WORSE_COUNTER`, stop once the LLH has decreased this many
+more times than it has increased since the best LLH was found"""
+
+PEGLEG_STOP_DELTA_LLH = 10.
+"""For `EarlyStop.DELTA_LLH`, stop once the LLH drops this far below the best LLH found
+so far"""
+
+PEGLEG_COARSE_STEPSIZE = 64
+"""For `StepSpacing.COARSE_TO_FINE`, largest step (in units of `pegleg_stepsize`) taken
+while scanning the full track length; the step actually taken is the largest power of
+`PEGLEG_REFINE_FACTOR` not exceeding this (nor the number of pegleg steps). Larger
+values mean fewer LLH evaluations but a greater chance of stepping over a narrow LLH
+maximum."""
+
+PEGLEG_REFINE_FACTOR = 4
+"""For `StepSpacing.COARSE_TO_FINE`, ratio of step sizes between successive levels of
+refinement, until steps of `pegleg_stepsize` are reached"""
+
+PEGLEG_REFINE_DELTA_LLH = 1.
+"""For `StepSpacing.COARSE_TO_FINE`, each level of refinement scans (with finer steps)
+the range spanned by the steps of the previous level whose LLH is within this of the
+best LLH found there, plus one step of the previous level on either side"""
+
 # TODO: a "proper" jitter (and transit time spread) implementation should treat each DOM
 # independently and pick the time offset for each DOM that maximizes LLH (_not_ expected
 # photon detections)
@@ -102,10 +164,304 @@ take all LLH that are within this threshold of the maximum LLH"""
 USE_JITTER = True
 """Whether to use a crude jitter implementation"""
 
+JITTER_DT = np.arange(-10, 11, 2)
+"""Time offsets to sample for DOM jitter (units of ns)"""
+
+JITTER_SIGMA = 5.
+"""Width of the Gaussian used to weight the `JITTER_DT` samples (units of ns)"""
+
+DOM_GRID_CELL_SIZE = 50.
+"""Edge length of the (square) xy-cells used to spatially index operational DOMs (units
+of m); should be small compared to the tables' maximum radius but not much smaller than
+the string spacing"""
+
 
 # Validation that module-level constants are consistent
 if PEGLEG_SPACING is StepSpacing.LOG:
     assert PEGLEG_LLH_CHOICE is LLHChoice.MAX
+if PEGLEG_EARLY_STOP is EarlyStop.DELTA_LLH:
+    assert PEGLEG_STOP_DELTA_LLH > PEGLEG_BEST_DELTA_LLH_THRESHOLD
+if PEGLEG_SPACING is StepSpacing.COARSE_TO_FINE:
+    # Steps of all levels of refinement are recorded, so averaging would mix in the
+    # (unevenly spaced) coarse steps
+    assert PEGLEG_LLH_CHOICE is LLHChoice.MAX
+    assert PEGLEG_COARSE_STEPSIZE >= 1 and PEGLEG_REFINE_FACTOR >= 2
+    assert PEGLEG_REFINE_DELTA_LLH >= 0
+
+
+def get_jitter_kernel():
+    """Get the time offsets and corresponding weights used to (crudely) model
+    DOM jitter.
+
+    Returns
+    -------
+    jitter_dt : shape (n_offsets,) array
+        Time offsets, in ns
+    jitter_weights : shape (n_offsets,) array
+        Weight at each time offset; weights sum to 1
+
+    """
+    jitter_weights = stats.norm.pdf(JITTER_DT, 0, JITTER_SIGMA)
+    jitter_weights /= np.sum(jitter_weights)
+    return JITTER_DT, jitter_weights
+
+
+@intrinsic
+def address_as_void_pointer(typingctx, src): # pylint: disable=unused-argument
+    """Convert an integer memory address into a void pointer within numba-compiled
+    code, e.g. for use with `numba.carray` to view an existing array's memory.
+    """
+    sig = types.voidptr(src)
+
+    def codegen(cgctx, builder, sig, args): # pylint: disable=unused-argument, missing-docstring
+        return builder.inttoptr(args[0], cgctx.get_value_type(types.voidptr))
+
+    return sig, codegen
+
+
+def get_array_address(array):
+    """Get the info needed to (re-)create a view of `array` within numba-compiled
+    code via .. ::
+
+        numba.carray(address_as_void_pointer(address), shape, dtype)
+
+    Numba freezes (copies) arrays referenced as global or closure variables into
+    compiled code, which is prohibitive for large tables; referencing them by
+    address avoids this. Note that the caller is responsible for keeping `array`
+    alive for as long as the compiled code referencing it is in use.
+
+    Parameters
+    ----------
+    array : C-contiguous numpy.ndarray
+
+    Returns
+    -------
+    address : int
+    shape : tuple of ints
+    dtype : numpy.dtype
+
+    """
+    if not array.flags.c_contiguous:
+        raise ValueError('`array` must be C-contiguous')
+    return array.ctypes.data, array.shape, array.dtype
+
+
+def generate_event_dom_hit_info(dom_info, sd_idx_table_indexer, hits, hits_indexer):
+    """Build the per-event DOM and hit info arrays consumed by the LLH
+    functions.
+
+    Parameters
+    ----------
+    dom_info : shape (n_doms,) array of dtype DOM_INFO_T
+        E.g. `Retro5DTables.dom_info`
+    sd_idx_table_indexer : array of ints
+        Table index for each string-dom index (`sd_idx`), e.g.
+        `Retro5DTables.sd_idx_table_indexer`
+    hits : shape (n_hits,) array of dtype HIT_T
+    hits_indexer : shape (n_hit_doms,) array of dtype SD_INDEXER_T
+
+    Returns
+    -------
+    event_dom_info : shape (n_operational_doms,) array of dtype EVT_DOM_INFO_T
+        Only DOMs operational during the event & info relevant to the hits
+        these DOMs got (if any)
+    event_hit_info : shape (n_hits,) array of dtype EVT_HIT_INFO_T
+        All relevant hit info for the event, including a pointer back to the
+        index of the DOM in the `event_dom_info` array (left at 0 for hits on
+        non-operational DOMs)
+
+    """
+    operational_dom_info = dom_info[dom_info['operational']]
+    num_operational_doms = len(operational_dom_info)
+
+    event_dom_info = np.zeros(shape=num_operational_doms, dtype=EVT_DOM_INFO_T)
+    for field in ['sd_idx', 'x', 'y', 'z', 'quantum_efficiency', 'noise_rate_per_ns']:
+        event_dom_info[field] = operational_dom_info[field]
+    event_dom_info['table_idx'] = sd_idx_table_indexer[operational_dom_info['sd_idx']]
+
+    event_hit_info = np.zeros(shape=hits.size, dtype=EVT_HIT_INFO_T)
+    event_hit_info['time'] = hits['time']
+    event_hit_info['charge'] = hits['charge']
+
+    if len(hits_indexer) == 0 or num_operational_doms == 0:
+        return event_dom_info, event_hit_info
+
+    # Map each sd_idx to the index of its DOM in `event_dom_info` (-1 if not
+    # operational), and each entry in `hits_indexer` via its sd_idx to a DOM;
+    # only the first entry is used for an sd_idx appearing more than once
+    max_sd_idx = max(np.max(operational_dom_info['sd_idx']), np.max(hits_indexer['sd_idx']))
+    event_dom_idx_of_sd_idx = np.full(shape=max_sd_idx + 1, fill_value=-1, dtype=np.int64)
+    event_dom_idx_of_sd_idx[operational_dom_info['sd_idx']] = np.arange(num_operational_doms)
+
+    _, first_entry_idx = np.unique(hits_indexer['sd_idx'], return_index=True)
+    indexer = hits_indexer[np.sort(first_entry_idx)]
+    event_dom_indices = event_dom_idx_of_sd_idx[indexer['sd_idx']]
+    indexer = indexer[event_dom_indices >= 0]
+    event_dom_indices = event_dom_indices[event_dom_indices >= 0]
+
+    starts = indexer['offset'].astype(np.int64)
+    nums = indexer['num'].astype(np.int64)
+    stops = starts + nums
+
+    event_dom_info['hits_start_idx'][event_dom_indices] = starts
+    event_dom_info['hits_stop_idx'][event_dom_indices] = stops
+
+    # Hit indices (and their DOMs) of all hits belonging to operational DOMs
+    hit_indices = (
+        np.arange(np.sum(nums))
+        + np.repeat(starts - (np.cumsum(nums) - nums), nums)
+    )
+    event_hit_info['event_dom_idx'][hit_indices] = np.repeat(event_dom_indices, nums)
+
+    # Sum charge per DOM as the difference of the cumulative sum of all
+    # charges at each DOM's start and stop index
+    cum_charge = np.zeros(shape=hits.size + 1, dtype=np.float64)
+    cum_charge[1:] = np.cumsum(hits['charge'], dtype=np.float64)
+    event_dom_info['total_observed_charge'][event_dom_indices] = (
+        cum_charge[stops] - cum_charge[starts]
+    )
+
+    return event_dom_info, event_hit_info
+
+
+def generate_dom_grid(event_dom_info, cell_size=DOM_GRID_CELL_SIZE):
+    """Build a spatial index of the operational DOMs in an event.
+
+    DOMs are binned on a uniform grid in the xy-plane (strings are vertical,
+    so each cell holds a few strings' worth of DOMs) and, within each cell,
+    sorted by z. This allows finding all DOMs within a radius of a point by
+    visiting only the cells that intersect the sphere and then a contiguous
+    z-range within each cell.
+
+    Parameters
+    ----------
+    event_dom_info : shape (n_operational_doms,) array of dtype EVT_DOM_INFO_T
+    cell_size : float > 0, optional
+
+    Returns
+    -------
+    dom_grid : tuple of three arrays
+        `grid_info` : shape (1,) array of dtype DOM_GRID_T
+        `cell_offsets` : shape (num_x_cells*num_y_cells + 1,) array of uint32
+            DOMs in cell `cell_idx = x_cell_idx*num_y_cells + y_cell_idx` are
+            found at ``cell_dom_indices[cell_offsets[cell_idx]:cell_offsets[cell_idx+1]]``
+        `cell_dom_indices` : shape (n_operational_doms,) array of uint32
+            Indices into `event_dom_info`, grouped by cell and sorted by z
+            within each cell
+
+    """
+    assert cell_size > 0
+
+    x = event_dom_info['x'].astype(np.float64)
+    y = event_dom_info['y'].astype(np.float64)
+    z = event_dom_info['z'].astype(np.float64)
+
+    if len(event_dom_info) == 0:
+        x_min, y_min, num_x_cells, num_y_cells = 0., 0., 1, 1
+    else:
+        x_min, y_min = np.min(x), np.min(y)
+        num_x_cells = int((np.max(x) - x_min) // cell_size) + 1
+        num_y_cells = int((np.max(y) - y_min) // cell_size) + 1
+
+    grid_info = np.empty(shape=1, dtype=DOM_GRID_T)
+    grid_info['x_min'] = x_min
+    grid_info['y_min'] = y_min
+    grid_info['cell_size'] = cell_size
+    grid_info['num_x_cells'] = num_x_cells
+    grid_info['num_y_cells'] = num_y_cells
+
+    x_cell_idx = np.clip(((x - x_min) // cell_size).astype(np.int64), 0, num_x_cells - 1)
+    y_cell_idx = np.clip(((y - y_min) // cell_size).astype(np.int64), 0, num_y_cells - 1)
+    cell_idx = x_cell_idx * num_y_cells + y_cell_idx
+
+    cell_dom_indices = np.lexsort((z, cell_idx)).astype(np.uint32)
+
+    cell_offsets = np.zeros(shape=num_x_cells*num_y_cells + 1, dtype=np.uint32)
+    cell_offsets[1:] = np.cumsum(
+        np.bincount(cell_idx, minlength=num_x_cells*num_y_cells)
+    )
+
+    return grid_info, cell_offsets, cell_dom_indices
+
+
+@numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+def find_nearby_doms(x, y, z, rsquared_max, event_dom_info, dom_grid, out):
+    """Find operational DOMs that might lie within a sphere about a point.
+
+    All DOMs within the sphere are returned, but some DOMs slightly outside
+    of it may be returned as well; callers must still apply a radius cut.
+
+    Parameters
+    ----------
+    x, y, z : float
+        Center of the sphere
+    rsquared_max : float
+        Radius of the sphere, squared
+    event_dom_info : shape (n_operational_doms,) array of dtype EVT_DOM_INFO_T
+    dom_grid : tuple
+        As returned by :func:`generate_dom_grid` for `event_dom_info`
+    out : shape (n_operational_doms,) array of ints
+        Indices into `event_dom_info` of the DOMs found are written to
+        ``out[:num_found]``
+
+    Returns
+    -------
+    num_found : int
+
+    """
+    grid_info = dom_grid[0][0]
+    cell_offsets = dom_grid[1]
+    cell_dom_indices = dom_grid[2]
+
+    x_min = grid_info['x_min']
+    y_min = grid_info['y_min']
+    cell_size = grid_info['cell_size']
+    num_x_cells = np.int64(grid_info['num_x_cells'])
+    num_y_cells = np.int64(grid_info['num_y_cells'])
+
+    r_max = math.sqrt(rsquared_max)
+    x_cell_lo = max(0, np.int64(math.floor((x - r_max - x_min) / cell_size)))
+    x_cell_hi = min(num_x_cells - 1, np.int64(math.floor((x + r_max - x_min) / cell_size)))
+    y_cell_lo = max(0, np.int64(math.floor((y - r_max - y_min) / cell_size)))
+    y_cell_hi = min(num_y_cells - 1, np.int64(math.floor((y + r_max - y_min) / cell_size)))
+
+    num_found = 0
+    for x_cell_idx in range(x_cell_lo, x_cell_hi + 1):
+        cell_x_lo = x_min + x_cell_idx * cell_size
+        dx = max(0., cell_x_lo - x, x - (cell_x_lo + cell_size))
+        for y_cell_idx in range(y_cell_lo, y_cell_hi + 1):
+            cell_y_lo = y_min + y_cell_idx * cell_size
+            dy = max(0., cell_y_lo - y, y - (cell_y_lo + cell_size))
+
+            # Closest approach of the cell to the point in the xy-plane
+            rhosquared_min = dx**2 + dy**2
+            if rhosquared_min > rsquared_max:
+                continue
+            dz_max = math.sqrt(rsquared_max - rhosquared_min)
+            z_lo = z - dz_max
+            z_hi = z + dz_max
+
+            cell_idx = x_cell_idx * num_y_cells + y_cell_idx
+            lo = np.int64(cell_offsets[cell_idx])
+            stop = np.int64(cell_offsets[cell_idx + 1])
+
+            # Binary search for first DOM in cell with z >= z_lo
+            hi = stop
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if event_dom_info[cell_dom_indices[mid]]['z'] < z_lo:
+                    lo = mid + 1
+                else:
+                    hi = mid
+
+            for idx in range(lo, stop):
+                op_dom_idx = cell_dom_indices[idx]
+                if event_dom_info[op_dom_idx]['z'] > z_hi:
+                    break
+                out[num_found] = op_dom_idx
+                num_found += 1
+
+    return num_found
 
 
 def generate_pexp_and_llh_functions(
@@ -139,10 +495,17 @@ def generate_pexp_and_llh_functions(
 
     Returns
     -------
-    pexp : callable
+    pexp : numba-compiled callable
         Function to find detected-photon expectations given a hypothesis
 
-    get_llh : callable
+    get_llh : numba-compiled callable
+
+    get_llh_batch : numba-compiled callable
+        Like `get_llh` but evaluates many hypotheses at once (in parallel)
+
+    The tables are baked into `pexp`, `get_llh`, and `get_llh_batch`, so these
+    can be called from other numba-compiled code. References to the arrays
+    backing the tables are kept in their `tables` attribute.
 
     meta : OrderedDict
         Parameters, including the binning, that uniquely identify what the
@@ -175,6 +538,9 @@ def generate_pexp_and_llh_functions(
         meta['table_binning'][key] = dom_tables.table_meta[key]
 
     meta['tdi'] = tdi_metas
+
+    time_jitter = dom_tables.time_jitter
+    meta['time_jitter'] = None if time_jitter is None else time_jitter['key']
     if len(tdi_tables) == 1:
         tdi_tables = (tdi_tables[0], tdi_tables[0])
 
@@ -190,7 +556,13 @@ def generate_pexp_and_llh_functions(
 
     # Constants
     rsquared_max = np.max(dom_tables.table_meta['r_bin_edges'])**2
-    t_max = np.max(dom_tables.table_meta['t_bin_edges'])
+    if time_jitter is None:
+        t_min = 0.
+        t_max = np.max(dom_tables.table_meta['t_bin_edges'])
+    else:
+        # Time axis of jitter-convolved tables extends beyond the original
+        # binning, covering hits that only jittered lookups can reach
+        t_min, t_max = time_jitter['dt_range']
     recip_max_group_vel = dom_tables.table_meta['group_refractive_index'] / SPEED_OF_LIGHT_M_PER_NS
 
     # Digitization functions for each binning dimension
@@ -217,8 +589,12 @@ def generate_pexp_and_llh_functions(
 
     num_tdi_tables = len(tdi_metas)
     if num_tdi_tables == 0:
-        # Numba needs an object that it can determine type of
-        tdi_tables = 0
+        # Numba needs an object that it can determine type of; use the same
+        # structure as real TDI tables (a pair of 5D arrays) so that the
+        # tables can be unpacked uniformly (e.g. in `get_llh_batch_`)
+        dummy_tdi_table = np.zeros(shape=(1, 1, 1, 1, 1), dtype=np.float32)
+        dummy_tdi_table.flags.writeable = False
+        tdi_tables = (dummy_tdi_table, dummy_tdi_table)
     else:
         x_edges = tdi_metas[0]['bin_edges']['x']
         y_edges = tdi_metas[0]['bin_edges']['y']
@@ -267,6 +643,10 @@ def generate_pexp_and_llh_functions(
     dom_tables = dom_tables_.tables
     dom_table_norms = dom_tables_.table_norms
     dom_tables_template_library = dom_tables_.template_library
+    if dom_tables_template_library is None:
+        # Uncompressed tables have no template library, but numba needs an array
+        # whose type it can determine
+        dom_tables_template_library = np.zeros(shape=(1, 1, 1), dtype=np.float32)
     t_indep_dom_tables = dom_tables_.t_indep_tables
     t_indep_dom_table_norms = dom_tables_.t_indep_table_norms
     t_is_residual_time = dom_tables_.t_is_residual_time
@@ -290,13 +670,13 @@ def generate_pexp_and_llh_functions(
     t_indep_dom_tables.flags.writeable = False
     t_indep_dom_table_norms.flags.writeable = False
 
-    if USE_JITTER:
-        # Time offsets to sample for DOM jitter
-        jitter_dt = np.arange(-10, 11, 2)
-
-        # Weight at each time offset
-        jitter_weights = stats.norm.pdf(jitter_dt, 0, 5)
-        jitter_weights /= np.sum(jitter_weights)
+    if time_jitter is not None:
+        # Jitter was already convolved into the tables at load time, so a single
+        # lookup at the nominal time suffices
+        jitter_dt = np.array([0.])
+        jitter_weights = np.array([1.])
+    elif USE_JITTER:
+        jitter_dt, jitter_weights = get_jitter_kernel()
     else:
         jitter_dt = np.array([0.])
         jitter_weights = np.array([1.])
@@ -306,19 +686,19 @@ def generate_pexp_and_llh_functions(
     if tbl_is_templ_compr:
         @numba_jit(**DFLT_NUMBA_JIT_KWARGS)
         def table_lookup_mean(
-            tables, table_idx, r_bin_idx, costheta_bin_idx, t_bin_idx
+            tables, template_library, table_idx, r_bin_idx, costheta_bin_idx, t_bin_idx
         ): # pylint: disable=missing-docstring
             templ = tables[table_idx][r_bin_idx, costheta_bin_idx, t_bin_idx]
-            return templ['weight'] / dom_tables_template_library[templ['index']].size
+            return templ['weight'] / template_library[templ['index']].size
 
         @numba_jit(**DFLT_NUMBA_JIT_KWARGS)
         def table_lookup(
-            tables, table_idx, r_bin_idx, costheta_bin_idx, t_bin_idx,
+            tables, template_library, table_idx, r_bin_idx, costheta_bin_idx, t_bin_idx,
             costhetadir_bin_idx, deltaphidir_bin_idx
         ): # pylint: disable=missing-docstring
             templ = tables[table_idx][r_bin_idx, costheta_bin_idx, t_bin_idx]
             return (
-                templ['weight'] * dom_tables_template_library[
+                templ['weight'] * template_library[
                     templ['index'],
                     costhetadir_bin_idx,
                     deltaphidir_bin_idx,
@@ -328,17 +708,17 @@ def generate_pexp_and_llh_functions(
     else: # table is not template-compressed
         @numba_jit(**DFLT_NUMBA_JIT_KWARGS)
         def table_lookup_mean(
-            tables, table_idx, r_bin_idx, costheta_bin_idx, t_bin_idx
-        ): # pylint: disable=missing-docstring
+            tables, template_library, table_idx, r_bin_idx, costheta_bin_idx, t_bin_idx
+        ): # pylint: disable=missing-docstring, unused-argument
             return np.mean(
                 tables[table_idx][r_bin_idx, costheta_bin_idx, t_bin_idx]
             )
 
         @numba_jit(**DFLT_NUMBA_JIT_KWARGS)
         def table_lookup(
-            tables, table_idx, r_bin_idx, costheta_bin_idx, t_bin_idx,
+            tables, template_library, table_idx, r_bin_idx, costheta_bin_idx, t_bin_idx,
             costhetadir_bin_idx, deltaphidir_bin_idx
-        ): # pylint: disable=missing-docstring
+        ): # pylint: disable=missing-docstring, unused-argument
             return tables[table_idx][
                 r_bin_idx,
                 costheta_bin_idx,
@@ -422,9 +802,10 @@ def generate_pexp_and_llh_functions(
 
         Parameters
         ----------
-        sources : shape (num_sources,) array of dtype SRC_T
+        sources : SourcesSoA
             A discrete sequence of points describing expected sources of
-            photons that result from a hypothesized event.
+            photons that result from a hypothesized event, in struct-of-arrays
+            layout (see :func:`retro.hypo.discrete_hypo.sources_to_soa`).
 
         sources_start, sources_stop : int
             Starting and stopping indices for the part of the array on which to
@@ -451,6 +832,11 @@ def generate_pexp_and_llh_functions(
             while if you use a template-compressed table, this will have shape
                 (n_templates, n_costhetadir, n_deltaphidir)
 
+        dom_tables_template_library : array
+            Template library for template-compressed `dom_tables`, of shape
+            (n_templates, n_costhetadir, n_deltaphidir); a placeholder array
+            (unused) for uncompressed tables
+
         dom_table_norms : shape (n_tables, n_r, n_t) array
             Normalization to apply to `table`, which is assumed to depend on
             both r- and t-dimensions.
@@ -468,6 +854,10 @@ def generate_pexp_and_llh_functions(
         tdi_tables : {type}
             {text}
 
+        dom_grid : tuple
+            Spatial index of `event_dom_info` as returned by
+            :func:`generate_dom_grid`; {grid_text}
+
         Returns
         -------
         t_indep_exp : float
@@ -493,26 +883,51 @@ def generate_pexp_and_llh_functions(
             event_hit_info,
             hit_exp,
             dom_tables,
+            dom_tables_template_library,
             dom_table_norms,
             t_indep_dom_tables,
             t_indep_dom_table_norms,
             tdi_tables, # pylint: disable=unused-argument
+            dom_grid,
         ): # pylint: disable=missing-docstring, too-many-arguments
-            num_operational_doms = len(event_dom_info)
+            nearby_doms = np.empty(shape=len(event_dom_info), dtype=np.uint32)
             t_indep_exp = 0.
             for source_idx in range(sources_start, sources_stop):
-                src = sources[source_idx]
+                src_kind = sources.kind[source_idx]
+                src_time = sources.time[source_idx]
+                src_x = sources.x[source_idx]
+                src_y = sources.y[source_idx]
+                src_z = sources.z[source_idx]
+                src_photons = sources.photons[source_idx]
+                src_dir_costheta = sources.dir_costheta[source_idx]
+                src_dir_cosphi = sources.dir_cosphi[source_idx]
+                src_dir_sinphi = sources.dir_sinphi[source_idx]
+
+                # Source direction's bin does not depend on the DOM
+                costhetadir_bin_idx = digitize_costhetadir(src_dir_costheta)
+
+                # Only DOMs within the tables' radial extent can see the source
+                num_nearby_doms = find_nearby_doms(
+                    x=src_x,
+                    y=src_y,
+                    z=src_z,
+                    rsquared_max=rsquared_max,
+                    event_dom_info=event_dom_info,
+                    dom_grid=dom_grid,
+                    out=nearby_doms,
+                )
 
-                for op_dom_idx in range(num_operational_doms):
+                for nearby_idx in range(num_nearby_doms):
+                    op_dom_idx = nearby_doms[nearby_idx]
                     dom_info = event_dom_info[op_dom_idx]
                     dom_tbl_idx = dom_info['table_idx']
                     dom_qe = dom_info['quantum_efficiency']
                     dom_hits_start_idx = dom_info['hits_start_idx']
                     dom_hits_stop_idx = dom_info['hits_stop_idx']
 
-                    dx = src['x'] - dom_info['x']
-                    dy = src['y'] - dom_info['y']
-                    dz = src['z'] - dom_info['z']
+                    dx = src_x - dom_info['x']
+                    dy = src_y - dom_info['y']
+                    dz = src_z - dom_info['z']
 
                     rhosquared = max(MACHINE_EPS, dx**2 + dy**2)
                     rsquared = rhosquared + dz**2
@@ -525,7 +940,7 @@ def generate_pexp_and_llh_functions(
 
                     costheta_bin_idx = digitize_costheta(dz/r)
 
-                    if src['kind'] == SRC_OMNI:
+                    if src_kind == SRC_OMNI:
                         t_indep_surv_prob = np.mean(
                             t_indep_dom_tables[dom_tbl_idx][r_bin_idx, costheta_bin_idx, :, :]
                         )
@@ -537,10 +952,9 @@ def generate_pexp_and_llh_functions(
                             absdeltaphidir = 0.
                         else:
                             absdeltaphidir = abs(math.acos(
-                                max(-1., min(1., -(src['dir_cosphi']*dx + src['dir_sinphi']*dy) / rho))
+                                max(-1., min(1., -(src_dir_cosphi*dx + src_dir_sinphi*dy) / rho))
                             ))
 
-                        costhetadir_bin_idx = digitize_costhetadir(src['dir_costheta'])
                         deltaphidir_bin_idx = digitize_deltaphidir(absdeltaphidir)
 
                         t_indep_surv_prob = t_indep_dom_tables[dom_tbl_idx][
@@ -551,28 +965,29 @@ def generate_pexp_and_llh_functions(
                         ]
 
                     ti_norm = t_indep_dom_table_norms[dom_tbl_idx][r_bin_idx]
-                    t_indep_exp += src['photons'] * ti_norm * t_indep_surv_prob * dom_qe
+                    t_indep_exp += src_photons * ti_norm * t_indep_surv_prob * dom_qe
 
                     for hit_idx in range(dom_hits_start_idx, dom_hits_stop_idx):
                         hit_info = event_hit_info[hit_idx]
                         if t_is_residual_time:
-                            nominal_dt = hit_info['time'] - src['time'] - r * recip_max_group_vel
+                            nominal_dt = hit_info['time'] - src_time - r * recip_max_group_vel
                         else:
-                            nominal_dt = hit_info['time'] - src['time']
+                            nominal_dt = hit_info['time'] - src_time
 
                         for jitter_idx in range(num_jitter_time_offsets):
                             dt = nominal_dt + jitter_dt[jitter_idx]
 
                             # Note the comparison is written such that it will evaluate
-                            # to True if `dt` is NaN or less than zero.
-                            if (not dt >= 0) or dt > t_max:
+                            # to True if `dt` is NaN or less than `t_min`.
+                            if (not dt >= t_min) or dt > t_max:
                                 continue
 
                             t_bin_idx = digitize_t(dt)
 
-                            if src['kind'] == SRC_OMNI:
+                            if src_kind == SRC_OMNI:
                                 surv_prob_at_hit_t = table_lookup_mean(
                                     tables=dom_tables,
+                                    template_library=dom_tables_template_library,
                                     table_idx=dom_tbl_idx,
                                     r_bin_idx=r_bin_idx,
                                     costheta_bin_idx=costheta_bin_idx,
@@ -582,6 +997,7 @@ def generate_pexp_and_llh_functions(
                             else: # SRC_CKV_BETA1
                                 surv_prob_at_hit_t = table_lookup(
                                     tables=dom_tables,
+                                    template_library=dom_tables_template_library,
                                     table_idx=dom_tbl_idx,
                                     r_bin_idx=r_bin_idx,
                                     costheta_bin_idx=costheta_bin_idx,
@@ -592,16 +1008,18 @@ def generate_pexp_and_llh_functions(
 
                             r_t_bin_norm = dom_table_norms[dom_tbl_idx][r_bin_idx, t_bin_idx]
                             hit_exp[hit_idx] += jitter_weights[jitter_idx] * (
-                                src['photons'] * r_t_bin_norm * surv_prob_at_hit_t * dom_qe
+                                src_photons * r_t_bin_norm * surv_prob_at_hit_t * dom_qe
                             )
 
             return t_indep_exp
 
         pexp_.__doc__ = pexp_docstr.format(
-            type='int',
+            type='tuple of 2 arrays',
             text="""Dummy argument for this version of `pexp` since it doesn't use TDI
             tables (but this argument needs to be present to maintain same
-            interface)"""
+            interface)""",
+            grid_text="""used to visit only DOMs within the
+            tables' maximum radius of each source""",
         )
 
     else: # pexp function given we are using TDI tables
@@ -615,40 +1033,47 @@ def generate_pexp_and_llh_functions(
             event_hit_info,
             hit_exp,
             dom_tables,
+            dom_tables_template_library,
             dom_table_norms,
             t_indep_dom_tables, # pylint: disable=unused-argument
             t_indep_dom_table_norms, # pylint: disable=unused-argument
             tdi_tables,
+            dom_grid, # pylint: disable=unused-argument
         ): # pylint: disable=missing-docstring, too-many-arguments
             # -- Time- and DOM-independent photon-detection expectation -- #
 
             t_indep_exp = 0.
             for source_idx in range(sources_start, sources_stop):
-                src = sources[source_idx]
-                src_opposite_dir_costheta = -src['dir_costheta']
-                src_opposite_dir_phi = ((src['dir_phi'] + 2*np.pi) % (2*np.pi)) - np.pi
+                src_x = sources.x[source_idx]
+                src_y = sources.y[source_idx]
+                src_z = sources.z[source_idx]
+                src_photons = sources.photons[source_idx]
+                src_dir_costheta = sources.dir_costheta[source_idx]
+                src_dir_phi = sources.dir_phi[source_idx]
+                src_opposite_dir_costheta = -src_dir_costheta
+                src_opposite_dir_phi = ((src_dir_phi + 2*np.pi) % (2*np.pi)) - np.pi
 
                 if (
-                    tdi0_xmin <= src['x'] <= tdi0_xmax
-                    and tdi0_ymin <= src['y'] <= tdi0_ymax
-                    and tdi0_zmin <= src['z'] <= tdi0_zmax
+                    tdi0_xmin <= src_x <= tdi0_xmax
+                    and tdi0_ymin <= src_y <= tdi0_ymax
+                    and tdi0_zmin <= src_z <= tdi0_zmax
                 ):
-                    t_indep_exp += 0.45 * src['photons'] * tdi_tables[0][
-                        digitize_tdi0_x(src['x']),
-                        digitize_tdi0_y(src['y']),
-                        digitize_tdi0_z(src['z']),
+                    t_indep_exp += 0.45 * src_photons * tdi_tables[0][
+                        digitize_tdi0_x(src_x),
+                        digitize_tdi0_y(src_y),
+                        digitize_tdi0_z(src_z),
                         digitize_tdi0_costhetadir(src_opposite_dir_costheta),
                         digitize_tdi0_phidir(src_opposite_dir_phi),
                     ]
                 elif num_tdi_tables >= 2 and (
-                    tdi1_xmin <= src['x'] <= tdi1_xmax
-                    and tdi1_ymin <= src['y'] <= tdi1_ymax
-                    and tdi1_zmin <= src['z'] <= tdi1_zmax
+                    tdi1_xmin <= src_x <= tdi1_xmax
+                    and tdi1_ymin <= src_y <= tdi1_ymax
+                    and tdi1_zmin <= src_z <= tdi1_zmax
                 ):
-                    t_indep_exp += 0.45 * src['photons'] * tdi_tables[1][
-                        digitize_tdi1_x(src['x']),
-                        digitize_tdi1_y(src['y']),
-                        digitize_tdi1_z(src['z']),
+                    t_indep_exp += 0.45 * src_photons * tdi_tables[1][
+                        digitize_tdi1_x(src_x),
+                        digitize_tdi1_y(src_y),
+                        digitize_tdi1_z(src_z),
                         digitize_tdi1_costhetadir(src_opposite_dir_costheta),
                         digitize_tdi1_phidir(src_opposite_dir_phi),
                     ]
@@ -657,17 +1082,29 @@ def generate_pexp_and_llh_functions(
 
             # -- Time-dependent photon-det expectation for each hit DOM -- #
 
-            for hit_idx, hit_info in enumerate(event_hit_info):
-                dom_info = event_dom_info[hit_info['event_dom_idx']]
+            # Source directions' bins do not depend on the DOM, so find these once
+            num_sources = sources_stop - sources_start
+            costhetadir_bin_idxs = np.empty(shape=num_sources, dtype=np.int64)
+            for source_idx in range(sources_start, sources_stop):
+                costhetadir_bin_idxs[source_idx - sources_start] = digitize_costhetadir(
+                    sources.dir_costheta[source_idx]
+                )
+
+            # Loop over DOMs (rather than hits) such that source-DOM geometry is
+            # computed once and reused for all of a DOM's hits
+            for dom_info in event_dom_info:
+                dom_hits_start_idx = dom_info['hits_start_idx']
+                dom_hits_stop_idx = dom_info['hits_stop_idx']
+                if dom_hits_stop_idx <= dom_hits_start_idx:
+                    continue
+
                 dom_tbl_idx = dom_info['table_idx']
                 dom_qe = dom_info['quantum_efficiency']
 
                 for source_idx in range(sources_start, sources_stop):
-                    src = sources[source_idx]
-
-                    dx = src['x'] - dom_info['x']
-                    dy = src['y'] - dom_info['y']
-                    dz = src['z'] - dom_info['z']
+                    dx = sources.x[source_idx] - dom_info['x']
+                    dy = sources.y[source_idx] - dom_info['y']
+                    dz = sources.z[source_idx] - dom_info['z']
 
                     rhosquared = max(MACHINE_EPS, dx**2 + dy**2)
                     rsquared = rhosquared + dz**2
@@ -675,74 +1112,88 @@ def generate_pexp_and_llh_functions(
                     if rsquared > rsquared_max:
                         continue
 
+                    src_kind = sources.kind[source_idx]
+                    src_time = sources.time[source_idx]
+                    src_photons = sources.photons[source_idx]
+
                     r = max(MACHINE_EPS, math.sqrt(rsquared))
                     r_bin_idx = digitize_r(r)
 
                     costheta_bin_idx = digitize_costheta(dz/r)
 
-                    if src['kind'] == SRC_CKV_BETA1:
+                    if src_kind == SRC_CKV_BETA1:
                         rho = math.sqrt(rhosquared)
 
                         if rho <= MACHINE_EPS:
                             absdeltaphidir = 0.
                         else:
                             absdeltaphidir = abs(math.acos(
-                                max(-1., min(1., -(src['dir_cosphi']*dx + src['dir_sinphi']*dy) / rho))
+                                max(-1., min(1., -(
+                                    sources.dir_cosphi[source_idx]*dx
+                                    + sources.dir_sinphi[source_idx]*dy
+                                ) / rho))
                             ))
 
-                        costhetadir_bin_idx = digitize_costhetadir(src['dir_costheta'])
+                        costhetadir_bin_idx = costhetadir_bin_idxs[source_idx - sources_start]
                         deltaphidir_bin_idx = digitize_deltaphidir(absdeltaphidir)
 
                     if t_is_residual_time:
-                        nominal_dt = hit_info['time'] - src['time'] - r * recip_max_group_vel
+                        src_t = src_time + r * recip_max_group_vel
                     else:
-                        nominal_dt = hit_info['time'] - src['time']
-
-                    # Note: caching last `t_bin_idx`, `r_t_bin_norm`, and
-                    # `surv_prob_at_hit_t` and checking for identical `t_bin_idx` seems
-                    # to take about the same time as not caching these values, so
-                    # choosing the simpler way
-
-                    for jitter_idx in range(num_jitter_time_offsets):
-                        dt = nominal_dt + jitter_dt[jitter_idx]
-
-                        # Note the comparison is written such that it will evaluate to
-                        # True if `dt` is NaN or less than zero.
-                        if (not dt >= 0) or dt > t_max:
-                            continue
-
-                        t_bin_idx = digitize_t(dt)
-
-                        if src['kind'] == SRC_OMNI:
-                            surv_prob_at_hit_t = table_lookup_mean(
-                                tables=dom_tables,
-                                table_idx=dom_tbl_idx,
-                                r_bin_idx=r_bin_idx,
-                                costheta_bin_idx=costheta_bin_idx,
-                                t_bin_idx=t_bin_idx,
-                            )
+                        src_t = src_time
 
-                        else: # SRC_CKV_BETA1
-                            surv_prob_at_hit_t = table_lookup(
-                                tables=dom_tables,
-                                table_idx=dom_tbl_idx,
-                                r_bin_idx=r_bin_idx,
-                                costheta_bin_idx=costheta_bin_idx,
-                                t_bin_idx=t_bin_idx,
-                                costhetadir_bin_idx=costhetadir_bin_idx,
-                                deltaphidir_bin_idx=deltaphidir_bin_idx,
-                            )
+                    for hit_idx in range(dom_hits_start_idx, dom_hits_stop_idx):
+                        nominal_dt = event_hit_info[hit_idx]['time'] - src_t
 
-                        r_t_bin_norm = dom_table_norms[dom_tbl_idx][r_bin_idx, t_bin_idx]
-                        hit_exp[hit_idx] += jitter_weights[jitter_idx] * (
-                            src['photons'] * r_t_bin_norm * surv_prob_at_hit_t * dom_qe
-                        )
+                        # Note: caching last `t_bin_idx`, `r_t_bin_norm`, and
+                        # `surv_prob_at_hit_t` and checking for identical `t_bin_idx`
+                        # seems to take about the same time as not caching these
+                        # values, so choosing the simpler way
+
+                        for jitter_idx in range(num_jitter_time_offsets):
+                            dt = nominal_dt + jitter_dt[jitter_idx]
+
+                            # Note the comparison is written such that it will evaluate
+                            # to True if `dt` is NaN or less than `t_min`.
+                            if (not dt >= t_min) or dt > t_max:
+                                continue
+
+                            t_bin_idx = digitize_t(dt)
+
+                            if src_kind == SRC_OMNI:
+                                surv_prob_at_hit_t = table_lookup_mean(
+                                    tables=dom_tables,
+                                    template_library=dom_tables_template_library,
+                                    table_idx=dom_tbl_idx,
+                                    r_bin_idx=r_bin_idx,
+                                    costheta_bin_idx=costheta_bin_idx,
+                                    t_bin_idx=t_bin_idx,
+                                )
+
+                            else: # SRC_CKV_BETA1
+                                surv_prob_at_hit_t = table_lookup(
+                                    tables=dom_tables,
+                                    template_library=dom_tables_template_library,
+                                    table_idx=dom_tbl_idx,
+                                    r_bin_idx=r_bin_idx,
+                                    costheta_bin_idx=costheta_bin_idx,
+                                    t_bin_idx=t_bin_idx,
+                                    costhetadir_bin_idx=costhetadir_bin_idx,
+                                    deltaphidir_bin_idx=deltaphidir_bin_idx,
+                                )
+
+                            r_t_bin_norm = dom_table_norms[dom_tbl_idx][r_bin_idx, t_bin_idx]
+                            hit_exp[hit_idx] += jitter_weights[jitter_idx] * (
+                                src_photons * r_t_bin_norm * surv_prob_at_hit_t * dom_qe
+                            )
 
             return t_indep_exp
 
         pexp_.__doc__ = pexp_docstr.format(
             type='tuple of 1 or 2 arrays',
-            text="""TDI tables"""
+            text="""TDI tables""",
+            grid_text="""unused by this version of `pexp`
+            since time-independent expectations come from the TDI tables""",
         )
 
     @numba_jit(**DFLT_NUMBA_JIT_KWARGS)
@@ -777,6 +1228,48 @@ def generate_pexp_and_llh_functions(
 
         return llh
 
+    @numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+    def update_hits_llh(
+        event_dom_info,
+        event_hit_info,
+        hit_exp,
+        last_hit_exp,
+        hit_llh_terms,
+    ):
+        """Update the per-hit terms of the time-dependent part of the LLH for
+        those hits whose expectation changed since the last update.
+
+        Parameters:
+        -----------
+        event_dom_info : array of dtype EVT_DOM_INFO_T
+        event_hit_info : array of dtype EVT_HIT_INFO_T
+        hit_exp : shape (n_hits,) array of dtype float
+            Current expectation at each hit time
+        last_hit_exp : shape (n_hits,) array of dtype float
+            Expectation at each hit time as of the last update; modified in place
+        hit_llh_terms : shape (n_hits,) array of dtype float
+            LLH term for each hit as of the last update; modified in place
+
+        Returns
+        -------
+        delta_llh : float
+            Change in the sum of `hit_llh_terms`
+
+        """
+        delta_llh = 0.
+        for hit_idx, hit_info in enumerate(event_hit_info):
+            this_hit_exp = hit_exp[hit_idx]
+            if this_hit_exp == last_hit_exp[hit_idx]:
+                continue
+            last_hit_exp[hit_idx] = this_hit_exp
+            hit_llh_term = hit_info['charge'] * math.log(
+                event_dom_info[hit_info['event_dom_idx']]['noise_rate_per_ns']
+                + this_hit_exp
+            )
+            delta_llh += hit_llh_term - hit_llh_terms[hit_idx]
+            hit_llh_terms[hit_idx] = hit_llh_term
+        return delta_llh
+
     @numba_jit(**DFLT_NUMBA_JIT_KWARGS)
     def get_optimal_scalefactor(
         event_dom_info,
@@ -786,6 +1279,9 @@ def generate_pexp_and_llh_functions(
         nominal_scaling_hit_exp,
         nominal_scaling_t_indep_exp,
         initial_scalefactor,
+        scaling_hit_idxs,
+        scaling_hit_charges,
+        scaling_hit_offsets,
     ):
         """Find optimal (highest-likelihood) `scalefactor` for scaling sources.
 
@@ -809,6 +1305,16 @@ def generate_pexp_and_llh_functions(
             (Lambda^s in `likelihood_function_derivation.ipynb`)
         initial_scalefactor : float > 0
             Starting point for minimizer
+        scaling_hit_idxs : shape (n_scaling_hits,) array of ints
+            Indices of the hits with nonzero `nominal_scaling_hit_exp` (only
+            these hits' LLH terms depend on `scalefactor`); used only by
+            `Minimizer.SAFEGUARDED_NEWTON`
+        scaling_hit_charges : shape (n_scaling_hits,) array of dtype float
+            Charge of each hit in `scaling_hit_idxs`; used only by
+            `Minimizer.SAFEGUARDED_NEWTON`
+        scaling_hit_offsets : shape (n_scaling_hits,) array of dtype float
+            Buffer (values are overwritten) used only by
+            `Minimizer.SAFEGUARDED_NEWTON`
 
         Returns
         -------
@@ -925,7 +1431,7 @@ def generate_pexp_and_llh_functions(
                 print('exceeded gradient descent iteration limit!')
                 print('arrived at ', scalefactor)
             #print('\n')
-            scalefactor = max(0., min(1000./SCALING_CASCADE_ENERGY, scalefactor))
+            scalefactor = max(0., min(SCALE_FACTOR_MAX, scalefactor))
 
         elif SCALE_FACTOR_MINIMIZER is Minimizer.NEWTON:
             scalefactor = initial_scalefactor
@@ -951,7 +1457,7 @@ def generate_pexp_and_llh_functions(
             #    print('exceeded gradient descent iteration limit!')
             #    print('arrived at ',scalefactor)
             #print('\n')
-            scalefactor = max(0., min(1000./SCALING_CASCADE_ENERGY, scalefactor))
+            scalefactor = max(0., min(SCALE_FACTOR_MAX, scalefactor))
 
         elif SCALE_FACTOR_MINIMIZER is Minimizer.BINARY_SEARCH:
             epsilon = 1e-2
@@ -963,7 +1469,7 @@ def generate_pexp_and_llh_functions(
                 done = True
                 #print('trivial 0')
             if not done:
-                last = 1000./SCALING_CASCADE_ENERGY
+                last = SCALE_FACTOR_MAX
                 last_grad = get_grad_neg_llh_wrt_scalefactor(last)
                 if last_grad < 0 or abs(last_grad) < epsilon:
                     scalefactor = last
@@ -987,6 +1493,65 @@ def generate_pexp_and_llh_functions(
             #print('found :',scalefactor)
             #print('\n')
 
+        elif SCALE_FACTOR_MINIMIZER is Minimizer.SAFEGUARDED_NEWTON:
+            # -LLH is convex in `scalefactor`. Writing the expectation at hit k
+            # as `scalefactor * a_k + b_k` (with b_k including noise), the
+            # derivatives of -LLH are
+            #   f'(s) = A - sum_k c_k a_k / (s a_k + b_k) = A - sum_k c_k / (s + u_k)
+            #   f''(s) = sum_k c_k / (s + u_k)^2
+            # with u_k = b_k / a_k, c_k the hit charges, and A the nominal
+            # time-independent expectation; hits with a_k = 0 don't contribute.
+            # Newton steps are kept within a bracket [lo, hi] on the root of f',
+            # falling back to bisection if a step would leave the bracket.
+            num_scaling_hits = len(scaling_hit_idxs)
+            for idx in range(num_scaling_hits):
+                hit_idx = scaling_hit_idxs[idx]
+                scaling_hit_offsets[idx] = (
+                    event_dom_info[event_hit_info[hit_idx]['event_dom_idx']]['noise_rate_per_ns']
+                    + nonscaling_hit_exp[hit_idx]
+                ) / nominal_scaling_hit_exp[hit_idx]
+
+            rel_tol = 1e-6
+            max_iter = 50
+
+            lo = 0.
+            hi = SCALE_FACTOR_MAX
+            grad = nominal_scaling_t_indep_exp
+            for idx in range(num_scaling_hits):
+                grad -= scaling_hit_charges[idx] / scaling_hit_offsets[idx]
+
+            if grad >= 0:
+                scalefactor = lo
+            else:
+                scalefactor = max(lo, min(hi, initial_scalefactor))
+                for _ in range(max_iter):
+                    grad = nominal_scaling_t_indep_exp
+                    hess = 0.
+                    for idx in range(num_scaling_hits):
+                        recip_denom = 1. / (scalefactor + scaling_hit_offsets[idx])
+                        term = scaling_hit_charges[idx] * recip_denom
+                        grad -= term
+                        hess += term * recip_denom
+
+                    if grad < 0:
+                        lo = scalefactor
+                    else:
+                        hi = scalefactor
+
+                    if hess > 0:
+                        new_scalefactor = scalefactor - grad / hess
+                    else:
+                        new_scalefactor = hi
+                    if not lo < new_scalefactor < hi:
+                        new_scalefactor = 0.5 * (lo + hi)
+
+                    converged = (
+                        abs(new_scalefactor - scalefactor) <= rel_tol * (1. + scalefactor)
+                    )
+                    scalefactor = new_scalefactor
+                    if converged:
+                        break
+
         # -- Calculate llh at the optimal `scalefactor` found -- #
 
         # Time- and DOM-independent part of LLH
@@ -1011,39 +1576,43 @@ def generate_pexp_and_llh_functions(
         event_dom_info,
         pegleg_stepsize,
         dom_tables,
+        dom_tables_template_library,
         dom_table_norms,
         t_indep_dom_tables,
         t_indep_dom_table_norms,
         tdi_tables,
+        dom_grid,
     ): # pylint: disable=too-many-arguments
         """Compute log likelihood for hypothesis sources given an event.
 
         Parameters
         ----------
-        generic_sources : shape (n_generic_sources,) array of dtype SRC_T
-            If NOT using the pegleg/scaling procedure, all light sources are placed in
-            this array; when using the pegleg/scaling procedure, `generic_sources` will
-            be empty (i.e., `n_generic_sources = 0`)
-        pegleg_sources : shape (n_pegleg_sources,) array of dtype SRC_T
+        generic_sources : SourcesSoA of n_generic_sources sources
+            If NOT using the pegleg/scaling procedure, all light sources are placed
+            here; when using the pegleg/scaling procedure, `generic_sources` will be
+            empty (i.e., `n_generic_sources = 0`)
+        pegleg_sources : SourcesSoA of n_pegleg_sources sources
             If using the pegleg/scaling procedure, the likelihood is maximized by
             including more and more of these sources (in the order given); if not using
-            the pegleg/scaling procedures, `pegleg_sources` will be an empty array
-            (i.e., `n_pegleg_sources = 0`)
-        scaling_sources : shape (n_scaling_sources,) array of dtype SRC_T
+            the pegleg/scaling procedures, `pegleg_sources` will be empty (i.e.,
+            `n_pegleg_sources = 0`)
+        scaling_sources : SourcesSoA of n_scaling_sources sources
             If using the pegleg/scaling procedure, the likelihood is maximized by
             scaling the luminosity of these sources; if not using the pegleg/scaling
-            procedure, `scaling_sources` will be an empty array (i.e.,
-            `n_scaling_sources = 0`)
+            procedure, `scaling_sources` will be empty (i.e., `n_scaling_sources = 0`)
         event_hit_info : shape (n_hits,) array of dtype EVT_HIT_INFO_T
         event_dom_info : shape (n_operational_doms,) array of dtype EVT_DOM_INFO_T
         pegleg_stepsize : int > 0
             Number of pegleg sources to add each time around the pegleg loop; ignored if
             pegleg procedure is not performed (i.e., if there are no `pegleg_sources`)
         dom_tables
+        dom_tables_template_library
         dom_table_norms
         t_indep_dom_tables
         t_indep_dom_table_norms
         tdi_tables
+        dom_grid : tuple
+            Spatial index of `event_dom_info`; see :func:`generate_dom_grid`
 
         Returns
         -------
@@ -1059,15 +1628,16 @@ def generate_pexp_and_llh_functions(
             Best scale factor for `scaling_sources` at best pegleg hypo
 
         """
-        num_pegleg_sources = len(pegleg_sources)
+        num_generic_sources = len(generic_sources.time)
+        num_pegleg_sources = len(pegleg_sources.time)
         num_pegleg_steps = 1 + int(num_pegleg_sources / pegleg_stepsize)
-        num_scaling_sources = len(scaling_sources)
+        num_scaling_sources = len(scaling_sources.time)
         num_hits = len(event_hit_info)
 
         if num_scaling_sources > 0:
             # -- Storage for exp due to nominal (`scalefactor = 1`) scaling sources -- #
             nominal_scaling_t_indep_exp = 0.
-            nominal_scaling_hit_exp = np.zeros(shape=num_hits, dtype=np.float64)
+            nominal_scaling_hit_exp = np.zeros(shape=num_hits, dtype=ACCUM_FTYPE)
 
             nominal_scaling_t_indep_exp += pexp_(
                 sources=scaling_sources,
@@ -1077,31 +1647,51 @@ def generate_pexp_and_llh_functions(
                 event_hit_info=event_hit_info,
                 hit_exp=nominal_scaling_hit_exp,
                 dom_tables=dom_tables,
+                dom_tables_template_library=dom_tables_template_library,
                 dom_table_norms=dom_table_norms,
                 t_indep_dom_tables=t_indep_dom_tables,
                 t_indep_dom_table_norms=t_indep_dom_table_norms,
                 tdi_tables=tdi_tables,
+                dom_grid=dom_grid,
             )
 
+            # Buffers reused by `get_optimal_scalefactor` for every pegleg step;
+            # only hits that see light from scaling sources are relevant
+            num_scaling_hits = 0
+            for hit_idx in range(num_hits):
+                if nominal_scaling_hit_exp[hit_idx] > 0:
+                    num_scaling_hits += 1
+            scaling_hit_idxs = np.empty(shape=num_scaling_hits, dtype=np.int64)
+            scaling_hit_charges = np.empty(shape=num_scaling_hits, dtype=ACCUM_FTYPE)
+            scaling_hit_offsets = np.empty(shape=num_scaling_hits, dtype=ACCUM_FTYPE)
+            idx = 0
+            for hit_idx in range(num_hits):
+                if nominal_scaling_hit_exp[hit_idx] > 0:
+                    scaling_hit_idxs[idx] = hit_idx
+                    scaling_hit_charges[idx] = event_hit_info[hit_idx]['charge']
+                    idx += 1
+
         # -- Storage for exp due to generic + pegleg (non-scaling) sources -- #
 
         nonscaling_t_indep_exp = 0.
-        nonscaling_hit_exp = np.zeros(shape=num_hits, dtype=np.float64)
+        nonscaling_hit_exp = np.zeros(shape=num_hits, dtype=ACCUM_FTYPE)
 
         # Expectations for generic-only sources (i.e. pegleg=0 at this point)
-        if len(generic_sources) > 0:
+        if num_generic_sources > 0:
             nonscaling_t_indep_exp += pexp_(
                 sources=generic_sources,
                 sources_start=0,
-                sources_stop=len(generic_sources),
+                sources_stop=num_generic_sources,
                 event_dom_info=event_dom_info,
                 event_hit_info=event_hit_info,
                 hit_exp=nonscaling_hit_exp,
                 dom_tables=dom_tables,
+                dom_tables_template_library=dom_tables_template_library,
                 dom_table_norms=dom_table_norms,
                 t_indep_dom_tables=t_indep_dom_tables,
                 t_indep_dom_table_norms=t_indep_dom_table_norms,
                 tdi_tables=tdi_tables,
+                dom_grid=dom_grid,
             )
 
         if num_scaling_sources > 0:
@@ -1114,6 +1704,9 @@ def generate_pexp_and_llh_functions(
                 nominal_scaling_hit_exp=nominal_scaling_hit_exp,
                 nominal_scaling_t_indep_exp=nominal_scaling_t_indep_exp,
                 initial_scalefactor=10.,
+                scaling_hit_idxs=scaling_hit_idxs,
+                scaling_hit_charges=scaling_hit_charges,
+                scaling_hit_offsets=scaling_hit_offsets,
             )
         else:
             scalefactor = 0
@@ -1135,9 +1728,18 @@ def generate_pexp_and_llh_functions(
         # -- Pegleg loop -- #
 
         if PEGLEG_SPACING is StepSpacing.LINEAR:
-            pass
+            stride = 1
             #pegleg_steps = np.arange(num_pegleg_sources)
             #n_pegleg_steps = len(pegleg_steps)
+        elif PEGLEG_SPACING is StepSpacing.COARSE_TO_FINE:
+            # Scan the full track with steps of `stride` pegleg steps, then
+            # successively refine about the best LLH found
+            stride = 1
+            while (
+                stride * PEGLEG_REFINE_FACTOR <= PEGLEG_COARSE_STEPSIZE
+                and stride * PEGLEG_REFINE_FACTOR < num_pegleg_steps
+            ):
+                stride *= PEGLEG_REFINE_FACTOR
         elif PEGLEG_SPACING is StepSpacing.LOG:
             raise NotImplementedError(
                 'Only ``PEGLEG_SPACING = StepSpacing.LINEAR`` is implemented'
@@ -1157,79 +1759,156 @@ def generate_pexp_and_llh_functions(
         # -- Loop initialization -- #
 
         num_llhs = num_pegleg_steps + 1
-        llhs = np.full(shape=num_llhs, fill_value=-np.inf, dtype=np.float64)
+        llhs = np.full(shape=num_llhs, fill_value=-np.inf, dtype=ACCUM_FTYPE)
         llhs[0] = llh
 
-        scalefactors = np.zeros(shape=num_llhs, dtype=np.float64)
+        scalefactors = np.zeros(shape=num_llhs, dtype=ACCUM_FTYPE)
         scalefactors[0] = scalefactor
 
-        best_llh = llh
-        previous_llh = best_llh - 100
-        pegleg_max_llh_step = 0
-        getting_worse_counter = 0
-
-        for pegleg_step in range(1, num_pegleg_steps):
-            pegleg_stop_idx = pegleg_step * pegleg_stepsize
-            pegleg_start_idx = pegleg_stop_idx - pegleg_stepsize
-
-            # Add to expectations by including another "batch" or segment of pegleg
-            # sources
-            nonscaling_t_indep_exp += pexp_(
-                sources=pegleg_sources,
-                sources_start=pegleg_start_idx,
-                sources_stop=pegleg_stop_idx,
+        if num_scaling_sources == 0:
+            # Keep running per-hit LLH terms such that only hits whose expectation
+            # changes due to a pegleg step need to be re-evaluated. (Expectations are
+            # non-negative, so initializing to -1 forces all terms to be computed;
+            # note NaN can't be used since fastmath assumes there are no NaNs.)
+            last_hit_exp = np.full(shape=num_hits, fill_value=-1., dtype=ACCUM_FTYPE)
+            hit_llh_terms = np.zeros(shape=num_hits, dtype=ACCUM_FTYPE)
+            hits_llh = update_hits_llh(
                 event_dom_info=event_dom_info,
                 event_hit_info=event_hit_info,
                 hit_exp=nonscaling_hit_exp,
-                dom_tables=dom_tables,
-                dom_table_norms=dom_table_norms,
-                t_indep_dom_tables=t_indep_dom_tables,
-                t_indep_dom_table_norms=t_indep_dom_table_norms,
-                tdi_tables=tdi_tables,
+                last_hit_exp=last_hit_exp,
+                hit_llh_terms=hit_llh_terms,
             )
 
-            if num_scaling_sources > 0:
-                # Find optimal scalefactor at this pegleg step
-                scalefactor, llh = get_optimal_scalefactor(
-                    event_dom_info=event_dom_info,
-                    event_hit_info=event_hit_info,
-                    nonscaling_hit_exp=nonscaling_hit_exp,
-                    nonscaling_t_indep_exp=nonscaling_t_indep_exp,
-                    nominal_scaling_hit_exp=nominal_scaling_hit_exp,
-                    nominal_scaling_t_indep_exp=nominal_scaling_t_indep_exp,
-                    initial_scalefactor=scalefactor,
+        first_level = True
+        start_step = 0
+        stop_step = num_pegleg_steps - 1
+
+        while True:
+            refine = stride > 1
+
+            # When refining, keep the expectations (and scalefactor) after each
+            # step of this level; the next level starts from one of these
+            if refine:
+                num_level_steps = (stop_step - start_step) // stride + 1
+                snapshot_hit_exps = np.empty(
+                    shape=(num_level_steps, num_hits), dtype=ACCUM_FTYPE
                 )
-            else:
-                scalefactor = 0
-                llh = simple_llh(
+                snapshot_t_indep_exps = np.empty(shape=num_level_steps, dtype=ACCUM_FTYPE)
+                snapshot_scalefactors = np.empty(shape=num_level_steps, dtype=ACCUM_FTYPE)
+                for hit_idx in range(num_hits):
+                    snapshot_hit_exps[0, hit_idx] = nonscaling_hit_exp[hit_idx]
+                snapshot_t_indep_exps[0] = nonscaling_t_indep_exp
+                snapshot_scalefactors[0] = scalefactor
+
+            best_llh = llhs[start_step]
+            previous_llh = best_llh - 100
+            pegleg_max_llh_step = start_step
+            getting_worse_counter = 0
+            last_step = start_step
+
+            for pegleg_step in range(start_step + stride, stop_step + 1, stride):
+                pegleg_stop_idx = pegleg_step * pegleg_stepsize
+                pegleg_start_idx = pegleg_stop_idx - stride * pegleg_stepsize
+
+                # Add to expectations by including another "batch" or segment of pegleg
+                # sources
+                nonscaling_t_indep_exp += pexp_(
+                    sources=pegleg_sources,
+                    sources_start=pegleg_start_idx,
+                    sources_stop=pegleg_stop_idx,
                     event_dom_info=event_dom_info,
                     event_hit_info=event_hit_info,
-                    nonscaling_hit_exp=nonscaling_hit_exp,
-                    nonscaling_t_indep_exp=nonscaling_t_indep_exp,
+                    hit_exp=nonscaling_hit_exp,
+                    dom_tables=dom_tables,
+                    dom_tables_template_library=dom_tables_template_library,
+                    dom_table_norms=dom_table_norms,
+                    t_indep_dom_tables=t_indep_dom_tables,
+                    t_indep_dom_table_norms=t_indep_dom_table_norms,
+                    tdi_tables=tdi_tables,
+                    dom_grid=dom_grid,
                 )
 
-            # Store this pegleg step's llh and best scalefactor
-            llhs[pegleg_step] = llh
-            scalefactors[pegleg_step] = scalefactor
-
-            if llh > best_llh:
-                best_llh = llh
-                pegleg_max_llh_step = pegleg_step
-                getting_worse_counter = 0
-            elif llh < previous_llh:
-                getting_worse_counter += 1
-            else:
-                getting_worse_counter -= 1
-            previous_llh = llh
-
-            # break condition
-            if getting_worse_counter > 100: # 10?
-                #for idx in range(pegleg_idx+1,n_pegleg_steps):
-                #    # fill up with bad llhs. just to make sure they're not used
-                #    llhs[idx] = best_llh - 100
-                #print('break at step ',pegleg_idx)
+                if num_scaling_sources > 0:
+                    # Find optimal scalefactor at this pegleg step
+                    scalefactor, llh = get_optimal_scalefactor(
+                        event_dom_info=event_dom_info,
+                        event_hit_info=event_hit_info,
+                        nonscaling_hit_exp=nonscaling_hit_exp,
+                        nonscaling_t_indep_exp=nonscaling_t_indep_exp,
+                        nominal_scaling_hit_exp=nominal_scaling_hit_exp,
+                        nominal_scaling_t_indep_exp=nominal_scaling_t_indep_exp,
+                        initial_scalefactor=scalefactor,
+                        scaling_hit_idxs=scaling_hit_idxs,
+                        scaling_hit_charges=scaling_hit_charges,
+                        scaling_hit_offsets=scaling_hit_offsets,
+                    )
+                else:
+                    scalefactor = 0
+                    hits_llh += update_hits_llh(
+                        event_dom_info=event_dom_info,
+                        event_hit_info=event_hit_info,
+                        hit_exp=nonscaling_hit_exp,
+                        last_hit_exp=last_hit_exp,
+                        hit_llh_terms=hit_llh_terms,
+                    )
+                    llh = hits_llh - nonscaling_t_indep_exp
+
+                # Store this pegleg step's llh and best scalefactor
+                llhs[pegleg_step] = llh
+                scalefactors[pegleg_step] = scalefactor
+                last_step = pegleg_step
+
+                if refine:
+                    level_step = (pegleg_step - start_step) // stride
+                    for hit_idx in range(num_hits):
+                        snapshot_hit_exps[level_step, hit_idx] = nonscaling_hit_exp[hit_idx]
+                    snapshot_t_indep_exps[level_step] = nonscaling_t_indep_exp
+                    snapshot_scalefactors[level_step] = scalefactor
+
+                if llh > best_llh:
+                    best_llh = llh
+                    pegleg_max_llh_step = pegleg_step
+                    getting_worse_counter = 0
+                elif llh < previous_llh:
+                    getting_worse_counter += 1
+                else:
+                    getting_worse_counter -= 1
+                previous_llh = llh
+
+                # break condition (only while scanning the full track; counted in
+                # units of `pegleg_stepsize`)
+                if first_level:
+                    if PEGLEG_EARLY_STOP is EarlyStop.GETTING_WORSE_COUNTER:
+                        if getting_worse_counter * stride > PEGLEG_MAX_GETTING_WORSE_STEPS:
+                            break
+                    elif PEGLEG_EARLY_STOP is EarlyStop.DELTA_LLH:
+                        if llh < best_llh - PEGLEG_STOP_DELTA_LLH:
+                            break
+
+            if not refine:
                 break
 
+            # Refine over the steps within `PEGLEG_REFINE_DELTA_LLH` of the best
+            # LLH, +/- one step, starting from the state after the first of these
+            first_good_step = pegleg_max_llh_step
+            last_good_step = pegleg_max_llh_step
+            for pegleg_step in range(start_step, last_step + 1, stride):
+                if llhs[pegleg_step] >= best_llh - PEGLEG_REFINE_DELTA_LLH:
+                    first_good_step = min(first_good_step, pegleg_step)
+                    last_good_step = max(last_good_step, pegleg_step)
+
+            level_step = max(0, (first_good_step - start_step) // stride - 1)
+            start_step += level_step * stride
+            stop_step = min(last_good_step + stride, num_pegleg_steps - 1)
+            for hit_idx in range(num_hits):
+                nonscaling_hit_exp[hit_idx] = snapshot_hit_exps[level_step, hit_idx]
+            nonscaling_t_indep_exp = snapshot_t_indep_exps[level_step]
+            scalefactor = snapshot_scalefactors[level_step]
+
+            stride //= PEGLEG_REFINE_FACTOR
+            first_level = False
+
         if PEGLEG_LLH_CHOICE is LLHChoice.MAX:
             return (
                 llhs[pegleg_max_llh_step],
@@ -1283,9 +1962,166 @@ def generate_pexp_and_llh_functions(
         else:
             raise ValueError('Unknown `PEGLEG_LLH_CHOICE`')
 
+    @numba_jit(parallel=True, **DFLT_NUMBA_JIT_KWARGS)
+    def get_llh_batch_(
+        generic_sources,
+        generic_sources_offsets,
+        pegleg_sources,
+        pegleg_sources_offsets,
+        scaling_sources,
+        scaling_sources_offsets,
+        event_hit_info,
+        event_dom_info,
+        pegleg_stepsize,
+        dom_tables,
+        dom_tables_template_library,
+        dom_table_norms,
+        t_indep_dom_tables,
+        t_indep_dom_table_norms,
+        tdi_tables,
+        dom_grid,
+    ): # pylint: disable=too-many-arguments
+        """Compute log likelihoods for a batch of hypotheses given an event.
+
+        Hypotheses are evaluated in parallel; each is handled exactly as by
+        `get_llh_` (after converting its sources to struct-of-arrays layout).
+
+        Parameters
+        ----------
+        generic_sources : shape (n_total_generic_sources,) array of dtype SRC_T
+            Generic sources of all hypotheses, concatenated
+        generic_sources_offsets : shape (n_hypos + 1,) array of ints
+            Generic sources of hypothesis `i` are .. ::
+                generic_sources[generic_sources_offsets[i]:generic_sources_offsets[i+1]]
+        pegleg_sources : shape (n_total_pegleg_sources,) array of dtype SRC_T
+        pegleg_sources_offsets : shape (n_hypos + 1,) array of ints
+        scaling_sources : shape (n_total_scaling_sources,) array of dtype SRC_T
+        scaling_sources_offsets : shape (n_hypos + 1,) array of ints
+        event_hit_info : shape (n_hits,) array of dtype EVT_HIT_INFO_T
+        event_dom_info : shape (n_operational_doms,) array of dtype EVT_DOM_INFO_T
+        pegleg_stepsize : int > 0
+        dom_tables
+        dom_tables_template_library
+        dom_table_norms
+        t_indep_dom_tables
+        t_indep_dom_table_norms
+        tdi_tables
+        dom_grid : tuple
+
+        Returns
+        -------
+        llhs : shape (n_hypos,) array of float
+        pegleg_stop_idxs : shape (n_hypos,) array of float
+        scalefactors : shape (n_hypos,) array of float
+
+        """
+        num_hypos = len(generic_sources_offsets) - 1
+        llhs = np.empty(shape=num_hypos, dtype=ACCUM_FTYPE)
+        pegleg_stop_idxs = np.empty(shape=num_hypos, dtype=ACCUM_FTYPE)
+        scalefactors = np.empty(shape=num_hypos, dtype=ACCUM_FTYPE)
+
+        # Tuples of arrays can't be passed into a parallel region, so unpack
+        # them here and re-pack within the loop
+        tdi_table0, tdi_table1 = tdi_tables
+        grid_info, cell_offsets, cell_dom_indices = dom_grid
+
+        for hypo_idx in prange(num_hypos): # pylint: disable=not-an-iterable
+            llh, pegleg_stop_idx, scalefactor = get_llh_(
+                generic_sources=sources_to_soa(generic_sources[
+                    generic_sources_offsets[hypo_idx]:generic_sources_offsets[hypo_idx + 1]
+                ]),
+                pegleg_sources=sources_to_soa(pegleg_sources[
+                    pegleg_sources_offsets[hypo_idx]:pegleg_sources_offsets[hypo_idx + 1]
+                ]),
+                scaling_sources=sources_to_soa(scaling_sources[
+                    scaling_sources_offsets[hypo_idx]:scaling_sources_offsets[hypo_idx + 1]
+                ]),
+                event_hit_info=event_hit_info,
+                event_dom_info=event_dom_info,
+                pegleg_stepsize=pegleg_stepsize,
+                dom_tables=dom_tables,
+                dom_tables_template_library=dom_tables_template_library,
+                dom_table_norms=dom_table_norms,
+                t_indep_dom_tables=t_indep_dom_tables,
+                t_indep_dom_table_norms=t_indep_dom_table_norms,
+                tdi_tables=(tdi_table0, tdi_table1),
+                dom_grid=(grid_info, cell_offsets, cell_dom_indices),
+            )
+            llhs[hypo_idx] = llh
+            pegleg_stop_idxs[hypo_idx] = pegleg_stop_idx
+            scalefactors[hypo_idx] = scalefactor
+
+        return llhs, pegleg_stop_idxs, scalefactors
+
     # -- Define pexp and get_llh closures, baking-in the tables -- #
 
-    # Note: faster to _not_ jit-compile this function (why, though?)
+    # Tables are referenced by address (rather than captured directly) so that
+    # numba doesn't copy them into the compiled code; see `get_array_address`
+    all_tables = (
+        dom_tables,
+        dom_tables_template_library,
+        dom_table_norms,
+        t_indep_dom_tables,
+        t_indep_dom_table_norms,
+        tdi_tables[0],
+        tdi_tables[1],
+    )
+    dom_tables_addr, dom_tables_shape, dom_tables_dtype = get_array_address(dom_tables)
+    (dom_tables_template_library_addr,
+     dom_tables_template_library_shape,
+     dom_tables_template_library_dtype) = get_array_address(dom_tables_template_library)
+    dom_table_norms_addr, dom_table_norms_shape, dom_table_norms_dtype = (
+        get_array_address(dom_table_norms)
+    )
+    t_indep_dom_tables_addr, t_indep_dom_tables_shape, t_indep_dom_tables_dtype = (
+        get_array_address(t_indep_dom_tables)
+    )
+    t_indep_dom_table_norms_addr, t_indep_dom_table_norms_shape, t_indep_dom_table_norms_dtype = (
+        get_array_address(t_indep_dom_table_norms)
+    )
+    tdi_table0_addr, tdi_table0_shape, tdi_table0_dtype = get_array_address(tdi_tables[0])
+    tdi_table1_addr, tdi_table1_shape, tdi_table1_dtype = get_array_address(tdi_tables[1])
+
+    @numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+    def get_tables():
+        """Get views of all tables.
+
+        Returns
+        -------
+        dom_tables, dom_tables_template_library, dom_table_norms : arrays
+        t_indep_dom_tables, t_indep_dom_table_norms : arrays
+        tdi_tables : tuple of 2 arrays
+
+        """
+        return (
+            carray(address_as_void_pointer(dom_tables_addr), dom_tables_shape, dom_tables_dtype),
+            carray(
+                address_as_void_pointer(dom_tables_template_library_addr),
+                dom_tables_template_library_shape,
+                dom_tables_template_library_dtype,
+            ),
+            carray(
+                address_as_void_pointer(dom_table_norms_addr),
+                dom_table_norms_shape,
+                dom_table_norms_dtype,
+            ),
+            carray(
+                address_as_void_pointer(t_indep_dom_tables_addr),
+                t_indep_dom_tables_shape,
+                t_indep_dom_tables_dtype,
+            ),
+            carray(
+                address_as_void_pointer(t_indep_dom_table_norms_addr),
+                t_indep_dom_table_norms_shape,
+                t_indep_dom_table_norms_dtype,
+            ),
+            (
+                carray(address_as_void_pointer(tdi_table0_addr), tdi_table0_shape, tdi_table0_dtype),
+                carray(address_as_void_pointer(tdi_table1_addr), tdi_table1_shape, tdi_table1_dtype),
+            ),
+        )
+
+    @numba_jit(**DFLT_NUMBA_JIT_KWARGS)
     def pexp(
         sources,
         sources_start,
@@ -1293,7 +2129,16 @@ def generate_pexp_and_llh_functions(
         event_dom_info,
         event_hit_info,
         hit_exp,
-    ):
+        dom_grid,
+    ): # pylint: disable=missing-docstring
+        (
+            dom_tables,
+            dom_tables_template_library,
+            dom_table_norms,
+            t_indep_dom_tables,
+            t_indep_dom_table_norms,
+            tdi_tables,
+        ) = get_tables()
         return pexp_(
             sources=sources,
             sources_start=sources_start,
@@ -1302,13 +2147,15 @@ def generate_pexp_and_llh_functions(
             event_hit_info=event_hit_info,
             hit_exp=hit_exp,
             dom_tables=dom_tables,
+            dom_tables_template_library=dom_tables_template_library,
             dom_table_norms=dom_table_norms,
             t_indep_dom_tables=t_indep_dom_tables,
             t_indep_dom_table_norms=t_indep_dom_table_norms,
             tdi_tables=tdi_tables,
+            dom_grid=dom_grid,
         )
 
-    # Note: numba fails w/ TDI tables if this is set to be jit-compiled (why?)
+    @numba_jit(**DFLT_NUMBA_JIT_KWARGS)
     def get_llh(
         generic_sources,
         pegleg_sources,
@@ -1316,30 +2163,32 @@ def generate_pexp_and_llh_functions(
         event_hit_info,
         event_dom_info,
         pegleg_stepsize,
+        dom_grid,
     ):
         """Compute log likelihood for hypothesis sources given an event.
 
         Parameters
         ----------
-        generic_sources : shape (n_generic_sources,) array of dtype SRC_T
-            If NOT using the pegleg/scaling procedure, all light sources are placed in
-            this array; when using the pegleg/scaling procedure, `generic_sources` will
-            be empty (i.e., `n_generic_sources = 0`)
-        pegleg_sources : shape (n_pegleg_sources,) array of dtype SRC_T
+        generic_sources : SourcesSoA of n_generic_sources sources
+            If NOT using the pegleg/scaling procedure, all light sources are placed
+            here; when using the pegleg/scaling procedure, `generic_sources` will be
+            empty (i.e., `n_generic_sources = 0`)
+        pegleg_sources : SourcesSoA of n_pegleg_sources sources
             If using the pegleg/scaling procedure, the likelihood is maximized by
             including more and more of these sources (in the order given); if not using
-            the pegleg/scaling procedures, `pegleg_sources` will be an empty array
-            (i.e., `n_pegleg_sources = 0`)
-        scaling_sources : shape (n_scaling_sources,) array of dtype SRC_T
+            the pegleg/scaling procedures, `pegleg_sources` will be empty (i.e.,
+            `n_pegleg_sources = 0`)
+        scaling_sources : SourcesSoA of n_scaling_sources sources
             If using the pegleg/scaling procedure, the likelihood is maximized by
             scaling the luminosity of these sources; if not using the pegleg/scaling
-            procedure, `scaling_sources` will be an empty array (i.e.,
-            `n_scaling_sources = 0`)
+            procedure, `scaling_sources` will be empty (i.e., `n_scaling_sources = 0`)
         event_hit_info : shape (n_hits,) array of dtype EVT_HIT_INFO_T
         event_dom_info : shape (n_operational_doms,) array of dtype EVT_DOM_INFO_T
         pegleg_stepsize : int > 0
             Number of pegleg sources to add each time around the pegleg loop; ignored if
             pegleg procedure is not performed (i.e., if there are no `pegleg_sources`)
+        dom_grid : tuple
+            Spatial index of `event_dom_info`; see :func:`generate_dom_grid`
 
         Returns
         -------
@@ -1352,6 +2201,14 @@ def generate_pexp_and_llh_functions(
             Best scale factor for `scaling_sources` at best pegleg hypo
 
         """
+        (
+            dom_tables,
+            dom_tables_template_library,
+            dom_table_norms,
+            t_indep_dom_tables,
+            t_indep_dom_table_norms,
+            tdi_tables,
+        ) = get_tables()
         return get_llh_(
             generic_sources=generic_sources,
             pegleg_sources=pegleg_sources,
@@ -1360,11 +2217,614 @@ def generate_pexp_and_llh_functions(
             event_dom_info=event_dom_info,
             pegleg_stepsize=pegleg_stepsize,
             dom_tables=dom_tables,
+            dom_tables_template_library=dom_tables_template_library,
+            dom_table_norms=dom_table_norms,
+            t_indep_dom_tables=t_indep_dom_tables,
+            t_indep_dom_table_norms=t_indep_dom_table_norms,
+            tdi_tables=tdi_tables,
+            dom_grid=dom_grid,
+        )
+
+    @numba_jit(**DFLT_NUMBA_JIT_KWARGS)
+    def get_llh_batch(
+        generic_sources,
+        generic_sources_offsets,
+        pegleg_sources,
+        pegleg_sources_offsets,
+        scaling_sources,
+        scaling_sources_offsets,
+        event_hit_info,
+        event_dom_info,
+        pegleg_stepsize,
+        dom_grid,
+    ):
+        """Compute log likelihoods for a batch of hypotheses given an event.
+
+        Sources of all hypotheses are concatenated (per kind) and delimited by
+        offsets such that hypothesis `i` has generic sources .. ::
+
+            generic_sources[generic_sources_offsets[i]:generic_sources_offsets[i+1]]
+
+        and likewise for pegleg and scaling sources.
+
+        Parameters
+        ----------
+        generic_sources, pegleg_sources, scaling_sources : arrays of dtype SRC_T
+        generic_sources_offsets, pegleg_sources_offsets, scaling_sources_offsets : arrays of ints
+            Each of shape (n_hypos + 1,)
+        event_hit_info : shape (n_hits,) array of dtype EVT_HIT_INFO_T
+        event_dom_info : shape (n_operational_doms,) array of dtype EVT_DOM_INFO_T
+        pegleg_stepsize : int > 0
+        dom_grid : tuple
+            Spatial index of `event_dom_info`; see :func:`generate_dom_grid`
+
+        Returns
+        -------
+        llhs : shape (n_hypos,) array of float
+        pegleg_stop_idxs : shape (n_hypos,) array of float
+        scalefactors : shape (n_hypos,) array of float
+
+        """
+        num_offsets = len(generic_sources_offsets)
+        if len(pegleg_sources_offsets) != num_offsets or len(scaling_sources_offsets) != num_offsets:
+            raise ValueError('All `*_offsets` arrays must have the same length')
+        (
+            dom_tables,
+            dom_tables_template_library,
+            dom_table_norms,
+            t_indep_dom_tables,
+            t_indep_dom_table_norms,
+            tdi_tables,
+        ) = get_tables()
+        return get_llh_batch_(
+            generic_sources=generic_sources,
+            generic_sources_offsets=generic_sources_offsets,
+            pegleg_sources=pegleg_sources,
+            pegleg_sources_offsets=pegleg_sources_offsets,
+            scaling_sources=scaling_sources,
+            scaling_sources_offsets=scaling_sources_offsets,
+            event_hit_info=event_hit_info,
+            event_dom_info=event_dom_info,
+            pegleg_stepsize=pegleg_stepsize,
+            dom_tables=dom_tables,
+            dom_tables_template_library=dom_tables_template_library,
             dom_table_norms=dom_table_norms,
             t_indep_dom_tables=t_indep_dom_tables,
             t_indep_dom_table_norms=t_indep_dom_table_norms,
             tdi_tables=tdi_tables,
+            dom_grid=dom_grid,
+        )
+
+    # Keep the tables alive for as long as the functions referencing them are
+    pexp.tables = get_llh.tables = get_llh_batch.tables = all_tables
+
+    return pexp, get_llh, get_llh_batch, meta
+
+
+def test_find_nearby_doms():
+    """Unit tests for `generate_dom_grid` and `find_nearby_doms`, comparing
+    against a brute-force radius search"""
+    rand = np.random.RandomState(0)
+    cell_size = DOM_GRID_CELL_SIZE
+
+    # Strings on a jittered 125 m lattice (as for IceCube), plus strings
+    # exactly on cell edges and corners relative to the grid's origin (the
+    # minimum x and y, here those of the first string)
+    string_xy = [(-500., -500.)]
+    for sx in np.arange(-500, 501, 125):
+        for sy in np.arange(-500, 501, 125):
+            string_xy.append((sx + rand.uniform(-20, 20), sy + rand.uniform(-20, 20)))
+    for n in range(1, 20):
+        string_xy.append((-500 + n*cell_size, -500 + (n % 7)*cell_size))
+        string_xy.append((-500 + (n % 5)*cell_size, -500 + n*cell_size))
+    string_xy = np.clip(string_xy, -500, None)
+
+    dom_z = np.linspace(-500, 500, 60)
+    event_dom_info = np.zeros(shape=len(string_xy)*len(dom_z), dtype=EVT_DOM_INFO_T)
+    event_dom_info['x'] = np.repeat(string_xy[:, 0], len(dom_z))
+    event_dom_info['y'] = np.repeat(string_xy[:, 1], len(dom_z))
+    event_dom_info['z'] = np.tile(dom_z, len(string_xy))
+    event_dom_info['sd_idx'] = np.arange(len(event_dom_info))
+
+    # Drop some DOMs, as if not operational
+    event_dom_info = event_dom_info[rand.uniform(size=len(event_dom_info)) > 0.1]
+
+    dom_grid = generate_dom_grid(event_dom_info, cell_size=cell_size)
+    grid_info, cell_offsets, cell_dom_indices = dom_grid
+    assert np.all(np.sort(cell_dom_indices) == np.arange(len(event_dom_info)))
+    assert cell_offsets[-1] == len(event_dom_info)
+
+    dom_x = event_dom_info['x'].astype(np.float64)
+    dom_y = event_dom_info['y'].astype(np.float64)
+    dom_z = event_dom_info['z'].astype(np.float64)
+
+    # Points inside, on cell edges within, and well outside the detector
+    points = np.concatenate([
+        rand.uniform(-600, 600, size=(500, 3)),
+        rand.uniform(-3000, 3000, size=(200, 3)),
+        np.stack(
+            [
+                -500 + rand.randint(-4, 25, size=200) * cell_size,
+                -500 + rand.randint(-4, 25, size=200) * cell_size,
+                rand.choice(dom_z, size=200),
+            ],
+            axis=1,
+        ),
+    ])
+
+    out = np.empty(shape=len(event_dom_info), dtype=np.uint32)
+    for x, y, z in points:
+        for r_max in (0.5, cell_size / 2, cell_size, 130., 500., 5000.):
+            rsquared_max = r_max**2
+            num_found = find_nearby_doms(
+                x, y, z, rsquared_max, event_dom_info, dom_grid, out
+            )
+            found = out[:num_found]
+            assert len(np.unique(found)) == num_found
+
+            rsquared = (dom_x - x)**2 + (dom_y - y)**2 + (dom_z - z)**2
+            expected = np.flatnonzero(rsquared <= rsquared_max)
+            found_within = np.sort(found[rsquared[found] <= rsquared_max])
+            assert np.all(found_within == expected), (x, y, z, r_max)
+
+    # No operational DOMs
+    empty_dom_info = event_dom_info[:0]
+    empty_grid = generate_dom_grid(empty_dom_info, cell_size=cell_size)
+    assert find_nearby_doms(0., 0., 0., 1e6, empty_dom_info, empty_grid, out) == 0
+
+    print('<< PASS : test_find_nearby_doms >>')
+
+
+def test_generate_event_dom_hit_info():
+    """Unit tests for `generate_event_dom_hit_info`, comparing against the
+    per-DOM loop it replaced (formerly in `Reco.generate_loglike_method`)"""
+    from retro.retro_types import DOM_INFO_T, HIT_T, SD_INDEXER_T
+
+    def reference(dom_info, sd_idx_table_indexer, hits, hits_indexer):
+        """Former loop over operational DOMs"""
+        num_operational_doms = np.sum(dom_info['operational'])
+        event_dom_info = np.zeros(shape=num_operational_doms, dtype=EVT_DOM_INFO_T)
+        event_hit_info = np.zeros(shape=hits.size, dtype=EVT_HIT_INFO_T)
+        event_hit_info['time'] = hits['time']
+        event_hit_info['charge'] = hits['charge']
+        copy_fields = ['sd_idx', 'x', 'y', 'z', 'quantum_efficiency', 'noise_rate_per_ns']
+        for dom_idx, this_dom_info in enumerate(dom_info[dom_info['operational']]):
+            this_event_dom_info = event_dom_info[dom_idx:dom_idx+1]
+            for field in copy_fields:
+                this_event_dom_info[field] = this_dom_info[field]
+            sd_idx = this_dom_info['sd_idx']
+            this_event_dom_info['table_idx'] = sd_idx_table_indexer[sd_idx]
+            this_hits_indexer = hits_indexer[hits_indexer['sd_idx'] == sd_idx]
+            if len(this_hits_indexer) == 0:
+                continue
+            start = this_hits_indexer[0]['offset']
+            stop = start + this_hits_indexer[0]['num']
+            event_hit_info['event_dom_idx'][start:stop] = dom_idx
+            this_event_dom_info['hits_start_idx'] = start
+            this_event_dom_info['hits_stop_idx'] = stop
+            this_event_dom_info['total_observed_charge'] = np.sum(hits[start:stop]['charge'])
+        return event_dom_info, event_hit_info
+
+    rand = np.random.RandomState(0)
+    num_doms = 300
+    for trial in range(200):
+        dom_info = np.zeros(shape=num_doms, dtype=DOM_INFO_T)
+        dom_info['sd_idx'] = np.sort(rand.choice(2 * num_doms, size=num_doms, replace=False))
+        dom_info['operational'] = rand.uniform(size=num_doms) < [0.9, 0, 1][trial % 3]
+        for field in ['x', 'y', 'z', 'quantum_efficiency', 'noise_rate_per_ns']:
+            dom_info[field] = rand.uniform(size=num_doms)
+        sd_idx_table_indexer = rand.randint(0, 60, size=2 * num_doms)
+
+        # Hit DOMs include non-operational DOMs; some sd_idx appear twice (only
+        # the first of these entries is used)
+        num_hit_doms = [rand.randint(1, 60), 0][trial % 5 == 4]
+        hit_sd_idx = rand.choice(dom_info['sd_idx'], size=num_hit_doms, replace=False)
+        if num_hit_doms > 1:
+            num_dupes = rand.randint(1, num_hit_doms)
+            hit_sd_idx = np.concatenate([hit_sd_idx, hit_sd_idx[:num_dupes]])
+            rand.shuffle(hit_sd_idx)
+        hits_indexer = np.zeros(shape=len(hit_sd_idx), dtype=SD_INDEXER_T)
+        hits_indexer['sd_idx'] = hit_sd_idx
+        hits_indexer['num'] = rand.randint(1, 10, size=len(hit_sd_idx))
+        hits_indexer['offset'][1:] = np.cumsum(hits_indexer['num'])[:-1]
+
+        hits = np.zeros(shape=np.sum(hits_indexer['num']), dtype=HIT_T)
+        hits['time'] = rand.uniform(0, 1e4, size=len(hits))
+        hits['charge'] = rand.uniform(0.2, 5, size=len(hits))
+
+        ref_dom_info, ref_hit_info = reference(
+            dom_info, sd_idx_table_indexer, hits, hits_indexer
+        )
+        event_dom_info, event_hit_info = generate_event_dom_hit_info(
+            dom_info=dom_info,
+            sd_idx_table_indexer=sd_idx_table_indexer,
+            hits=hits,
+            hits_indexer=hits_indexer,
+        )
+
+        assert np.all(event_hit_info == ref_hit_info), trial
+        for field in EVT_DOM_INFO_T.names:
+            if field == 'total_observed_charge':
+                # Charges are summed in double rather than single precision
+                assert np.allclose(
+                    event_dom_info[field], ref_dom_info[field], rtol=1e-6, atol=0
+                ), trial
+            else:
+                assert np.all(event_dom_info[field] == ref_dom_info[field]), (trial, field)
+
+    print('<< PASS : test_generate_event_dom_hit_info >>')
+
+
+@contextmanager
+def _override_constants(**constants):
+    """Temporarily override module-level constants, for testing the variants
+    of the functions returned by `generate_pexp_and_llh_functions`.
+
+    Numba freezes globals into compiled code, so functions must be generated
+    _and_ compiled (i.e., called) within this context. Caching is disabled
+    within the context so that code compiled for other values of the constants
+    is not loaded from disk.
+
+    """
+    module_globals = globals()
+    orig_values = {name: module_globals[name] for name in constants}
+    orig_values['DFLT_NUMBA_JIT_KWARGS'] = DFLT_NUMBA_JIT_KWARGS
+    module_globals.update(constants)
+    module_globals['DFLT_NUMBA_JIT_KWARGS'] = dict(DFLT_NUMBA_JIT_KWARGS, cache=False)
+    try:
+        yield
+    finally:
+        module_globals.update(orig_values)
+
+
+def _make_test_event():
+    """Synthetic event for testing LLH functions: a cascade (at the origin)
+    followed by a track (along +x) of `true_num_segments` segments, seen by
+    DOMs on strings alongside the track. Hits' charges are the expectations
+    from this hypothesis, sampled every 20 ns.
+
+    Returns
+    -------
+    dom_tables : Retro5DTables
+    event_dom_info : array of dtype EVT_DOM_INFO_T
+    event_hit_info : array of dtype EVT_HIT_INFO_T
+    dom_grid : tuple
+    make_cascade : callable
+        `make_cascade(photons)` returns a cascade source (array of dtype SRC_T)
+    make_track : callable
+        `make_track(num_segments)` returns track sources (array of dtype SRC_T)
+    true_num_segments : int
+
+    """
+    # pylint: disable=line-too-long
+    from retro.retro_types import SRC_T
+    from retro.tables.retro_5d_tables import Retro5DTables
+
+    rand = np.random.RandomState(0)
+    n_r, n_costheta, n_t, n_costhetadir, n_deltaphidir = 20, 8, 100, 6, 6
+    table_meta = OrderedDict([
+        ('r_bin_edges', np.linspace(0, np.sqrt(200.), n_r + 1)**2),
+        ('costheta_bin_edges', np.linspace(-1, 1, n_costheta + 1)),
+        ('t_bin_edges', np.linspace(0, 1000, n_t + 1)),
+        ('costhetadir_bin_edges', np.linspace(-1, 1, n_costhetadir + 1)),
+        ('deltaphidir_bin_edges', np.linspace(0, np.pi, n_deltaphidir + 1)),
+        ('group_refractive_index', 1.35),
+    ])
+
+    # Light arrives no earlier than the direct travel time and is spread out
+    # (and attenuated) more with distance
+    r = 0.5 * (table_meta['r_bin_edges'][1:] + table_meta['r_bin_edges'][:-1])[:, np.newaxis]
+    t = 0.5 * (table_meta['t_bin_edges'][1:] + table_meta['t_bin_edges'][:-1])[np.newaxis, :]
+    delay = t - r * table_meta['group_refractive_index'] / SPEED_OF_LIGHT_M_PER_NS
+    width = 20 + r
+    time_profile = np.where(delay > 0, np.exp(-delay / width) / width, 0) * np.exp(-r / 50)
+    table = (
+        time_profile[:, np.newaxis, :, np.newaxis, np.newaxis]
+        * rand.uniform(0.5, 1, (n_r, n_costheta, n_t, n_costhetadir, n_deltaphidir))
+    ).astype(np.float32)
+    table_norm = np.ones(shape=(n_r, n_t))
+
+    # Set up just what `generate_pexp_and_llh_functions` needs, without loading
+    # (or computing norms from) table files
+    dom_tables = Retro5DTables.__new__(Retro5DTables)
+    dom_tables.table_kind = 'ckv_uncompr'
+    dom_tables.norm_version = 'binvol2.5'
+    dom_tables.is_stacked = False
+    dom_tables.table_meta = table_meta
+    dom_tables.tables = [table]
+    dom_tables.table_fpaths = [None]
+    dom_tables.table_norms = [table_norm]
+    dom_tables.t_indep_tables = [table.sum(axis=2)]
+    dom_tables.t_indep_table_norms = [table_norm.mean(axis=1)]
+    dom_tables.template_library = None
+    dom_tables.t_is_residual_time = False
+    dom_tables.time_jitter = None
+
+    string_xy = [(x, y) for x in np.arange(-40, 200, 30.) for y in (-40., 40.)]
+    dom_z = np.arange(-60, 61, 20.)
+    event_dom_info = np.zeros(shape=len(string_xy)*len(dom_z), dtype=EVT_DOM_INFO_T)
+    event_dom_info['x'] = np.repeat([x for x, _ in string_xy], len(dom_z))
+    event_dom_info['y'] = np.repeat([y for _, y in string_xy], len(dom_z))
+    event_dom_info['z'] = np.tile(dom_z, len(string_xy))
+    event_dom_info['sd_idx'] = np.arange(len(event_dom_info))
+    event_dom_info['quantum_efficiency'] = 0.25
+    event_dom_info['noise_rate_per_ns'] = 1e-3
+    dom_grid = generate_dom_grid(event_dom_info)
+
+    def make_cascade(photons):
+        """Omnidirectional source at the origin"""
+        sources = np.zeros(shape=1, dtype=SRC_T)
+        sources['kind'] = SRC_OMNI
+        sources['photons'] = photons
+        sources['dir_sintheta'] = 1
+        sources['dir_cosphi'] = 1
+        return sources
+
+    def make_track(num_segments):
+        """Track starting at the origin and time 0, heading along +x"""
+        dt = np.arange(num_segments) + 0.5
+        sources = np.zeros(shape=num_segments, dtype=SRC_T)
+        sources['kind'] = SRC_CKV_BETA1
+        sources['time'] = dt
+        sources['x'] = dt * SPEED_OF_LIGHT_M_PER_NS
+        sources['photons'] = 0.5
+        sources['dir_sintheta'] = 1
+        sources['dir_cosphi'] = 1
+        return sources
+
+    true_num_segments = 400
+    true_sources = sources_to_soa(
+        np.concatenate([make_cascade(300.), make_track(true_num_segments)])
+    )
+    hit_times = np.arange(5., 1000., 20.)
+    event_hit_info = np.zeros(shape=len(event_dom_info)*len(hit_times), dtype=EVT_HIT_INFO_T)
+    event_hit_info['time'] = np.tile(hit_times, len(event_dom_info))
+    event_hit_info['event_dom_idx'] = np.repeat(np.arange(len(event_dom_info)), len(hit_times))
+    event_dom_info['hits_start_idx'] = np.arange(len(event_dom_info)) * len(hit_times)
+    event_dom_info['hits_stop_idx'] = event_dom_info['hits_start_idx'] + len(hit_times)
+
+    pexp = generate_pexp_and_llh_functions(dom_tables)[0]
+    hit_exp = np.zeros(shape=len(event_hit_info))
+    t_indep_exp = pexp(
+        true_sources, 0, len(true_sources.time), event_dom_info, event_hit_info,
+        hit_exp, dom_grid,
+    )
+
+    # Keep only hits with non-negligible expectation, with charges normalized
+    # such that the total charge equals the total expectation
+    keep = hit_exp > 1e-3 * np.max(hit_exp)
+    event_hit_info = event_hit_info[keep]
+    event_hit_info['charge'] = hit_exp[keep] * t_indep_exp / np.sum(hit_exp[keep])
+    dom_idxs = np.arange(len(event_dom_info))
+    event_dom_info['hits_start_idx'] = np.searchsorted(event_hit_info['event_dom_idx'], dom_idxs)
+    event_dom_info['hits_stop_idx'] = np.searchsorted(
+        event_hit_info['event_dom_idx'], dom_idxs, side='right'
+    )
+    for dom_info in event_dom_info:
+        dom_info['total_observed_charge'] = np.sum(
+            event_hit_info[dom_info['hits_start_idx']:dom_info['hits_stop_idx']]['charge']
         )
-    get_llh.__doc__ = get_llh_.__doc__
 
-    return pexp, get_llh, meta
+    return (
+        dom_tables, event_dom_info, event_hit_info, dom_grid, make_cascade, make_track,
+        true_num_segments,
+    )
+
+
+def test_scalefactor_minimizers():
+    """Compare the scalefactor (and LLH) found by `get_llh` using
+    `Minimizer.SAFEGUARDED_NEWTON` against `Minimizer.BINARY_SEARCH` and
+    against a brute-force maximization of the LLH, for a synthetic event"""
+    from scipy.optimize import minimize_scalar
+    from retro.retro_types import SRC_T
+
+    (
+        dom_tables, event_dom_info, event_hit_info, dom_grid, make_cascade, make_track,
+        _,
+    ) = _make_test_event()
+
+    pexp = generate_pexp_and_llh_functions(dom_tables)[0]
+    noise = event_dom_info['noise_rate_per_ns'][event_hit_info['event_dom_idx']]
+    no_sources = sources_to_soa(np.zeros(shape=0, dtype=SRC_T))
+    pegleg_sources = sources_to_soa(make_track(1000))
+
+    # Nominal brightness of the scaling source such that the optimal
+    # scalefactor is well within range, small, and beyond `SCALE_FACTOR_MAX`
+    for nominal_photons in (300 / (0.3 * SCALE_FACTOR_MAX), 30., 0.3):
+        scaling_sources = sources_to_soa(make_cascade(nominal_photons))
+        results = []
+        for minimizer in (Minimizer.BINARY_SEARCH, Minimizer.SAFEGUARDED_NEWTON):
+            with _override_constants(
+                SCALE_FACTOR_MINIMIZER=minimizer,
+                PEGLEG_LLH_CHOICE=LLHChoice.MAX,
+            ):
+                get_llh = generate_pexp_and_llh_functions(dom_tables)[1]
+                results.append([
+                    get_llh(
+                        no_sources, pegleg_sources, scaling_sources, event_hit_info,
+                        event_dom_info, pegleg_stepsize, dom_grid,
+                    )
+                    for pegleg_stepsize in (5, 1000)
+                ])
+
+        for (ref_llh, ref_stop_idx, ref_scalefactor), (llh, stop_idx, scalefactor) in zip(*results):
+            assert stop_idx == ref_stop_idx, (nominal_photons, stop_idx, ref_stop_idx)
+            # Binary search stops once the gradient is within 1e-2 of 0, and
+            # the safeguarded Newton once steps are within 1e-6 (relative)
+            assert np.isclose(scalefactor, ref_scalefactor, rtol=1e-2, atol=0), \
+                (nominal_photons, scalefactor, ref_scalefactor)
+            assert llh >= ref_llh - 1e-4 and np.isclose(llh, ref_llh, rtol=0, atol=1e-3), \
+                (nominal_photons, llh, ref_llh)
+
+            # Brute-force maximization at the same pegleg step
+            scaling_hit_exp = np.zeros(shape=len(event_hit_info))
+            scaling_t_indep_exp = pexp(
+                scaling_sources, 0, 1, event_dom_info, event_hit_info,
+                scaling_hit_exp, dom_grid,
+            )
+            nonscaling_hit_exp = np.zeros(shape=len(event_hit_info))
+            nonscaling_t_indep_exp = pexp(
+                pegleg_sources, 0, int(stop_idx), event_dom_info, event_hit_info,
+                nonscaling_hit_exp, dom_grid,
+            )
+            def neg_llh(scalefactor): # pylint: disable=missing-docstring
+                return (
+                    scalefactor * scaling_t_indep_exp + nonscaling_t_indep_exp
+                    - np.sum(event_hit_info['charge'] * np.log(
+                        noise + scalefactor * scaling_hit_exp + nonscaling_hit_exp
+                    ))
+                )
+            bf = minimize_scalar(
+                neg_llh, bounds=(0, SCALE_FACTOR_MAX), method='bounded',
+                options=dict(xatol=1e-8),
+            )
+            assert np.isclose(scalefactor, bf.x, rtol=1e-5, atol=1e-6), \
+                (nominal_photons, scalefactor, bf.x)
+            assert np.isclose(llh, -bf.fun, rtol=0, atol=1e-4), (nominal_photons, llh, -bf.fun)
+
+    print('<< PASS : test_scalefactor_minimizers >>')
+
+
+def test_pegleg_incremental_llh():
+    """Compare the LLH found by `get_llh`, which updates expectations and
+    per-hit LLH terms incrementally as pegleg sources are added, against fully
+    recomputing the expectations and LLH at every pegleg step, for a synthetic
+    event"""
+    from retro.retro_types import SRC_T
+
+    (
+        dom_tables, event_dom_info, event_hit_info, dom_grid, make_cascade, make_track,
+        true_num_segments,
+    ) = _make_test_event()
+
+    noise = event_dom_info['noise_rate_per_ns'][event_hit_info['event_dom_idx']]
+    no_sources = sources_to_soa(np.zeros(shape=0, dtype=SRC_T))
+    generic_sources = make_cascade(300.)
+    pegleg_sources = make_track(1000)
+    all_sources = sources_to_soa(np.concatenate([generic_sources, pegleg_sources]))
+    generic_sources = sources_to_soa(generic_sources)
+    pegleg_sources = sources_to_soa(pegleg_sources)
+    pegleg_stepsizes = (1, 7, 40)
+
+    pexp, get_llh = generate_pexp_and_llh_functions(dom_tables)[:2]
+    with _override_constants(PEGLEG_LLH_CHOICE=LLHChoice.MAX):
+        get_max_llh = generate_pexp_and_llh_functions(dom_tables)[1]
+        max_llh_results = [
+            get_max_llh(
+                generic_sources, pegleg_sources, no_sources, event_hit_info,
+                event_dom_info, pegleg_stepsize, dom_grid,
+            )
+            for pegleg_stepsize in pegleg_stepsizes
+        ]
+
+    for pegleg_stepsize, max_llh_result in zip(pegleg_stepsizes, max_llh_results):
+        ref_llhs = []
+        for pegleg_step in range(1 + len(pegleg_sources.time) // pegleg_stepsize):
+            hit_exp = np.zeros(shape=len(event_hit_info))
+            t_indep_exp = pexp(
+                all_sources, 0, 1 + pegleg_step * pegleg_stepsize, event_dom_info,
+                event_hit_info, hit_exp, dom_grid,
+            )
+            ref_llhs.append(
+                -t_indep_exp + np.sum(event_hit_info['charge'] * np.log(noise + hit_exp))
+            )
+        ref_llhs = np.array(ref_llhs)
+        ref_best_step = np.argmax(ref_llhs)
+        assert 0 < ref_best_step * pegleg_stepsize < 2 * true_num_segments
+
+        llh, pegleg_stop_idx, scalefactor = max_llh_result
+        assert pegleg_stop_idx == ref_best_step * pegleg_stepsize, \
+            (pegleg_stepsize, pegleg_stop_idx, ref_best_step)
+        assert np.isclose(llh, ref_llhs[ref_best_step], rtol=1e-10, atol=0), \
+            (pegleg_stepsize, llh, ref_llhs[ref_best_step])
+        assert scalefactor == 0
+
+        # Default `PEGLEG_LLH_CHOICE`, averaging over steps near the best LLH
+        llh, pegleg_stop_idx, _ = get_llh(
+            generic_sources, pegleg_sources, no_sources, event_hit_info,
+            event_dom_info, pegleg_stepsize, dom_grid,
+        )
+        if PEGLEG_LLH_CHOICE is LLHChoice.MEAN:
+            near_best_steps = np.flatnonzero(
+                ref_llhs > ref_llhs[ref_best_step] - PEGLEG_BEST_DELTA_LLH_THRESHOLD
+            )
+            assert np.isclose(llh, np.mean(ref_llhs[near_best_steps]), rtol=1e-10, atol=0), \
+                (pegleg_stepsize, llh, np.mean(ref_llhs[near_best_steps]))
+            assert np.isclose(pegleg_stop_idx, np.mean(near_best_steps) * pegleg_stepsize), \
+                (pegleg_stepsize, pegleg_stop_idx, np.mean(near_best_steps))
+
+    print('<< PASS : test_pegleg_incremental_llh >>')
+
+
+def test_pegleg_coarse_to_fine():
+    """Compare `StepSpacing.COARSE_TO_FINE` against a `StepSpacing.LINEAR`
+    scan of all pegleg steps, for a synthetic event whose LLH varies smoothly
+    with track length"""
+    from retro.retro_types import SRC_T
+
+    (
+        dom_tables, event_dom_info, event_hit_info, dom_grid, make_cascade, make_track,
+        _,
+    ) = _make_test_event()
+
+    noise = event_dom_info['noise_rate_per_ns'][event_hit_info['event_dom_idx']]
+    no_sources = sources_to_soa(np.zeros(shape=0, dtype=SRC_T))
+    generic_sources = make_cascade(300.)
+    pegleg_sources = make_track(1000)
+    all_sources = sources_to_soa(np.concatenate([generic_sources, pegleg_sources]))
+    generic_sources = sources_to_soa(generic_sources)
+    pegleg_sources = sources_to_soa(pegleg_sources)
+    scaling_sources = sources_to_soa(make_cascade(30.))
+
+    # (generic, scaling) sources; without scaling sources, the LLH is found by
+    # incrementally updating per-hit LLH terms
+    cases = [(generic_sources, no_sources), (no_sources, scaling_sources)]
+    pegleg_stepsizes = (1, 3)
+
+    results = []
+    for spacing in (StepSpacing.LINEAR, StepSpacing.COARSE_TO_FINE):
+        with _override_constants(
+            PEGLEG_SPACING=spacing,
+            PEGLEG_LLH_CHOICE=LLHChoice.MAX,
+            PEGLEG_EARLY_STOP=EarlyStop.NEVER,
+        ):
+            get_llh = generate_pexp_and_llh_functions(dom_tables)[1]
+            results.append([
+                get_llh(
+                    generic, pegleg_sources, scaling, event_hit_info, event_dom_info,
+                    pegleg_stepsize, dom_grid,
+                )
+                for generic, scaling in cases
+                for pegleg_stepsize in pegleg_stepsizes
+            ])
+
+    pexp = generate_pexp_and_llh_functions(dom_tables)[0]
+    for case_idx, (ref_result, result) in enumerate(zip(*results)):
+        ref_llh, ref_stop_idx, ref_scalefactor = ref_result
+        llh, pegleg_stop_idx, scalefactor = result
+        assert 0 < ref_stop_idx < len(pegleg_sources.time), (case_idx, ref_stop_idx)
+        assert pegleg_stop_idx == ref_stop_idx, (case_idx, pegleg_stop_idx, ref_stop_idx)
+        assert np.isclose(llh, ref_llh, rtol=1e-10, atol=0), (case_idx, llh, ref_llh)
+        assert np.isclose(scalefactor, ref_scalefactor, rtol=1e-5, atol=0), \
+            (case_idx, scalefactor, ref_scalefactor)
+
+        # Incrementally-updated LLH after refining (restoring the state from a
+        # coarser step) matches recomputing it from scratch
+        if case_idx < len(pegleg_stepsizes):
+            hit_exp = np.zeros(shape=len(event_hit_info))
+            t_indep_exp = pexp(
+                all_sources, 0, 1 + int(pegleg_stop_idx), event_dom_info,
+                event_hit_info, hit_exp, dom_grid,
+            )
+            full_llh = -t_indep_exp + np.sum(event_hit_info['charge'] * np.log(noise + hit_exp))
+            assert np.isclose(llh, full_llh, rtol=1e-10, atol=0), (case_idx, llh, full_llh)
+
+    print('<< PASS : test_pegleg_coarse_to_fine >>')
+
+
+if __name__ == '__main__':
+    test_find_nearby_doms()
+    test_generate_event_dom_hit_info()
+    test_scalefactor_minimizers()
+    test_pegleg_incremental_llh()
+    test_pegleg_coarse_to_fine()
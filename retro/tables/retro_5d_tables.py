@@ -14,6 +14,12 @@ __all__ = [
     'NORM_VERSIONS',
     'Retro5DTables',
     'get_table_norm',
+    'get_time_jitter_t_bin_edges',
+    'get_time_jitter_table_norm',
+    'convolve_table_time_jitter',
+    'load_or_save_cached_table',
+    'cast_table_to_ftype',
+    'get_table_validation_facts',
 ]
 
 __author__ = 'P. Eller, J.L. Lanfranchi'
@@ -33,8 +39,11 @@ limitations under the License.'''
 
 from collections import OrderedDict
 from copy import deepcopy
-from os.path import abspath, dirname
+from multiprocessing.pool import ThreadPool
+import os
+from os.path import abspath, basename, dirname, isdir, isfile, join, realpath, splitext
 import sys
+import time
 
 import numpy as np
 
@@ -42,7 +51,7 @@ if __name__ == '__main__' and __package__ is None:
     RETRO_DIR = dirname(dirname(dirname(abspath(__file__))))
     if RETRO_DIR not in sys.path:
         sys.path.append(RETRO_DIR)
-from retro import load_pickle
+from retro import FTYPE, load_pickle
 from retro.const import (
     ALL_STRS_DOMS, ALL_STRS_DOMS_SET, NUM_DOMS_TOT, SPEED_OF_LIGHT_M_PER_NS,
     PI, TWO_PI, get_string_dom_pair
@@ -51,7 +60,9 @@ from retro.i3info.angsens_model import load_angsens_model
 from retro.retro_types import DOM_INFO_T
 #from retro.tables.pexp_5d import generate_pexp_and_llh_functions
 from retro.utils.geom import spherical_volume
-from retro.utils.misc import expand
+from retro.utils.misc import (
+    expand, get_cache_fpaths, get_cached_arrays, hash_obj, save_cache_file, wstderr
+)
 
 
 TABLE_NORM_KEYS = [
@@ -188,6 +199,8 @@ class Retro5DTables(object):
 
         if self.tbl_is_templ_compr and template_library is None:
             raise ValueError('Template library is needed to use compressed table')
+        if template_library is not None:
+            template_library = cast_table_to_ftype(template_library)
         self.template_library = template_library
 
         if self.tbl_is_templ_compr:
@@ -267,6 +280,8 @@ class Retro5DTables(object):
             )
 
         self.tables = []
+        self.table_fpaths = []
+        self.stacked_tables_fpath = None
         self.t_indep_tables = []
         self.table_norms = []
         self.t_indep_table_norms = []
@@ -294,6 +309,13 @@ class Retro5DTables(object):
         self.is_stacked = None
         self.t_is_residual_time = None
 
+        self.time_jitter = None
+        """If not None, time jitter has been convolved into `tables`; contains
+        keys "dt", "weights", "key" (identifying the jitter kernel and time
+        binning used), "t_bin_edges" (the original time binning), and
+        "dt_range" (the range of hit-minus-source times for which the
+        convolved tables are valid)"""
+
     def load_stacked_tables(
         self,
         stacked_tables_meta_fpath,
@@ -301,7 +323,21 @@ class Retro5DTables(object):
         stacked_t_indep_tables_fpath,
         mmap_tables=False,
         mmap_t_indep=False,
+        num_threads=1,
     ):
+        """Load stacked tables, i.e. all tables in one file and all
+        time-independent tables in another (see
+        `retro.tables.generate_stacked_tables`).
+
+        Parameters
+        ----------
+        stacked_tables_meta_fpath, stacked_tables_fpath, stacked_t_indep_tables_fpath : string
+        mmap_tables, mmap_t_indep : bool, optional
+        num_threads : int, optional
+            If > 1, read the tables and the time-independent tables
+            concurrently
+
+        """
         if self.is_stacked is not None:
             assert self.is_stacked
 
@@ -313,16 +349,35 @@ class Retro5DTables(object):
         t_indep_mmap_mode = 'r' if mmap_t_indep else None
 
         self.table_meta = load_pickle(stacked_tables_meta_fpath)
-        self.tables = np.load(stacked_tables_fpath, mmap_mode=tables_mmap_mode)
+        self.stacked_tables_fpath = stacked_tables_fpath
+
+        load_args = [
+            (stacked_tables_fpath, tables_mmap_mode),
+            (stacked_t_indep_tables_fpath, t_indep_mmap_mode),
+        ]
+        load_func = lambda args: cast_table_to_ftype(np.load(args[0], mmap_mode=args[1]))
+        t0 = time.time()
+        if num_threads > 1:
+            pool = ThreadPool(min(num_threads, len(load_args)))
+            try:
+                self.tables, self.t_indep_tables = pool.map(load_func, load_args)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            self.tables, self.t_indep_tables = [load_func(a) for a in load_args]
+        _report_load_throughput(
+            num_tables=2,
+            num_bytes=self.tables.nbytes + self.t_indep_tables.nbytes,
+            seconds=time.time() - t0,
+            num_threads=num_threads,
+        )
+
         self.tables.setflags(write=False, align=True, uic=False)
         num_tables = self.tables.shape[0]
 
         self.t_is_residual_time = bool(self.table_meta.get('t_is_residual_time', False))
 
-        self.t_indep_tables = np.load(
-            stacked_t_indep_tables_fpath,
-            mmap_mode=t_indep_mmap_mode
-        )
         self.t_indep_tables.setflags(write=False, align=True, uic=False)
         assert self.t_indep_tables.shape[0] == num_tables
 
@@ -343,6 +398,9 @@ class Retro5DTables(object):
             **{k: self.table_meta[k] for k in TABLE_NORM_KEYS}
         )
 
+        self.table_norm = self.table_norm.astype(FTYPE)
+        self.t_indep_table_norm = self.t_indep_table_norm.astype(FTYPE)
+
         self.table_norms = [self.table_norm] * num_tables
         self.t_indep_table_norms = [self.t_indep_table_norm] * num_tables
 
@@ -374,12 +432,76 @@ class Retro5DTables(object):
             required for CLSim .fits tables, which do not record this
             parameter.
 
+        """
+        self.load_tables(
+            fpaths_sd_indices=[(fpath, sd_indices)],
+            mmap=mmap,
+            step_length=step_length,
+        )
+
+    def load_tables(self, fpaths_sd_indices, mmap, step_length=None, num_threads=1):
+        """Load multiple tables into the set of tables, reading them from disk
+        concurrently.
+
+        Loading is I/O bound (and `numpy.load` releases the GIL while reading),
+        so on network filesystems, which add latency to every file access,
+        reading many tables at once with a pool of threads can be much faster
+        than reading them one after another. Tables are added to the set of
+        tables in the order given, regardless of the order in which they finish
+        loading.
+
+        Parameters
+        ----------
+        fpaths_sd_indices : iterable of (fpath, sd_indices) tuples
+            See `load_table` for the meaning of `fpath` and `sd_indices`
+        mmap : bool
+        step_length : float > 0, optional
+            See `load_table`
+        num_threads : int, optional
+            Number of tables to read concurrently
+
         """
         if self.is_stacked is None:
             self.is_stacked = False
         else:
             assert not self.is_stacked
+        if self.time_jitter is not None:
+            raise ValueError('Cannot load tables after convolving time jitter into tables')
+
+        fpaths_sd_indices = list(fpaths_sd_indices)
+        fpaths = [fpath for fpath, _ in fpaths_sd_indices]
+        load_func = lambda fpath: self.table_loader_func(fpath=fpath, mmap=mmap)
+
+        t0 = time.time()
+        num_bytes = 0
+        pool = None
+        if num_threads > 1 and len(fpaths) > 1:
+            pool = ThreadPool(min(num_threads, len(fpaths)))
+            tables = pool.imap(load_func, fpaths)
+        else:
+            tables = (load_func(fpath) for fpath in fpaths)
+        try:
+            for (fpath, sd_indices), table in zip(fpaths_sd_indices, tables):
+                num_bytes += sum(
+                    val.nbytes for val in table.values() if isinstance(val, np.ndarray)
+                )
+                self._add_table(table=table, sd_indices=sd_indices, step_length=step_length)
+                self.table_fpaths.append(expand(fpath))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        _report_load_throughput(
+            num_tables=len(fpaths),
+            num_bytes=num_bytes,
+            seconds=time.time() - t0,
+            num_threads=num_threads,
+        )
 
+    def _add_table(self, table, sd_indices, step_length):
+        """Add a table, as returned by `table_loader_func`, to the set of
+        tables; see `load_table` for parameters."""
         if isinstance(sd_indices, int):
             sd_indices = (sd_indices,)
 
@@ -387,7 +509,6 @@ class Retro5DTables(object):
             self.dom_info[self.dom_info['operational']]['sd_idx']
         ))
 
-        table = self.table_loader_func(fpath=fpath, mmap=mmap)
         if 'step_length' in table:
             if step_length is None:
                 step_length = table['step_length']
@@ -423,8 +544,8 @@ class Retro5DTables(object):
             **{k: table[k] for k in TABLE_NORM_KEYS}
         )
 
-        self.tables.append(table[self.table_name])
-        self.table_norms.append(table_norm)
+        self.tables.append(cast_table_to_ftype(table[self.table_name]))
+        self.table_norms.append(table_norm.astype(FTYPE))
         self.n_photons_per_table.append(table['n_photons'])
         # DEBUG:
         #print('n_photons: {:.2e}, avg norm: {:.2e}\n'.format(
@@ -434,14 +555,515 @@ class Retro5DTables(object):
 
         if self.compute_t_indep_exp:
             t_indep_table = table[self.t_indep_table_name]
-            self.t_indep_tables.append(t_indep_table)
-            self.t_indep_table_norms.append(t_indep_table_norm)
+            self.t_indep_tables.append(cast_table_to_ftype(t_indep_table))
+            self.t_indep_table_norms.append(t_indep_table_norm.astype(FTYPE))
 
         table_idx = len(self.tables) - 1
         self.sd_idx_table_indexer[sd_indices] = table_idx
 
         self.loaded_sd_indices = np.where(self.sd_idx_table_indexer >= 0)[0]
 
+    def convolve_time_jitter(self, jitter_dt, jitter_weights, use_cache=True, mmap=False):
+        """Convolve all loaded (time-dependent) tables along the time axis with a
+        jitter kernel, such that a single table lookup at the nominal time gives
+        the jitter-weighted expectation.
+
+        Parameters
+        ----------
+        jitter_dt : shape (n_offsets,) array
+            Time offsets, in ns
+        jitter_weights : shape (n_offsets,) array
+            Weight for each time offset
+        use_cache : bool, optional
+            Load each convolved table file (the stacked tables or an individual
+            table) from a cache file if present; otherwise, convolve it and
+            save it to a cache file. Cache files are written alongside the
+            original tables or, if that directory is not writable, to
+            `retro.CACHE_DIR`; see `get_time_jitter_cache_fpath`.
+        mmap : bool, optional
+            Whether to memory map convolved tables loaded from cache files
+
+        """
+        if self.time_jitter is not None:
+            raise ValueError('Time jitter has already been convolved into tables')
+
+        jitter_dt = np.asarray(jitter_dt)
+        jitter_weights = np.asarray(jitter_weights)
+        key = self.time_jitter_key(jitter_dt, jitter_weights)
+        t_bin_edges = np.asarray(self.table_meta['t_bin_edges'])
+        jitter_t_bin_edges, num_below, num_above = get_time_jitter_t_bin_edges(
+            t_bin_edges=t_bin_edges,
+            jitter_dt=jitter_dt,
+        )
+
+        def convolve(table, table_norm):
+            """Convolve a single table, discarding its norm (which
+            `get_time_jitter_table_norm` reproduces)"""
+            return convolve_table_time_jitter(
+                table=table,
+                table_norm=table_norm,
+                t_bin_edges=t_bin_edges,
+                jitter_dt=jitter_dt,
+                jitter_weights=jitter_weights,
+            )[0]
+
+        if self.is_stacked:
+            build_funcs = [lambda: np.stack(
+                [convolve(t, n) for t, n in zip(self.tables, self.table_norms)], axis=0
+            )]
+            table_fpaths = [self.stacked_tables_fpath]
+            orig_tables = [self.tables]
+            orig_table_norms = [self.table_norm]
+        else:
+            build_funcs = [
+                (lambda t=t, n=n: convolve(t, n))
+                for t, n in zip(self.tables, self.table_norms)
+            ]
+            table_fpaths = self.table_fpaths
+            orig_tables = self.tables
+            orig_table_norms = self.table_norms
+
+        # Stacked tables have an extra leading (table index) dimension
+        t_axis = 3 if self.is_stacked else 2
+        tables = []
+        for build_func, table_fpath, orig_table, orig_table_norm in zip(
+                build_funcs, table_fpaths, orig_tables, orig_table_norms
+        ):
+            if use_cache:
+                cache_fpath = self.get_time_jitter_cache_fpath(
+                    table_fpath=table_fpath,
+                    table=orig_table,
+                    table_norm=orig_table_norm,
+                    key=key,
+                )
+                table = load_or_save_cached_table(
+                    fpath=cache_fpath,
+                    build_func=build_func,
+                    mmap=mmap,
+                )
+            else:
+                table = build_func()
+            assert table.shape == (
+                orig_table.shape[:t_axis] + (len(jitter_t_bin_edges) - 1,)
+                + orig_table.shape[t_axis + 1:]
+            )
+            assert table.dtype == orig_table.dtype
+            table.setflags(write=False, align=True, uic=False)
+            tables.append(table)
+
+        if self.is_stacked:
+            self.tables = tables[0]
+            self.table_norm = get_time_jitter_table_norm(
+                table_norm=self.table_norm,
+                num_below=num_below,
+                num_above=num_above,
+            )
+            self.table_norms = [self.table_norm] * len(self.table_norms)
+        else:
+            self.tables = tables
+            self.table_norms = [
+                get_time_jitter_table_norm(
+                    table_norm=table_norm,
+                    num_below=num_below,
+                    num_above=num_above,
+                )
+                for table_norm in self.table_norms
+            ]
+
+        self.table_meta['t_bin_edges'] = jitter_t_bin_edges
+        if 'binning' in self.table_meta:
+            self.table_meta['binning']['t_bin_edges'] = jitter_t_bin_edges
+
+        self.time_jitter = OrderedDict([
+            ('dt', jitter_dt),
+            ('weights', jitter_weights),
+            ('key', key),
+            ('t_bin_edges', t_bin_edges),
+            ('dt_range', (t_bin_edges[0] - np.max(jitter_dt), t_bin_edges[-1] - np.min(jitter_dt))),
+        ])
+
+    def get_time_jitter_cache_fpath(self, table_fpath, table, table_norm, key):
+        """Get the path of the file to cache a jitter-convolved table file in.
+
+        This is alongside the original table, named like it but with "_jitter_"
+        and a hash appended. The hash covers `key` (see `time_jitter_key`), the
+        table's norm, shape, and dtype, and the path, size, and modification
+        time of the file the table was loaded from, so that a regenerated table
+        is not paired with a stale cache file.
+
+        Parameters
+        ----------
+        table_fpath : string
+            Path from which the table was loaded (the stacked tables' .npy file
+            or an individual table's directory or file)
+        table : numpy.ndarray
+            The (not yet convolved) table
+        table_norm : numpy.ndarray
+            The table's norm
+        key : string
+
+        Returns
+        -------
+        cache_fpath : string
+
+        """
+        data_fpath = realpath(getattr(table, 'filename', None) or table_fpath)
+        stat = os.stat(data_fpath)
+        file_key = hash_obj(
+            [key, np.asarray(table_norm, dtype=np.float64), table.shape, table.dtype.str,
+             data_fpath, stat.st_size, stat.st_mtime],
+            fmt='hex',
+        )[:8]
+        if isdir(table_fpath):
+            base = join(table_fpath, self.table_name)
+        else:
+            base = splitext(table_fpath)[0]
+        return '{}_jitter_{}.npy'.format(base, file_key)
+
+    def time_jitter_key(self, jitter_dt, jitter_weights):
+        """Get a short string uniquely identifying jitter-convolved versions of
+        the loaded tables.
+
+        Parameters
+        ----------
+        jitter_dt : shape (n_offsets,) array
+        jitter_weights : shape (n_offsets,) array
+
+        Returns
+        -------
+        key : string
+
+        """
+        return hash_obj(
+            OrderedDict([
+                ('jitter_dt', np.asarray(jitter_dt, dtype=np.float64)),
+                ('jitter_weights', np.asarray(jitter_weights, dtype=np.float64)),
+                ('t_bin_edges', np.asarray(self.table_meta['t_bin_edges'], dtype=np.float64)),
+                ('norm_version', self.norm_version),
+            ]),
+            prec=np.float32,
+            fmt='hex',
+        )[:8]
+
+
+def get_time_jitter_t_bin_edges(t_bin_edges, jitter_dt):
+    """Get the time binning of tables convolved with a jitter kernel.
+
+    A hit arriving up to ``max(jitter_dt)`` before the start of the original
+    binning (or up to ``-min(jitter_dt)`` after its end) still receives
+    contributions from jittered lookups, so the binning is extended by whole
+    bins (of the same width as the first / last original bin) to cover these
+    times.
+
+    Parameters
+    ----------
+    t_bin_edges : shape (n_t + 1,) array
+    jitter_dt : shape (n_offsets,) array
+
+    Returns
+    -------
+    jitter_t_bin_edges : shape (num_below + n_t + num_above + 1,) array
+    num_below, num_above : int
+        Number of bins added before and after the original binning
+
+    """
+    t_bin_edges = np.asarray(t_bin_edges, dtype=np.float64)
+    first_width = t_bin_edges[1] - t_bin_edges[0]
+    last_width = t_bin_edges[-1] - t_bin_edges[-2]
+    num_below = int(np.ceil(max(0, np.max(jitter_dt)) / first_width - 1e-9))
+    num_above = int(np.ceil(max(0, -np.min(jitter_dt)) / last_width - 1e-9))
+    jitter_t_bin_edges = np.concatenate([
+        t_bin_edges[0] - first_width * np.arange(num_below, 0, -1),
+        t_bin_edges,
+        t_bin_edges[-1] + last_width * np.arange(1, num_above + 1),
+    ])
+    return jitter_t_bin_edges, num_below, num_above
+
+
+def get_time_jitter_table_norm(table_norm, num_below, num_above):
+    """Get the normalization to use with a table convolved by
+    `convolve_table_time_jitter`.
+
+    The original norm is extended to the bins added by
+    `get_time_jitter_t_bin_edges` by repeating its first and last time bins;
+    zeros are replaced by ones so that all contributions can be folded into
+    the convolved table.
+
+    Parameters
+    ----------
+    table_norm : shape (n_r, n_t) array
+    num_below, num_above : int
+
+    Returns
+    -------
+    jitter_table_norm : shape (n_r, num_below + n_t + num_above) array
+
+    """
+    jitter_table_norm = np.pad(
+        table_norm, ((0, 0), (num_below, num_above)), mode='edge'
+    )
+    jitter_table_norm[jitter_table_norm == 0] = 1
+    return jitter_table_norm
+
+
+def convolve_table_time_jitter(table, table_norm, t_bin_edges, jitter_dt, jitter_weights):
+    """Convolve a single table along its time axis with a jitter kernel.
+
+    The time axis is extended as described in `get_time_jitter_t_bin_edges`
+    and the normalization (which depends on r and t) is folded into the
+    convolution, such that .. ::
+
+        convolved_table_norm[r, t] * convolved_table[r, costheta, t, ...]
+            = sum_j jitter_weights[j] * table_norm[r, t_j] * table[r, costheta, t_j, ...]
+
+    where `t_j` is the original time bin containing the center of extended
+    bin `t` shifted by ``jitter_dt[j]``; shifts that fall outside the original
+    time binning contribute nothing. This reproduces the jitter sampling in
+    `pexp` up to binning error.
+
+    Note that for template-compressed tables, only the "weight" field is
+    convolved while each bin keeps its own template "index" (bins added to
+    the time axis take that of the nearest original bin), which is a further
+    approximation.
+
+    Parameters
+    ----------
+    table : shape (n_r, n_costheta, n_t, ...) array
+        Either a plain (uncompressed) table or a template-compressed table
+        with fields "weight" and "index"
+    table_norm : shape (n_r, n_t) array
+    t_bin_edges : shape (n_t + 1,) array
+    jitter_dt : shape (n_offsets,) array
+    jitter_weights : shape (n_offsets,) array
+
+    Returns
+    -------
+    convolved_table : array of same dtype as `table`
+        Shape is that of `table` but with ``num_below + n_t + num_above``
+        time bins
+    convolved_table_norm : array of same dtype as `table_norm`
+        See `get_time_jitter_table_norm`
+
+    """
+    is_templ_compr = table.dtype.names is not None
+    weights = table['weight'] if is_templ_compr else table
+
+    t_bin_edges = np.asarray(t_bin_edges)
+    n_t = len(t_bin_edges) - 1
+    assert weights.shape[2] == n_t
+    assert table_norm.shape == (weights.shape[0], n_t)
+
+    jitter_t_bin_edges, num_below, num_above = get_time_jitter_t_bin_edges(
+        t_bin_edges=t_bin_edges,
+        jitter_dt=jitter_dt,
+    )
+    jitter_t_bin_centers = 0.5 * (jitter_t_bin_edges[:-1] + jitter_t_bin_edges[1:])
+    n_jitter_t = len(jitter_t_bin_centers)
+
+    convolved_table_norm = get_time_jitter_table_norm(
+        table_norm=table_norm,
+        num_below=num_below,
+        num_above=num_above,
+    )
+    table_norm = np.asarray(table_norm, dtype=np.float64)
+    recip_convolved_table_norm = 1 / convolved_table_norm.astype(np.float64)
+
+    # Broadcast (n_r, n_t) factors against (n_costheta, n_t, ...) slices
+    extra_dims = (1,) * (weights.ndim - 3)
+
+    convolved = np.zeros(
+        shape=weights.shape[:2] + (n_jitter_t,) + weights.shape[3:],
+        dtype=np.float64,
+    )
+    for dt, weight in zip(jitter_dt, jitter_weights):
+        shifted_t = jitter_t_bin_centers + dt
+        valid = (shifted_t >= t_bin_edges[0]) & (shifted_t <= t_bin_edges[-1])
+        shifted_t_bin_idx = np.clip(
+            np.searchsorted(t_bin_edges, shifted_t, side='right') - 1, 0, n_t - 1
+        )
+        factors = (
+            weight * valid * table_norm[:, shifted_t_bin_idx] * recip_convolved_table_norm
+        )
+        for r_bin_idx in range(weights.shape[0]):
+            convolved[r_bin_idx] += (
+                factors[r_bin_idx].reshape((1, n_jitter_t) + extra_dims)
+                * weights[r_bin_idx][:, shifted_t_bin_idx, ...]
+            )
+
+    if is_templ_compr:
+        nearest_t_bin_idx = np.clip(np.arange(n_jitter_t) - num_below, 0, n_t - 1)
+        convolved_table = np.empty(shape=convolved.shape, dtype=table.dtype)
+        convolved_table['index'] = table['index'][:, :, nearest_t_bin_idx, ...]
+        convolved_table['weight'] = convolved
+    else:
+        convolved_table = convolved.astype(table.dtype)
+
+    return convolved_table, convolved_table_norm
+
+
+def load_or_save_cached_table(fpath, build_func, mmap=False):
+    """Load a table from a cache file if it exists, otherwise build it and
+    (try to) save it to that file.
+
+    If the cache file cannot be written (e.g. the tables live in a read-only
+    directory), the table is cached in `retro.CACHE_DIR` instead; see
+    `retro.utils.misc.get_cache_fpaths` and `retro.utils.misc.save_cache_file`.
+
+    Parameters
+    ----------
+    fpath : string
+        Path to the cache file (an .npy file)
+    build_func : callable
+        Called with no arguments to build the table if it is not cached
+    mmap : bool, optional
+        Whether to memory map a table loaded from a cache file
+
+    Returns
+    -------
+    table : numpy.ndarray
+
+    """
+    fpaths = get_cache_fpaths(fpath)
+
+    for cache_fpath in fpaths:
+        if not isfile(cache_fpath):
+            continue
+        try:
+            table = np.load(cache_fpath, mmap_mode='r' if mmap else None)
+        except (IOError, OSError, ValueError) as err:
+            wstderr('WARNING: failed to load "{}", rebuilding: {}\n'.format(cache_fpath, err))
+        else:
+            print('Loaded cached table from "{}"'.format(cache_fpath))
+            return table
+
+    table = build_func()
+
+    cache_fpath = save_cache_file(fpaths, lambda tmp_fpath: np.save(tmp_fpath, table))
+    if cache_fpath is not None:
+        print('Saved table to cache file "{}"'.format(cache_fpath))
+        if mmap:
+            table = np.load(cache_fpath, mmap_mode='r')
+
+    return table
+
+
+def _report_load_throughput(num_tables, num_bytes, seconds, num_threads):
+    """Print stats on loading tables; note that memory-mapped arrays count
+    with their full size though they are not (yet) read."""
+    print(
+        'Loaded {} table file(s), {:.1f} MB, in {:.3f} s ({:.1f} MB/s) using'
+        ' {} thread(s)'.format(
+            num_tables,
+            num_bytes / 1024**2,
+            seconds,
+            num_bytes / 1024**2 / max(seconds, 1e-9),
+            num_threads,
+        )
+    )
+
+
+def cast_table_to_ftype(table):
+    """Cast a table's floating-point values to `retro.FTYPE` if they are
+    stored at a higher precision than that; tables stored at the same or lower
+    precision (e.g. float32 tables when FTYPE is float64) are returned as-is.
+
+    Note that casting a memory-mapped table loads it into memory.
+
+    Parameters
+    ----------
+    table : numpy.ndarray
+        Either a plain floating-point array or a template-compressed table (a
+        structured array with "weight" and "index" fields)
+
+    Returns
+    -------
+    table : numpy.ndarray
+
+    """
+    if table.dtype.names is None:
+        if table.dtype.itemsize <= np.dtype(FTYPE).itemsize:
+            return table
+        return table.astype(FTYPE)
+
+    weight_dtype = table.dtype['weight']
+    if weight_dtype.itemsize <= np.dtype(FTYPE).itemsize:
+        return table
+    new_dtype = np.dtype([
+        (name, FTYPE if name == 'weight' else table.dtype[name])
+        for name in table.dtype.names
+    ])
+    return table.astype(new_dtype)
+
+
+def _compute_table_validation_facts(table):
+    if table.dtype.names is None:
+        weights = table
+        indices = None
+    else:
+        weights = table['weight']
+        indices = table['index']
+
+    facts = OrderedDict()
+    facts['all_finite'] = np.all(np.isfinite(weights))
+    facts['all_nonnegative'] = np.all(weights >= 0)
+    if indices is not None:
+        facts['min_index'] = np.min(indices)
+        facts['max_index'] = np.max(indices)
+    return facts
+
+
+def get_table_validation_facts(table):
+    """Get the facts about a table's contents needed to validate it: whether
+    all weights are finite and non-negative and, for template-compressed
+    tables, the range of template indices.
+
+    Computing these touches every element of the table. So if `table` is
+    memory-mapped directly from a file (as returned by `numpy.load` with
+    `mmap_mode`), the facts are cached in a sidecar file next to it (or in
+    `retro.CACHE_DIR` if its directory is not writable), keyed by the file's
+    path, size, modification time, and inode as well as the table's offset,
+    shape, and dtype; later calls on the unchanged file then do not read the
+    table at all.
+
+    Parameters
+    ----------
+    table : numpy.ndarray
+        Either a plain floating-point array or a template-compressed table (a
+        structured array with "weight" and "index" fields)
+
+    Returns
+    -------
+    facts : OrderedDict
+        Keys "all_finite" and "all_nonnegative" and, if `table` is template
+        compressed, "min_index" and "max_index"
+
+    """
+    fpath = getattr(table, 'filename', None)
+    # Views into a memory-mapped array (whose `base` is an ndarray) are
+    # memmaps too, but their offset and shape do not describe the file
+    if (not isinstance(table, np.memmap) or not fpath
+            or isinstance(table.base, np.ndarray)):
+        return _compute_table_validation_facts(table)
+
+    fpath = realpath(fpath)
+    stat = os.stat(fpath)
+    key = hash_obj(
+        [fpath, stat.st_size, stat.st_mtime, stat.st_ino, table.offset,
+         table.shape, table.dtype.str]
+    )
+    # Tables often live on read-only shared storage; since `key` includes the
+    # file's path, the sidecar can equally well live in `retro.CACHE_DIR`
+    cache_dir = dirname(fpath)
+    if not os.access(cache_dir, os.W_OK):
+        cache_dir = None
+    arrays = get_cached_arrays(
+        name=splitext(basename(fpath))[0] + '_validation',
+        key=key,
+        build_func=lambda: _compute_table_validation_facts(table),
+        cache_dir=cache_dir,
+    )
+    return OrderedDict((k, v[()]) for k, v in arrays.items())
+
 
 def get_table_norm(
     n_photons,
@@ -720,3 +1342,95 @@ def get_table_norm(
         raise ValueError('unhandled `norm_version` "{}"'.format(norm_version))
 
     return table_norm, t_indep_table_norm
+
+
+def test_convolve_table_time_jitter():
+    """Compare `pexp` using tables convolved via `convolve_table_time_jitter`
+    against `pexp` sampling the jitter kernel for each hit, for hits arriving
+    before, during, and after the time range of the tables"""
+    # pylint: disable=line-too-long
+    from retro.const import SRC_CKV_BETA1, SRC_OMNI
+    from retro.hypo.discrete_hypo import sources_to_soa
+    from retro.retro_types import EVT_DOM_INFO_T, EVT_HIT_INFO_T, SRC_T
+    from retro.tables.pexp_5d import (
+        generate_dom_grid, generate_pexp_and_llh_functions, get_jitter_kernel
+    )
+
+    rand = np.random.RandomState(0)
+    n_r, n_costheta, n_t, n_costhetadir, n_deltaphidir = 10, 4, 100, 4, 6
+    table_meta = OrderedDict([
+        ('r_bin_edges', np.linspace(0, np.sqrt(200.), n_r + 1)**2),
+        ('costheta_bin_edges', np.linspace(-1, 1, n_costheta + 1)),
+        # Jitter offsets are even multiples of 1 ns, so hits at odd multiples
+        # of 1 ns (bin centers) involve no binning error
+        ('t_bin_edges', np.linspace(0, 2*n_t, n_t + 1)),
+        ('costhetadir_bin_edges', np.linspace(-1, 1, n_costhetadir + 1)),
+        ('deltaphidir_bin_edges', np.linspace(0, np.pi, n_deltaphidir + 1)),
+        ('group_refractive_index', 1.35),
+    ])
+    table = rand.uniform(0.1, 1, (n_r, n_costheta, n_t, n_costhetadir, n_deltaphidir)).astype(np.float32)
+    table_norm = rand.uniform(0.5, 1.5, (n_r, n_t)) * 1e-4
+    table_norm[:, 20:23] = 0 # contributions must not be lost where the norm is 0
+
+    pexps = []
+    for convolve in (False, True):
+        # Set up just what `convolve_time_jitter` and `pexp` need, without
+        # loading (or computing norms from) table files
+        dom_tables = Retro5DTables.__new__(Retro5DTables)
+        dom_tables.table_kind = 'ckv_uncompr'
+        dom_tables.norm_version = 'binvol2.5'
+        dom_tables.is_stacked = False
+        dom_tables.table_meta = deepcopy(table_meta)
+        dom_tables.tables = [table]
+        dom_tables.table_fpaths = [None]
+        dom_tables.table_norms = [table_norm]
+        dom_tables.t_indep_tables = [table.mean(axis=2)]
+        dom_tables.t_indep_table_norms = [table_norm.sum(axis=1)]
+        dom_tables.template_library = np.zeros(shape=(1, 1, 1))
+        dom_tables.t_is_residual_time = False
+        dom_tables.time_jitter = None
+        if convolve:
+            dom_tables.convolve_time_jitter(*get_jitter_kernel(), use_cache=False)
+        pexps.append(generate_pexp_and_llh_functions(dom_tables)[0])
+
+    event_dom_info = np.zeros(shape=1, dtype=EVT_DOM_INFO_T)
+    event_dom_info['quantum_efficiency'] = 0.25
+    event_dom_info['table_idx'] = 0
+    dom_grid = generate_dom_grid(event_dom_info)
+
+    sources = np.zeros(shape=2, dtype=SRC_T)
+    sources['kind'] = [SRC_OMNI, SRC_CKV_BETA1]
+    sources['time'] = 1000
+    sources['x'] = [30, -20]
+    sources['z'] = [10, 50]
+    sources['photons'] = 1e4
+    sources['dir_costheta'] = [0, -0.5]
+    sources['dir_sintheta'] = np.sqrt(1 - sources['dir_costheta']**2)
+    sources['dir_cosphi'] = 1
+    sources = sources_to_soa(sources)
+
+    # Early (before the tables' time range), on-time, and late hits
+    nominal_dts = np.array([-13, -9, -5, -1, 1, 5, 41, 101, 195, 199, 203, 209, 213])
+    event_hit_info = np.zeros(shape=len(nominal_dts), dtype=EVT_HIT_INFO_T)
+    event_hit_info['time'] = 1000 + nominal_dts
+    event_dom_info['hits_stop_idx'] = len(nominal_dts)
+
+    for source_idx in range(len(sources.kind)):
+        results = []
+        for pexp in pexps:
+            hit_exp = np.zeros(shape=len(nominal_dts))
+            t_indep_exp = pexp(
+                sources, source_idx, source_idx + 1, event_dom_info,
+                event_hit_info, hit_exp, dom_grid,
+            )
+            results.append((t_indep_exp, hit_exp))
+        (ref_t_indep_exp, ref_hit_exp), (t_indep_exp, hit_exp) = results
+        assert np.isclose(t_indep_exp, ref_t_indep_exp, rtol=1e-6)
+        assert np.all(ref_hit_exp[1:-1] > 0) and ref_hit_exp[0] == ref_hit_exp[-1] == 0
+        assert np.allclose(hit_exp, ref_hit_exp, rtol=1e-5, atol=0), (hit_exp, ref_hit_exp)
+
+    print('<< PASS : test_convolve_table_time_jitter >>')
+
+
+if __name__ == '__main__':
+    test_convolve_table_time_jitter()
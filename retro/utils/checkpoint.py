@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+
+"""
+Durable snapshots of optimizer state, allowing reconstructions interrupted
+mid-event (e.g. by preemption of a batch job) to be resumed.
+
+A checkpoint is a pickled mapping written to a temporary file, flushed to
+disk, and then renamed into place, so a checkpoint file, if present, is always
+complete. Temporary files also end in `CHECKPOINT_EXT`, so that globbing for
+checkpoints finds any left behind by a process killed mid-write.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__all__ = [
+    'CHECKPOINT_EXT',
+    'save_checkpoint',
+    'load_checkpoint',
+    'remove_checkpoint',
+]
+
+__author__ = 'J.L. Lanfranchi, P. Eller'
+__license__ = '''Copyright 2018 Justin L. Lanfranchi and Philipp Eller
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.'''
+
+from os import fsync, getpid, remove, rename
+from os.path import abspath, dirname, isdir, isfile
+from shutil import rmtree
+import sys
+
+from six.moves import cPickle as pickle
+
+if __name__ == '__main__' and __package__ is None:
+    RETRO_DIR = dirname(dirname(dirname(abspath(__file__))))
+    if RETRO_DIR not in sys.path:
+        sys.path.append(RETRO_DIR)
+from retro.utils.misc import expand
+
+
+CHECKPOINT_EXT = '.ckpt'
+"""Extension of checkpoint files (and directories)"""
+
+
+def save_checkpoint(fpath, state):
+    """Atomically write `state` to a checkpoint file, replacing any previous
+    checkpoint at `fpath`.
+
+    Parameters
+    ----------
+    fpath : string
+    state : picklable mapping
+
+    """
+    fpath = expand(fpath)
+    tmp_fpath = '{}.{}.tmp{}'.format(fpath, getpid(), CHECKPOINT_EXT)
+    try:
+        with open(tmp_fpath, 'wb') as fobj:
+            pickle.dump(state, fobj, protocol=pickle.HIGHEST_PROTOCOL)
+            fobj.flush()
+            fsync(fobj.fileno())
+        rename(tmp_fpath, fpath)
+    except:
+        if isfile(tmp_fpath):
+            remove(tmp_fpath)
+        raise
+
+
+def load_checkpoint(fpath):
+    """Load a checkpoint written by `save_checkpoint`.
+
+    Parameters
+    ----------
+    fpath : string
+
+    Returns
+    -------
+    state : mapping or None
+        None if there is no checkpoint at `fpath`
+
+    """
+    fpath = expand(fpath)
+    if not isfile(fpath):
+        return None
+    with open(fpath, 'rb') as fobj:
+        return pickle.load(fobj)
+
+
+def remove_checkpoint(path):
+    """Remove a checkpoint file or directory, if it exists.
+
+    Parameters
+    ----------
+    path : string
+
+    """
+    path = expand(path)
+    if isdir(path):
+        rmtree(path)
+    elif isfile(path):
+        remove(path)
+
+
+def test_crs2_checkpoint_resume():
+    """Unit tests for resuming a CRS2 minimization (as done by
+    `retro.reco.Reco.run_crs`) from a checkpoint written before it was
+    interrupted, which must reproduce the uninterrupted result exactly"""
+    from collections import OrderedDict
+    from os import listdir
+    from os.path import join
+    from tempfile import mkdtemp
+
+    import numpy as np
+
+    from retro.crs2 import crs2_minimize, spher_from_angles
+
+    n_live, n_cart, n_spher = 40, 4, 1
+    target = np.array([0.3, 0.6, 0.2, 0.8])
+    target_dir = np.array([0.6, 0.0, 0.8])
+
+    def fun_batch(xs):
+        """Quadratic bowl in Cartesian coordinates plus distance to a
+        direction on the sphere"""
+        dirs = np.empty((len(xs), 1, 3))
+        spher_from_angles(xs[:, n_cart::2], xs[:, n_cart+1::2], dirs)
+        return (
+            np.sum((xs[:, :n_cart] - target)**2, axis=1)
+            + np.sum((dirs[:, 0, :] - target_dir)**2, axis=1)
+        )
+
+    def init(seed):
+        rand = np.random.RandomState(seed)
+        cart = rand.uniform(size=(n_live, n_cart))
+        spher = np.empty((n_live, n_spher, 3))
+        spher_from_angles(
+            rand.uniform(0, 2*np.pi, size=(n_live, n_spher)),
+            np.arccos(rand.uniform(-1, 1, size=(n_live, n_spher))),
+            spher,
+        )
+        xs = np.empty((n_live, n_cart + 2*n_spher))
+        xs[:, :n_cart] = cart
+        xs[:, n_cart::2] = np.arctan2(spher[:, :, 1], spher[:, :, 0]) % (2*np.pi)
+        xs[:, n_cart+1::2] = np.arccos(spher[:, :, 2])
+        return cart, spher, fun_batch(xs), rand
+
+    kwargs = dict(
+        max_iter=2000,
+        max_noimprovement=500,
+        min_fn_std=1e-8,
+        vertex_std_idx=[0, 1, 2, 3],
+        vertex_std_min=[1e-6]*4,
+        bounded=True,
+        num_trials=4,
+    )
+
+    class Interrupted(Exception):
+        """Raised to simulate e.g. preemption of a batch job"""
+
+    tmpdir = mkdtemp()
+    try:
+        for interrupt_at in (0, 1, 100, 1000):
+            # Uninterrupted run
+            ref_cart, ref_spher, ref_fx, ref_rand = init(seed=0)
+            ref_fit_meta = crs2_minimize(
+                fun_batch=fun_batch, cart=ref_cart, spher=ref_spher, fx=ref_fx,
+                rand=ref_rand, **kwargs
+            )
+
+            # Run interrupted a few iterations after its last checkpoint
+            fpath = join(tmpdir, 'crs' + CHECKPOINT_EXT)
+            remove_checkpoint(fpath)
+            cart, spher, fx, rand = init(seed=0)
+
+            def checkpoint(crs_state):
+                """Checkpoint every 40 trial points; interrupt the run 12 trial
+                points after `interrupt_at`"""
+                if crs_state['iter_num'] % 40 == 0:
+                    save_checkpoint(fpath, OrderedDict([
+                        ('cart', cart),
+                        ('spher', spher),
+                        ('fx', fx),
+                        ('rand_state', rand.get_state()),
+                        ('crs_state', crs_state),
+                    ]))
+                if crs_state['iter_num'] >= interrupt_at + 12:
+                    raise Interrupted()
+
+            try:
+                crs2_minimize(
+                    fun_batch=fun_batch, cart=cart, spher=spher, fx=fx, rand=rand,
+                    checkpoint=checkpoint, **kwargs
+                )
+            except Interrupted:
+                pass
+            else:
+                raise AssertionError('minimizer finished before interruption')
+
+            # Resume in a "new process" from the checkpoint alone
+            state = load_checkpoint(fpath)
+            assert state is not None
+            rand = np.random.RandomState()
+            rand.set_state(state['rand_state'])
+            cart, spher, fx = state['cart'], state['spher'], state['fx']
+            fit_meta = crs2_minimize(
+                fun_batch=fun_batch, cart=cart, spher=spher, fx=fx, rand=rand,
+                state=state['crs_state'], **kwargs
+            )
+
+            assert fit_meta == ref_fit_meta, (interrupt_at, fit_meta, ref_fit_meta)
+            assert listdir(tmpdir) == ['crs' + CHECKPOINT_EXT], listdir(tmpdir)
+            assert np.all(cart == ref_cart)
+            assert np.all(spher == ref_spher)
+            assert np.all(fx == ref_fx)
+
+        remove_checkpoint(fpath)
+        assert load_checkpoint(fpath) is None
+
+        # A failed write leaves neither a temporary file nor a checkpoint
+        try:
+            save_checkpoint(fpath, OrderedDict([('unpicklable', lambda: None)]))
+        except Exception: # pylint: disable=broad-except
+            pass
+        else:
+            raise AssertionError('pickled a lambda')
+        assert listdir(tmpdir) == [], listdir(tmpdir)
+    finally:
+        remove_checkpoint(tmpdir)
+
+    print('<< PASS : test_crs2_checkpoint_resume >>')
+
+
+if __name__ == '__main__':
+    test_crs2_checkpoint_resume()
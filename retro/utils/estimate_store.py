@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+
+"""
+Append-only, columnar on-disk store for per-event reconstruction estimates.
+
+A store is a directory containing
+
+* "header.pkl" : estimate kinds and param names (the same for all events in
+  the store) and store-level attrs; written once, at creation
+* "records.bin" : one fixed-size record of dtype `get_record_dtype(...)` per
+  event, holding the event index, the estimate values, and the scalar
+  metadata most often used in analysis (including the scalar optimizer
+  metadata in `RECORD_FIT_META_KEYS`), so analyses need not unpickle attrs
+* "attrs.pkl" : one pickle per event holding that event's full estimate attrs,
+  appended in the same order as the records
+
+Appending an event costs O(1) regardless of how many events are already in
+the store. The record is written (and flushed) after the corresponding attrs,
+so a store left behind by a crash contains every event whose record was
+completely written; any trailing partial record is ignored by the readers, and
+both it and the attrs of the event it belonged to are removed by
+`recover_estimate_store` before appending to such a store.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__all__ = [
+    'ESTIMATE_STORE_EXT',
+    'RECORD_SCALAR_ATTRS',
+    'RECORD_FIT_META_KEYS',
+    'get_record_dtype',
+    'append_estimate',
+    'recover_estimate_store',
+    'read_estimate_columns',
+    'read_estimate_attrs',
+    'load_estimates',
+]
+
+__author__ = 'J.L. Lanfranchi, P. Eller'
+__license__ = '''Copyright 2018 Justin L. Lanfranchi and Philipp Eller
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.'''
+
+from collections import OrderedDict
+from os import fsync, ftruncate, getpid, makedirs, rename
+from os.path import abspath, dirname, getsize, isdir, isfile, join
+import sys
+
+import numpy as np
+from six.moves import cPickle as pickle
+
+if __name__ == '__main__' and __package__ is None:
+    RETRO_DIR = dirname(dirname(dirname(abspath(__file__))))
+    if RETRO_DIR not in sys.path:
+        sys.path.append(RETRO_DIR)
+from retro.utils.misc import expand
+
+
+ESTIMATE_STORE_EXT = '.est'
+"""Extension of estimate store directories"""
+
+RECORD_SCALAR_ATTRS = ('num_llh', 'max_llh', 'max_postproc_llh')
+"""Scalar estimate attrs stored as columns of the records (in addition to
+being in the full attrs)"""
+
+RECORD_FIT_META_KEYS = (
+    'logZ',
+    'logZ_err',
+    'ins_logZ',
+    'ins_logZ_err',
+    'iterations',
+    'num_failures',
+    'num_mutation_successes',
+    'num_simplex_successes',
+    'stopping_flag',
+)
+"""Scalar items of the estimate attrs' `run_info['fit_meta']` (as set by the
+MultiNest and CRS2 optimizers) stored as columns of the records; items an
+optimizer does not set are NaN"""
+
+_HEADER_FNAME = 'header.pkl'
+_RECORDS_FNAME = 'records.bin'
+_ATTRS_FNAME = 'attrs.pkl'
+
+
+def get_record_dtype(num_kinds, num_params, fit_meta_keys=()):
+    """Get dtype of the per-event records in a store.
+
+    Parameters
+    ----------
+    num_kinds, num_params : int
+    fit_meta_keys : sequence of strings, optional
+        Items of `run_info['fit_meta']` stored as columns; stores record these
+        in their header (stores written before fit-meta columns existed have
+        none)
+
+    Returns
+    -------
+    record_dtype : numpy.dtype
+
+    """
+    return np.dtype(
+        [('event_idx', np.int64), ('values', np.float64, (num_kinds, num_params))]
+        + [(attr, np.float64) for attr in RECORD_SCALAR_ATTRS]
+        + [('run_time', np.float64)]
+        + [(key, np.float64) for key in fit_meta_keys]
+    )
+
+
+def _read_header(store_path):
+    with open(join(store_path, _HEADER_FNAME), 'rb') as fobj:
+        return pickle.load(fobj)
+
+
+def _get_header_record_dtype(header):
+    return get_record_dtype(
+        num_kinds=len(header['kinds']),
+        num_params=len(header['params']),
+        fit_meta_keys=header.get('fit_meta_keys', ()),
+    )
+
+
+def append_estimate(store_path, estimate, create=False, store_attrs=None):
+    """Append one event's estimate to a store.
+
+    Parameters
+    ----------
+    store_path : string
+    estimate : xarray.DataArray
+        As returned by `retro.utils.stats.estimate_from_llhp` with dims
+        ("kind", "param") and with attr "event_idx" set
+    create : bool, optional
+        Create a new store at `store_path` (which must not exist) rather than
+        appending to an existing one
+    store_attrs : mapping, optional
+        Store-level attributes; only used if `create` is True
+
+    """
+    store_path = expand(store_path)
+    kinds = [str(k) for k in estimate['kind'].values]
+    params = [str(p) for p in estimate['param'].values]
+
+    if create:
+        if isdir(store_path) or isfile(store_path):
+            raise IOError('File already exists at "{}"'.format(store_path))
+        makedirs(store_path)
+        header = OrderedDict([
+            ('kinds', kinds),
+            ('params', params),
+            ('attrs', store_attrs if store_attrs is not None else OrderedDict()),
+            ('fit_meta_keys', list(RECORD_FIT_META_KEYS)),
+        ])
+        # Write then rename so a header, if present, is always complete
+        tmp_fpath = join(store_path, '{}.{}.tmp'.format(_HEADER_FNAME, getpid()))
+        with open(tmp_fpath, 'wb') as fobj:
+            pickle.dump(header, fobj, protocol=pickle.HIGHEST_PROTOCOL)
+        rename(tmp_fpath, join(store_path, _HEADER_FNAME))
+    else:
+        if not isfile(join(store_path, _HEADER_FNAME)):
+            raise IOError(
+                'Output file with previous events does not exist at "{}"'
+                .format(store_path)
+            )
+        header = _read_header(store_path)
+        if header['kinds'] != kinds or header['params'] != params:
+            raise ValueError(
+                'Estimate with kinds {} and params {} does not match those of'
+                ' store "{}": {} and {}'.format(
+                    kinds, params, store_path, header['kinds'], header['params']
+                )
+            )
+
+    attrs = estimate.attrs
+    run_info = attrs.get('run_info', {})
+    fit_meta = run_info.get('fit_meta', {})
+    record = np.zeros(shape=1, dtype=_get_header_record_dtype(header))
+    record['event_idx'] = attrs['event_idx']
+    record['values'] = estimate.values
+    for attr in RECORD_SCALAR_ATTRS:
+        record[attr] = attrs.get(attr, np.nan)
+    record['run_time'] = run_info.get('run_time', np.nan)
+    for key in header.get('fit_meta_keys', ()):
+        val = fit_meta.get(key)
+        record[key] = np.nan if val is None else val
+
+    with open(join(store_path, _ATTRS_FNAME), 'ab') as fobj:
+        pickle.dump(attrs, fobj, protocol=pickle.HIGHEST_PROTOCOL)
+        fobj.flush()
+        fsync(fobj.fileno())
+
+    with open(join(store_path, _RECORDS_FNAME), 'ab') as fobj:
+        fobj.write(record.tobytes())
+        fobj.flush()
+        fsync(fobj.fileno())
+
+
+def recover_estimate_store(store_path):
+    """Remove anything left behind in a store by a crash while appending an
+    estimate, i.e., a trailing partial record and any attrs beyond those of the
+    complete records, so that further estimates can be appended.
+
+    Parameters
+    ----------
+    store_path : string
+
+    Returns
+    -------
+    num_events : int
+        Number of (complete) events in the store
+
+    """
+    store_path = expand(store_path)
+    header = _read_header(store_path)
+    record_dtype = _get_header_record_dtype(header)
+
+    records_fpath = join(store_path, _RECORDS_FNAME)
+    num_events = 0
+    if isfile(records_fpath):
+        num_bytes = getsize(records_fpath)
+        num_events = num_bytes // record_dtype.itemsize
+        if num_bytes != num_events * record_dtype.itemsize:
+            with open(records_fpath, 'r+b') as fobj:
+                ftruncate(fobj.fileno(), num_events * record_dtype.itemsize)
+                fsync(fobj.fileno())
+
+    attrs_fpath = join(store_path, _ATTRS_FNAME)
+    if isfile(attrs_fpath):
+        with open(attrs_fpath, 'r+b') as fobj:
+            for _ in range(num_events):
+                pickle.load(fobj)
+            attrs_size = fobj.tell()
+            if attrs_size != getsize(attrs_fpath):
+                ftruncate(fobj.fileno(), attrs_size)
+                fsync(fobj.fileno())
+
+    return num_events
+
+
+def read_estimate_columns(store_path, mmap=True):
+    """Read the records of a store as columns.
+
+    Parameters
+    ----------
+    store_path : string
+    mmap : bool, optional
+        Memory-map the records rather than reading them into memory
+
+    Returns
+    -------
+    header : OrderedDict
+        Keys "kinds", "params", "attrs", and (unless the store predates
+        fit-meta columns) "fit_meta_keys"
+    records : shape (num_events,) array of dtype `get_record_dtype(...)`
+
+    """
+    store_path = expand(store_path)
+    header = _read_header(store_path)
+    record_dtype = _get_header_record_dtype(header)
+
+    records_fpath = join(store_path, _RECORDS_FNAME)
+    num_records = 0
+    if isfile(records_fpath):
+        num_records = getsize(records_fpath) // record_dtype.itemsize
+
+    if num_records == 0:
+        records = np.empty(shape=0, dtype=record_dtype)
+    elif mmap:
+        records = np.memmap(records_fpath, dtype=record_dtype, mode='r', shape=(num_records,))
+    else:
+        records = np.fromfile(records_fpath, dtype=record_dtype, count=num_records)
+
+    return header, records
+
+
+def read_estimate_attrs(store_path, num_events):
+    """Read the full attrs of the first `num_events` events in a store.
+
+    Parameters
+    ----------
+    store_path : string
+    num_events : int
+        E.g. the number of records returned by `read_estimate_columns`; attrs
+        beyond these (left by a crash before the record was written) are not
+        read
+
+    Returns
+    -------
+    all_attrs : list of mappings
+
+    """
+    all_attrs = []
+    if num_events == 0:
+        return all_attrs
+    with open(join(expand(store_path), _ATTRS_FNAME), 'rb') as fobj:
+        while len(all_attrs) < num_events:
+            all_attrs.append(pickle.load(fobj))
+    return all_attrs
+
+
+def load_estimates(store_path):
+    """Load a store as an `xarray.Dataset` laid out like the legacy
+    "slc*.pkl" estimate files (which pickled such a Dataset in its entirety).
+
+    Parameters
+    ----------
+    store_path : string
+
+    Returns
+    -------
+    dataset : xarray.Dataset
+        One `xarray.DataArray` per event, named by its event index and with
+        its attrs; the store attrs are set as `dataset.attrs`
+
+    """
+    import xarray as xr
+
+    store_path = expand(store_path)
+    header, records = read_estimate_columns(store_path, mmap=False)
+
+    all_attrs = read_estimate_attrs(store_path, num_events=len(records))
+
+    data_vars = OrderedDict()
+    for record, attrs in zip(records, all_attrs):
+        event_idx = int(record['event_idx'])
+        data_vars[event_idx] = xr.DataArray(
+            data=np.array(record['values']),
+            dims=('kind', 'param'),
+            coords=dict(kind=header['kinds'], param=header['params']),
+            attrs=attrs,
+            name=event_idx,
+        )
+
+    # Constructing the Dataset at once is much faster than adding each
+    # DataArray to it in turn
+    dataset = xr.Dataset(data_vars=data_vars, attrs=header['attrs'])
+
+    return dataset
+
+
+def test_recover_estimate_store():
+    """Unit tests for `recover_estimate_store`, simulating crashes while
+    appending an estimate"""
+    import shutil
+    from tempfile import mkdtemp
+
+    import xarray as xr
+
+    kinds = ['mean', 'lower_bound', 'upper_bound']
+    params = ['x', 'y', 'z', 'time']
+
+    def make_estimate(event_idx):
+        estimate = xr.DataArray(
+            data=np.random.RandomState(event_idx).uniform(size=(len(kinds), len(params))),
+            dims=('kind', 'param'),
+            coords=dict(kind=kinds, param=params),
+        )
+        estimate.attrs.update(
+            event_idx=event_idx,
+            num_llh=100 + event_idx,
+            max_llh=-float(event_idx),
+            max_postproc_llh=-2.*event_idx,
+            run_info=dict(
+                run_time=0.1*event_idx,
+                fit_meta=dict(iterations=10*event_idx, stopping_flag=1),
+            ),
+        )
+        return estimate
+
+    def check_store(store_path, event_idxs):
+        header, records = read_estimate_columns(store_path, mmap=False)
+        assert header['kinds'] == kinds and header['params'] == params
+        assert list(records['event_idx']) == event_idxs
+        all_attrs = read_estimate_attrs(store_path, num_events=len(records))
+        for record, attrs, event_idx in zip(records, all_attrs, event_idxs):
+            estimate = make_estimate(event_idx)
+            assert np.all(record['values'] == estimate.values)
+            assert record['num_llh'] == 100 + event_idx
+            assert record['run_time'] == 0.1*event_idx
+            assert record['iterations'] == 10*event_idx
+            assert np.isnan(record['logZ'])
+            assert attrs == estimate.attrs
+        dataset = load_estimates(store_path)
+        assert list(dataset.data_vars.keys()) == event_idxs
+
+    tmpdir = mkdtemp()
+    try:
+        store_path = join(tmpdir, 'test' + ESTIMATE_STORE_EXT)
+        for event_idx in range(3):
+            append_estimate(store_path, make_estimate(event_idx), create=event_idx == 0)
+        check_store(store_path, [0, 1, 2])
+        records_fpath = join(store_path, _RECORDS_FNAME)
+        attrs_fpath = join(store_path, _ATTRS_FNAME)
+        records_size = getsize(records_fpath)
+        attrs_size = getsize(attrs_fpath)
+
+        # Crash while writing a record: attrs of that event are complete but
+        # only part of its record was written
+        record_dtype = _get_header_record_dtype(_read_header(store_path))
+        with open(attrs_fpath, 'ab') as fobj:
+            pickle.dump(make_estimate(3).attrs, fobj, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(records_fpath, 'ab') as fobj:
+            fobj.write(b'\x01' * (record_dtype.itemsize // 2))
+
+        # Readers ignore the partial record (and the attrs beyond the records)
+        check_store(store_path, [0, 1, 2])
+
+        assert recover_estimate_store(store_path) == 3
+        assert getsize(records_fpath) == records_size
+        assert getsize(attrs_fpath) == attrs_size
+        check_store(store_path, [0, 1, 2])
+
+        append_estimate(store_path, make_estimate(4))
+        check_store(store_path, [0, 1, 2, 4])
+
+        # Crash while writing attrs: only part of a pickle was written
+        attrs_size = getsize(attrs_fpath)
+        with open(attrs_fpath, 'ab') as fobj:
+            fobj.write(
+                pickle.dumps(make_estimate(5).attrs, protocol=pickle.HIGHEST_PROTOCOL)[:20]
+            )
+        assert recover_estimate_store(store_path) == 4
+        assert getsize(attrs_fpath) == attrs_size
+
+        append_estimate(store_path, make_estimate(6))
+        check_store(store_path, [0, 1, 2, 4, 6])
+
+        # Recovering an intact store changes nothing
+        assert recover_estimate_store(store_path) == 5
+        check_store(store_path, [0, 1, 2, 4, 6])
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print('<< PASS : test_recover_estimate_store >>')
+
+
+if __name__ == '__main__':
+    test_recover_estimate_store()
@@ -11,6 +11,7 @@ Utilities for extracting and processing reconstruction information saved to disk
 from __future__ import absolute_import, division, print_function
 
 __all__ = [
+    'get_kept_meta',
     'extract_from_leaf_dir',
     'augment_info',
     'get_retro_results',
@@ -35,6 +36,9 @@ if __name__ == '__main__' and __package__ is None:
     RETRO_DIR = dirname(dirname(dirname(abspath(__file__))))
     if RETRO_DIR not in sys.path:
         sys.path.append(RETRO_DIR)
+from retro.utils.estimate_store import (
+    ESTIMATE_STORE_EXT, read_estimate_attrs, read_estimate_columns
+)
 from retro.utils.geom import rotate_points
 from retro.utils.misc import expand, mkdir
 from retro.utils.stats import estimate_from_llhp
@@ -118,6 +122,32 @@ SIMPLE_ERR_PARAMS = (
 )
 
 
+def get_kept_meta(attrs, keep_fit_meta_keys):
+    """Get the scalar metadata kept in the results from an estimate's attrs.
+
+    Parameters
+    ----------
+    attrs : mapping
+    keep_fit_meta_keys : sequence of strings
+
+    Returns
+    -------
+    meta : OrderedDict
+        Keys are `KEEP_ATTRS`, `KEEP_RUN_INFO_KEYS`, and `keep_fit_meta_keys`
+
+    """
+    run_info = attrs['run_info']
+    fit_meta = run_info['fit_meta']
+    meta = OrderedDict()
+    for attr in KEEP_ATTRS:
+        meta[attr] = attrs[attr]
+    for key in KEEP_RUN_INFO_KEYS:
+        meta[key] = run_info[key]
+    for key in keep_fit_meta_keys:
+        meta[key] = fit_meta[key]
+    return meta
+
+
 def extract_from_leaf_dir(
     recodir,
     eventdir,
@@ -157,24 +187,72 @@ def extract_from_leaf_dir(
             continue
         pl_recos[pl_reco_name] = np.load(fname)
 
-    for est_fpath in glob(join(recodir, '*.crs_prefit_mn.estimate*.pkl')):
-        with file(est_fpath, 'rb') as f:
-            estimates = pickle.load(f)
-
-        kinds = estimates['kind'].values
-        params = estimates['param'].values
-        mean_index = int(np.argwhere(kinds == 'mean'))
-        lower_index = int(np.argwhere(kinds == 'lower_bound'))
-        upper_index = int(np.argwhere(kinds == 'upper_bound'))
-
+    est_fpaths = (
+        glob(join(recodir, '*.crs_prefit_mn.estimate*.pkl'))
+        + glob(join(recodir, '*.crs_prefit_mn.estimate*' + ESTIMATE_STORE_EXT))
+    )
+    for est_fpath in est_fpaths:
         if 'estimate_prefit' in est_fpath:
             is_prefit = True
             pfx = 'retro_pft_'
+            keep_fit_meta_keys = KEEP_EST_PRFT_FIT_META_KEYS
         else:
             is_prefit = False
             pfx = 'retro_'
+            keep_fit_meta_keys = KEEP_EST_FIT_META_KEYS
+
+        # Full attrs are only needed for `priors_used` when recomputing
+        # (non-prefit) estimates
+        need_attrs = recompute_estimate and not is_prefit
+
+        if est_fpath.endswith(ESTIMATE_STORE_EXT):
+            header, records = read_estimate_columns(est_fpath, mmap=False)
+            kinds = np.array(header['kinds'])
+            params = np.array(header['params'])
 
-        for event_idx, estimate in estimates.data_vars.items():
+            # Stores written before fit-meta columns existed lack some of the
+            # kept metadata in their records; get it from their attrs instead
+            keep_keys = KEEP_ATTRS + KEEP_RUN_INFO_KEYS + keep_fit_meta_keys
+            have_columns = all(key in records.dtype.names for key in keep_keys)
+
+            if need_attrs or not have_columns:
+                events_attrs = read_estimate_attrs(est_fpath, num_events=len(records))
+            else:
+                events_attrs = [None] * len(records)
+
+            events_estimates = (
+                (
+                    record['event_idx'],
+                    record['values'],
+                    (
+                        OrderedDict((key, record[key]) for key in keep_keys)
+                        if have_columns
+                        else get_kept_meta(attrs, keep_fit_meta_keys)
+                    ),
+                    attrs,
+                )
+                for record, attrs in zip(records, events_attrs)
+            )
+        else:
+            with file(est_fpath, 'rb') as f:
+                estimates = pickle.load(f)
+            kinds = estimates['kind'].values
+            params = estimates['param'].values
+            events_estimates = (
+                (
+                    event_idx,
+                    estimate.__array__(),
+                    get_kept_meta(estimate.attrs, keep_fit_meta_keys),
+                    estimate.attrs,
+                )
+                for event_idx, estimate in estimates.data_vars.items()
+            )
+
+        mean_index = int(np.argwhere(kinds == 'mean'))
+        lower_index = int(np.argwhere(kinds == 'lower_bound'))
+        upper_index = int(np.argwhere(kinds == 'upper_bound'))
+
+        for event_idx, est, meta, attrs in events_estimates:
             event_idx = int(event_idx)
             info_key = (flavdir, filenum, event_idx)
 
@@ -200,13 +278,9 @@ def extract_from_leaf_dir(
                         llhp=llhp,
                         treat_dims_independently=False,
                         use_prob_weights=True,
-                        priors_used=estimate.attrs['priors_used'],
+                        priors_used=attrs['priors_used'],
                     )
-                est = new_estimate
-            else:
-                est = estimate
-
-            est = est.__array__()
+                est = new_estimate.__array__()
 
             try:
                 if info_key not in infos:
@@ -234,21 +308,8 @@ def extract_from_leaf_dir(
 
                 # -- Get Retro recos & metadata into info dict -- #
 
-                attrs = estimate.attrs
-                for attr in KEEP_ATTRS:
-                    info[pfx + attr] = attrs[attr]
-
-                run_info = attrs['run_info']
-                for key in KEEP_RUN_INFO_KEYS:
-                    info[pfx + key] = run_info[key]
-
-                fit_meta = run_info['fit_meta']
-                if is_prefit:
-                    keep_fit_meta_keys = KEEP_EST_PRFT_FIT_META_KEYS
-                else:
-                    keep_fit_meta_keys = KEEP_EST_FIT_META_KEYS
-                for key in keep_fit_meta_keys:
-                    info[pfx + key] = fit_meta[key]
+                for key, val in meta.items():
+                    info[pfx + key] = val
 
                 for param_index, param in enumerate(params):
                     info[pfx + param] = est[mean_index, param_index]
@@ -421,12 +482,18 @@ def get_retro_results(
     try:
         # Walk directory hierarchy
         futures = []
-        for reco_dirpath, _, files in walk(recos_basedir, followlinks=True):
+        for reco_dirpath, dirs, files in walk(recos_basedir, followlinks=True):
             is_leafdir = False
             for f in files:
                 if f[-3:] == 'pkl' and f[:3] in ('slc', 'evt'):
                     is_leafdir = True
                     break
+            # Estimate stores are directories; don't descend into them
+            stores = [d for d in dirs if d.endswith(ESTIMATE_STORE_EXT)]
+            if stores:
+                is_leafdir = True
+                for d in stores:
+                    dirs.remove(d)
             if not is_leafdir:
                 continue
             rel_dirpath = relpath(path=reco_dirpath, start=recos_basedir)
@@ -19,6 +19,10 @@ __all__ = [
     'hash_obj',
     'test_hash_obj',
     'get_file_md5',
+    'get_cache_fpaths',
+    'save_cache_file',
+    'test_save_cache_file',
+    'get_cached_arrays',
     'sort_dict',
     'convert_to_namedtuple',
     'event_to_hypo_params',
@@ -53,8 +57,10 @@ import pickle
 import errno
 import hashlib
 from numbers import Number
-from os import makedirs
-from os.path import abspath, dirname, expanduser, expandvars, isfile, splitext
+from os import getpid, makedirs, remove, rename
+from os.path import (
+    abspath, basename, dirname, expanduser, expandvars, isfile, join, realpath, splitext
+)
 import re
 import struct
 from subprocess import Popen, PIPE
@@ -68,7 +74,7 @@ if __name__ == '__main__' and __package__ is None:
     RETRO_DIR = dirname(dirname(dirname(abspath(__file__))))
     if RETRO_DIR not in sys.path:
         sys.path.append(RETRO_DIR)
-from retro import const, retro_types
+from retro import CACHE_DIR, const, retro_types
 
 
 ZSTD_EXTENSIONS = ('zstd', 'zstandard', 'zst')
@@ -296,6 +302,158 @@ def get_file_md5(fpath, blocksize=2**20):
     return md5.hexdigest()
 
 
+def get_cache_fpaths(fpath):
+    """Get the paths at which to look for (and save) a cache file: `fpath`
+    itself and, as a fallback should `fpath` not be writable (e.g. because it
+    lives in a read-only directory), a path in `retro.CACHE_DIR` made unique by
+    the hash of `fpath`.
+
+    Parameters
+    ----------
+    fpath : string
+
+    Returns
+    -------
+    fpaths : list of strings
+        The fallback path is omitted if `retro.CACHE_DIR` is empty or if
+        `fpath` is already in it
+
+    """
+    fpath = expand(fpath)
+    fpaths = [fpath]
+    if CACHE_DIR and dirname(realpath(fpath)) != realpath(expand(CACHE_DIR)):
+        stem, ext = splitext(basename(fpath))
+        fpaths.append(join(
+            expand(CACHE_DIR),
+            '{}_{}{}'.format(stem, hash_obj(realpath(fpath), fmt='hex')[:8], ext),
+        ))
+    return fpaths
+
+
+def save_cache_file(fpaths, save_func):
+    """Save a cache file to the first of `fpaths` that can be written.
+
+    The file is written to a temporary file (removed if writing fails) and
+    renamed, so that concurrent processes never load a partially-written
+    file.
+
+    Parameters
+    ----------
+    fpaths : sequence of strings
+        E.g. as returned by `get_cache_fpaths`
+    save_func : callable
+        Called with the path of the temporary file to write; this path has
+        the same extension as the final path (as e.g. `numpy.save` requires)
+
+    Returns
+    -------
+    fpath : string or None
+        Path the file was saved to; None if it could not be saved anywhere
+
+    """
+    for fpath in fpaths:
+        root, ext = splitext(fpath)
+        tmp_fpath = '{}.{}.tmp{}'.format(root, getpid(), ext)
+        try:
+            mkdir(dirname(fpath))
+            save_func(tmp_fpath)
+            rename(tmp_fpath, fpath)
+        except (IOError, OSError) as err:
+            wstderr('WARNING: failed to save "{}": {}\n'.format(fpath, err))
+            if isfile(tmp_fpath):
+                remove(tmp_fpath)
+        else:
+            return fpath
+    return None
+
+
+def test_save_cache_file():
+    """Unit tests for `save_cache_file`"""
+    from os import listdir
+    from shutil import rmtree
+    from tempfile import mkdtemp
+
+    tmpdir = mkdtemp()
+    try:
+        # A directory can't be created where a file is
+        blocker = join(tmpdir, 'blocker')
+        open(blocker, 'w').close()
+        unwritable_fpath = join(blocker, 'x.npy')
+
+        def fail_midway(tmp_fpath):
+            """Write part of a file, then fail"""
+            with open(tmp_fpath, 'w') as fobj:
+                fobj.write('partial')
+            raise IOError('disk full')
+
+        fpath = join(tmpdir, 'a', 'x.npy')
+        assert save_cache_file([unwritable_fpath, fpath], fail_midway) is None
+        assert listdir(join(tmpdir, 'a')) == []
+
+        array = np.arange(10)
+        saved_fpath = save_cache_file(
+            [unwritable_fpath, fpath], lambda tmp_fpath: np.save(tmp_fpath, array)
+        )
+        assert saved_fpath == fpath
+        assert listdir(join(tmpdir, 'a')) == ['x.npy']
+        assert np.all(np.load(fpath) == array)
+    finally:
+        rmtree(tmpdir)
+
+    print('<< PASS : test_save_cache_file >>')
+
+
+def get_cached_arrays(name, key, build_func, cache_dir=None):
+    """Get arrays from an ".npz" file in a cache directory if it exists,
+    otherwise build them and (try to) save them to that file.
+
+    Parameters
+    ----------
+    name : string
+        Name of the cached item; used as prefix of the filename
+    key : string
+        Identifies the inputs the arrays are built from (e.g. a hash of the
+        input file's contents and of any parameters); used in the filename
+    build_func : callable
+        Called with no arguments to build the arrays if they are not cached;
+        must return a mapping from names to arrays
+    cache_dir : string, optional
+        Defaults to `retro.CACHE_DIR`; if that is also empty, nothing is
+        persisted and `build_func` is always called. If the file cannot be
+        written to `cache_dir`, it is saved to `retro.CACHE_DIR` instead; see
+        `get_cache_fpaths`.
+
+    Returns
+    -------
+    arrays : OrderedDict
+
+    """
+    if cache_dir is None:
+        cache_dir = CACHE_DIR
+
+    fpaths = []
+    if cache_dir:
+        fpaths = get_cache_fpaths(join(cache_dir, '{}_{}.npz'.format(name, key)))
+
+    for fpath in fpaths:
+        if not isfile(fpath):
+            continue
+        try:
+            npz = np.load(fpath)
+            try:
+                return OrderedDict((k, npz[k]) for k in npz.files)
+            finally:
+                npz.close()
+        except Exception as err: # pylint: disable=broad-except
+            wstderr('WARNING: failed to load "{}", rebuilding: {}\n'.format(fpath, err))
+
+    arrays = OrderedDict(build_func())
+
+    save_cache_file(fpaths, lambda tmp_fpath: np.savez(tmp_fpath, **arrays))
+
+    return arrays
+
+
 def sort_dict(d):
     """Return an OrderedDict like `d` but with sorted keys.
 
@@ -627,3 +785,4 @@ def list2hrlist(lst):
 
 if __name__ == '__main__':
     test_hash_obj()
+    test_save_cache_file()
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wrong-import-position
+
+"""
+Ragged columnar storage of per-event pulse, photon, and trigger series.
+
+A series is stored as a directory containing
+
+* "data.npy" : the items (e.g. pulses of dtype PULSE_T) of all events
+  concatenated into one flat array
+* "events.npy" : one EVENT_INDEXER_T entry per event
+* "doms.npy" (only for per-DOM series, i.e. pulses and photons) : one
+  DOM_INDEXER_T entry per DOM per event, locating that DOM's items within
+  "data.npy"; an event's `first_idx` and `num` then refer to these entries
+  rather than directly to items
+
+Files are loaded memory-mapped, so retrieving an event reads only that event's
+part of each file.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__all__ = [
+    'EventSeries',
+    'is_ragged_series',
+    'save_ragged_series',
+    'load_ragged_series',
+    'iterate_ragged_series',
+]
+
+__author__ = 'J.L. Lanfranchi, P. Eller'
+__license__ = '''Copyright 2018 Justin L. Lanfranchi and Philipp Eller
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.'''
+
+from os.path import abspath, dirname, isdir, isfile, join
+import sys
+
+import numpy as np
+
+if __name__ == '__main__' and __package__ is None:
+    RETRO_DIR = dirname(dirname(dirname(abspath(__file__))))
+    if RETRO_DIR not in sys.path:
+        sys.path.append(RETRO_DIR)
+from retro.retro_types import DOM_INDEXER_T, EVENT_INDEXER_T
+from retro.utils.misc import expand, mkdir
+
+
+class EventSeries(object):
+    """One event's per-DOM series (pulses or photons) as retrieved from
+    ragged storage.
+
+    Iterating yields ``((string, dom, pmt), items)`` tuples, just like the
+    lists of such tuples that are stored per event in legacy pickle files.
+
+    Parameters
+    ----------
+    doms : array of dtype DOM_INDEXER_T
+        Offsets must be relative to the start of `data`
+    data : array
+        Items of all DOMs in this event
+
+    """
+    __slots__ = ('doms', 'data')
+
+    def __init__(self, doms, data):
+        self.doms = doms
+        self.data = data
+
+    def __len__(self):
+        return len(self.doms)
+
+    def __iter__(self):
+        for dom in self.doms:
+            offset = dom['offset']
+            yield (
+                (dom['string'], dom['dom'], dom['pmt']),
+                self.data[offset : offset + dom['num']],
+            )
+
+
+def is_ragged_series(dirpath):
+    """Whether `dirpath` contains a series stored by `save_ragged_series`"""
+    return isdir(dirpath) and isfile(join(dirpath, 'events.npy'))
+
+
+def save_ragged_series(dirpath, events_series, dtype, per_dom):
+    """Store series of all events in ragged columnar format.
+
+    Parameters
+    ----------
+    dirpath : string
+        Directory in which to store the files (created if necessary)
+    events_series : sequence
+        One entry per event. If `per_dom`, each is a sequence of
+        ``((string, dom, pmt), items)`` tuples; otherwise, each is an array of
+        items.
+    dtype : numpy.dtype
+        dtype of the items
+    per_dom : bool
+
+    """
+    dirpath = expand(dirpath)
+    mkdir(dirpath)
+
+    events = np.empty(shape=len(events_series), dtype=EVENT_INDEXER_T)
+    data = []
+    doms = []
+    num_items = 0
+    for event_idx, event_series in enumerate(events_series):
+        if per_dom:
+            events[event_idx] = (len(doms), len(event_series))
+            for (string, dom, pmt), items in event_series:
+                doms.append((string, dom, pmt, num_items, len(items)))
+                data.append(items)
+                num_items += len(items)
+        else:
+            events[event_idx] = (num_items, len(event_series))
+            data.append(event_series)
+            num_items += len(event_series)
+
+    if data:
+        data = np.concatenate(data).astype(dtype, copy=False)
+    else:
+        data = np.empty(shape=0, dtype=dtype)
+
+    np.save(join(dirpath, 'data.npy'), data)
+    if per_dom:
+        np.save(join(dirpath, 'doms.npy'), np.array(doms, dtype=DOM_INDEXER_T))
+    np.save(join(dirpath, 'events.npy'), events)
+
+
+def load_ragged_series(dirpath, event_idx, mmap=True):
+    """Retrieve one event's series from ragged storage.
+
+    Parameters
+    ----------
+    dirpath : string
+    event_idx : int
+    mmap : bool, optional
+
+    Returns
+    -------
+    series : EventSeries or array
+        EventSeries for per-DOM series, otherwise an array of items
+
+    """
+    return next(iterate_ragged_series(
+        dirpath, start=event_idx, stop=event_idx + 1, mmap=mmap
+    ))
+
+
+def iterate_ragged_series(dirpath, start=0, stop=None, step=None, mmap=True):
+    """Iterate through events' series in ragged storage.
+
+    Parameters
+    ----------
+    dirpath : string
+    start, stop, step : optional
+        Arguments passed to `slice` for extracting select events
+    mmap : bool, optional
+        Memory-map the files (default) rather than loading them entirely
+
+    Yields
+    ------
+    series : EventSeries or array
+        EventSeries for per-DOM series, otherwise an array of items (a view
+        into the stored data; copy if it is to be modified)
+
+    """
+    dirpath = expand(dirpath)
+    mmap_mode = 'r' if mmap else None
+    events = np.load(join(dirpath, 'events.npy'), mmap_mode=mmap_mode)
+    data = np.load(join(dirpath, 'data.npy'), mmap_mode=mmap_mode)
+    doms_fpath = join(dirpath, 'doms.npy')
+    doms = np.load(doms_fpath, mmap_mode=mmap_mode) if isfile(doms_fpath) else None
+
+    for event in events[slice(start, stop, step)]:
+        first_idx = int(event['first_idx'])
+        num = int(event['num'])
+        if doms is None:
+            yield data[first_idx : first_idx + num]
+            continue
+
+        event_doms = np.array(doms[first_idx : first_idx + num])
+        if num == 0:
+            yield EventSeries(doms=event_doms, data=data[0:0])
+            continue
+        data_start = event_doms['offset'][0]
+        data_stop = event_doms['offset'][-1] + event_doms['num'][-1]
+        event_doms['offset'] -= data_start
+        yield EventSeries(doms=event_doms, data=data[data_start:data_stop])
+
+
+def test_ragged_series():
+    """Unit tests for `save_ragged_series` and `iterate_ragged_series`,
+    including that `retro.init_obj.get_hits` gets identical hits from ragged
+    storage and from legacy pickle files"""
+    import pickle
+    import shutil
+    from tempfile import mkdtemp
+
+    from retro.init_obj import get_hits, iterate_series
+    from retro.retro_types import (
+        ConfigID, PHOTON_T, PULSE_T, SourceID, TRIGGER_T, TypeID
+    )
+
+    rand = np.random.RandomState(0)
+    num_events = 20
+    empty_events = (0, 7, 8, num_events - 1)
+
+    def make_items(dtype, num):
+        items = np.zeros(shape=num, dtype=dtype)
+        for field in dtype.names:
+            items[field] = rand.uniform(0.1, 1e4, size=num)
+        return items
+
+    def make_per_dom_series(dtype):
+        events_series = []
+        for event_idx in range(num_events):
+            num_doms = 0 if event_idx in empty_events else rand.randint(1, 30)
+            strings_doms = rand.choice(86*60, size=num_doms, replace=False)
+            events_series.append([
+                (
+                    (sd // 60 + 1, sd % 60 + 1, 0),
+                    make_items(dtype, rand.randint(1, 10)),
+                )
+                for sd in sorted(strings_doms)
+            ])
+        return events_series
+
+    triggers = []
+    for event_idx in range(num_events):
+        num_triggers = 0 if event_idx in empty_events else rand.randint(1, 4)
+        event_triggers = make_items(TRIGGER_T, num_triggers)
+        event_triggers['type'] = TypeID.SIMPLE_MULTIPLICITY
+        event_triggers['source'] = SourceID.IN_ICE
+        event_triggers['config_id'] = ConfigID.SMT8_IN_ICE
+        triggers.append(event_triggers)
+
+    all_series = dict(
+        pulses=(make_per_dom_series(PULSE_T), PULSE_T, True),
+        photons=(make_per_dom_series(PHOTON_T), PHOTON_T, True),
+        triggers=(triggers, TRIGGER_T, False),
+    )
+
+    tmpdir = mkdtemp()
+    try:
+        for name, (events_series, dtype, per_dom) in all_series.items():
+            dirpath = join(tmpdir, name)
+            save_ragged_series(dirpath, events_series, dtype=dtype, per_dom=per_dom)
+            with open(join(tmpdir, name + '_legacy.pkl'), 'wb') as fobj:
+                pickle.dump(events_series, fobj, protocol=pickle.HIGHEST_PROTOCOL)
+            assert is_ragged_series(dirpath)
+
+            for slicer in [
+                slice(None), slice(3, None), slice(1, 15, 3), slice(None, None, -2),
+                slice(7, 9), slice(30, None),
+            ]:
+                for mmap in (True, False):
+                    retrieved = list(iterate_ragged_series(
+                        dirpath, start=slicer.start, stop=slicer.stop,
+                        step=slicer.step, mmap=mmap,
+                    ))
+                    expected = events_series[slicer]
+                    assert len(retrieved) == len(expected)
+                    for series, ref in zip(retrieved, expected):
+                        if not per_dom:
+                            assert np.all(series == ref)
+                            continue
+                        assert isinstance(series, EventSeries)
+                        series = list(series)
+                        assert len(series) == len(ref)
+                        for (key, items), (ref_key, ref_items) in zip(series, ref):
+                            assert key == ref_key
+                            assert items.dtype == dtype
+                            assert np.all(items == ref_items)
+
+            event_idx = 5
+            series = load_ragged_series(dirpath, event_idx)
+            if per_dom:
+                series = list(series)
+                assert [k for k, _ in series] == [k for k, _ in events_series[event_idx]]
+            else:
+                assert np.all(series == events_series[event_idx])
+
+        # Same hits, hits indexer, and hits summary from ragged & legacy storage
+        paths = [('pulses', 'pulses'), ('photons', 'photons')]
+        for path in paths:
+            for ragged_series, legacy_series, event_triggers in zip(
+                iterate_series(join(tmpdir, path[0])),
+                iterate_series(join(tmpdir, path[0] + '_legacy')),
+                triggers,
+            ):
+                if len(legacy_series) == 0:
+                    continue
+                ragged_hits = get_hits(
+                    {path[0]: {path[1]: ragged_series},
+                     'triggers': {'I3TriggerHierarchy': event_triggers}},
+                    path=path,
+                )
+                legacy_hits = get_hits(
+                    {path[0]: {path[1]: legacy_series},
+                     'triggers': {'I3TriggerHierarchy': event_triggers}},
+                    path=path,
+                )
+                for ragged_array, legacy_array in zip(ragged_hits, legacy_hits):
+                    assert ragged_array.dtype == legacy_array.dtype
+                    assert np.all(ragged_array == legacy_array)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print('<< PASS : test_ragged_series >>')
+
+
+if __name__ == '__main__':
+    test_ragged_series()